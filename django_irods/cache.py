@@ -0,0 +1,194 @@
+"""Memoization of iRODS stat, listing and AVU lookups made through IrodsStorage.
+
+Lookups are cached only inside a scope, which lasts for one HTTP request
+(django_irods.middleware.IrodsCacheMiddleware) or one Celery task (see the
+task_prerun/task_postrun handlers below). Outside a scope every lookup goes
+to iRODS as before. Writes made through
+IrodsStorage invalidate the written path, everything below it and the listings
+and existence checks of its ancestors.
+
+If IRODS_CACHE_TTL is set to a positive number of seconds, results are also
+shared between processes through the Django cache named by IRODS_CACHE_ALIAS
+(e.g., a Redis or memcached backend). Shared entries are versioned by a
+per-resource generation counter that every write bumps, so a write in one
+process is seen by all others.
+"""
+
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+from celery.signals import task_prerun, task_postrun
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0}
+
+_MISSING = object()
+
+
+def _count(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def get_stats():
+    """Return the hit and miss counters of this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def activate():
+    """Start a cache scope on this thread; scopes nest, only the outermost one clears."""
+    depth = getattr(_local, 'depth', 0)
+    if depth == 0:
+        _local.entries = {}
+    _local.depth = depth + 1
+
+
+def deactivate():
+    depth = getattr(_local, 'depth', 0)
+    if depth <= 1:
+        _local.depth = 0
+        _local.entries = None
+    else:
+        _local.depth = depth - 1
+
+
+def reset():
+    """Start a fresh, outermost scope on this thread, dropping any scope left over on it."""
+    _local.depth = 1
+    _local.entries = {}
+
+
+def clear():
+    """End every scope on this thread."""
+    _local.depth = 0
+    _local.entries = None
+
+
+def is_active():
+    return getattr(_local, 'depth', 0) > 0
+
+
+@contextmanager
+def scope():
+    """Cache iRODS lookups for the duration of a with-block."""
+    activate()
+    try:
+        yield
+    finally:
+        deactivate()
+
+
+def _shared_cache():
+    ttl = getattr(settings, 'IRODS_CACHE_TTL', 0)
+    if not ttl:
+        return None, 0
+    from django.core.cache import caches
+    return caches[getattr(settings, 'IRODS_CACHE_ALIAS', 'default')], ttl
+
+
+def _root(path):
+    """Return the resource collection a path belongs to, used to version shared entries.
+
+    Relative paths start with the resource id; absolute (federated) paths are
+    /{zone}/home/{user}/{resource id}/...
+    """
+    parts = [p for p in path.split('/') if p]
+    if path.startswith('/'):
+        return '/' + '/'.join(parts[:4])
+    return '/'.join(parts[:1])
+
+
+def _generation_key(namespace, path):
+    return 'irods:{}:gen:{}'.format(namespace, hashlib.md5(_root(path).encode('utf-8'))
+                                    .hexdigest())
+
+
+def _shared_key(shared, namespace, operation, path, extra):
+    generation = shared.get(_generation_key(namespace, path)) or 0
+    digest = hashlib.md5(u'\n'.join([path] + [u'{}'.format(e) for e in extra])
+                         .encode('utf-8')).hexdigest()
+    return 'irods:{}:{}:{}:{}'.format(namespace, generation, operation, digest)
+
+
+def lookup(namespace, operation, path, compute, *extra):
+    """Return the cached result of operation on path, calling compute() on a miss.
+
+    :param namespace: identifies the iRODS session ('default' or 'federated'); None disables
+    caching, as for sessions of individual iRODS users.
+    :param operation: name of the storage operation, e.g., 'exists' or 'listdir'
+    :param path: iRODS path the operation applies to
+    :param compute: callable performing the operation against iRODS
+    :param extra: additional arguments that distinguish results, e.g., an AVU name
+    """
+    if namespace is None or not is_active():
+        return compute()
+    key = (namespace, operation, path) + extra
+    value = _local.entries.get(key, _MISSING)
+    if value is not _MISSING:
+        _count('local_hits')
+        return value
+
+    shared, ttl = _shared_cache()
+    if shared is not None:
+        shared_key = _shared_key(shared, namespace, operation, path, extra)
+        value = shared.get(shared_key, _MISSING)
+        if value is not _MISSING:
+            _count('shared_hits')
+            _local.entries[key] = value
+            return value
+
+    _count('misses')
+    value = compute()
+    _local.entries[key] = value
+    if shared is not None:
+        shared.set(shared_key, value, ttl)
+    return value
+
+
+def invalidate(namespace, path):
+    """Forget cached results for path, the paths below it and the ancestors of it."""
+    if namespace is None or not path:
+        return
+    _count('invalidations')
+    path = path.rstrip('/')
+    if is_active():
+        below = path + '/'
+        for key in list(_local.entries):
+            cached_path = key[2].rstrip('/')
+            if key[0] != namespace:
+                continue
+            if cached_path == path or cached_path.startswith(below) or \
+                    below.startswith(cached_path + '/'):
+                del _local.entries[key]
+
+    shared, _ = _shared_cache()
+    if shared is not None:
+        generation_key = _generation_key(namespace, path)
+        try:
+            shared.incr(generation_key)
+        except ValueError:
+            # no generation recorded yet for this resource
+            shared.set(generation_key, 1, None)
+
+
+@task_prerun.connect
+def _task_prerun(**kwargs):
+    reset()
+
+
+@task_postrun.connect
+def _task_postrun(**kwargs):
+    clear()
@@ -169,14 +169,17 @@ class Session(object):
         if data:
             stdin = StringIO(data)
 
-        proc = subprocess.Popen(
-            argList,
-            stdin=subprocess.PIPE if stdin else None,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            env=myenv
-        )
-        stdout, stderr = proc.communicate(input=data) if stdin else proc.communicate()
+        # imported here since native imports SessionException from this module
+        from django_irods.native import operation_stats
+        with operation_stats.timed('icommand:' + icommand):
+            proc = subprocess.Popen(
+                argList,
+                stdin=subprocess.PIPE if stdin else None,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=myenv
+            )
+            stdout, stderr = proc.communicate(input=data) if stdin else proc.communicate()
 
         if proc.returncode:
             raise SessionException(proc.returncode, stdout, stderr)
@@ -257,6 +260,27 @@ class Session(object):
             return stdout, stderr
 
 
+class IcommandStream(object):
+    """Read-only file-like object streaming a data object through 'iget <path> -'.
+
+    iget cannot start in the middle of a file, so the stream always starts at the
+    beginning; byte ranges are only served through the native client.
+    """
+
+    def __init__(self, session, name):
+        self.proc = session.run_safe('iget', None, name, '-')
+
+    def read(self, size=-1):
+        return self.proc.stdout.read(size)
+
+    def close(self):
+        self.proc.stdout.close()
+        if self.proc.poll() is None:
+            # the client stopped reading early
+            self.proc.kill()
+        self.proc.wait()
+
+
 if getattr(settings, 'IRODS_GLOBAL_SESSION', False) and getattr(settings, 'USE_IRODS', False):
     GLOBAL_SESSION = Session()
     GLOBAL_ENVIRONMENT = GLOBAL_SESSION.create_environment()
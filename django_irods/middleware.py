@@ -0,0 +1,29 @@
+from django.utils.deprecation import MiddlewareMixin
+
+from django_irods import cache
+
+
+class IrodsCacheMiddleware(MiddlewareMixin):
+    """Scope caching of iRODS lookups made through IrodsStorage to a single request.
+
+    Each request starts a fresh scope, so lookups never carry over from an earlier request
+    served by the same thread, even one that ended without a response.
+    """
+
+    def __call__(self, request):
+        cache.reset()
+        try:
+            return self.get_response(request)
+        finally:
+            cache.clear()
+
+    # MIDDLEWARE_CLASSES does not call __call__
+    def process_request(self, request):
+        cache.reset()
+
+    def process_response(self, request, response):
+        cache.clear()
+        return response
+
+    def process_exception(self, request, exception):
+        cache.clear()
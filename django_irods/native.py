@@ -0,0 +1,487 @@
+"""Pooled native iRODS protocol client used by IrodsStorage in place of icommands.
+
+Every icommand invocation forks a new process, copies the environment and
+re-authenticates to iRODS. When IRODS_NATIVE_CLIENT is enabled in settings,
+IrodsStorage instead borrows an already authenticated python-irodsclient
+session from a per-process pool kept here.
+"""
+
+import calendar
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from Queue import Queue, Empty, Full
+
+from django.conf import settings
+
+from django_irods.icommands import SessionException
+
+logger = logging.getLogger(__name__)
+
+
+class NativeIrodsException(Exception):
+    """Raised when the native client cannot perform the requested operation."""
+    pass
+
+
+class OperationStats(object):
+    """Thread-safe counters of operation latency, keyed by operation name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = defaultdict(int)
+            self.total_seconds = defaultdict(float)
+            self.max_seconds = defaultdict(float)
+
+    def record(self, operation, seconds):
+        with self._lock:
+            self.counts[operation] += 1
+            self.total_seconds[operation] += seconds
+            if seconds > self.max_seconds[operation]:
+                self.max_seconds[operation] = seconds
+
+    @contextmanager
+    def timed(self, operation):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record(operation, time.time() - start)
+
+    def as_dict(self):
+        with self._lock:
+            return {op: {'count': self.counts[op],
+                         'total_ms': round(self.total_seconds[op] * 1000, 3),
+                         'mean_ms': round(self.total_seconds[op] * 1000 / self.counts[op], 3),
+                         'max_ms': round(self.max_seconds[op] * 1000, 3)}
+                    for op in self.counts}
+
+
+# latency of icommands and native operations, so the two paths can be compared
+operation_stats = OperationStats()
+
+
+def _session_settings(option):
+    """Return the connection settings of the given zone option.
+
+    As with IrodsStorage.set_fed_zone_session, the federated zone is reached through the
+    HydroShare account of the data zone, storing into the default resource of the user zone.
+    """
+    if option == 'federated':
+        default_resource = settings.HS_IRODS_USER_ZONE_DEF_RES
+    else:
+        default_resource = getattr(settings, 'IRODS_DEFAULT_RESOURCE', None)
+    return {'host': settings.IRODS_HOST,
+            'port': int(settings.IRODS_PORT),
+            'user': settings.IRODS_USERNAME,
+            'password': settings.IRODS_AUTH,
+            'zone': settings.IRODS_ZONE,
+            'default_resource': default_resource}
+
+
+def _default_session_factory(option):
+    """Create an authenticated python-irodsclient session for the given zone option."""
+    from irods.session import iRODSSession
+
+    return iRODSSession(**_session_settings(option))
+
+
+class IrodsConnectionPool(object):
+    """A bounded pool of long-lived iRODS sessions for one zone option.
+
+    Sessions are created lazily up to max_size; a caller that finds every session
+    checked out waits up to timeout seconds for one to be returned. The pool is
+    bound to the process that created it so that forked workers never share sockets.
+    """
+
+    def __init__(self, option, session_factory, max_size=4, timeout=30):
+        self.option = option
+        self.session_factory = session_factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self._idle = Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self.created = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.discarded = 0
+
+    @property
+    def in_use(self):
+        return self.created - self.discarded - self._idle.qsize()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        with self._lock:
+            if self.created - self.discarded < self.max_size:
+                self.created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                with operation_stats.timed('native:connect'):
+                    return self.session_factory(self.option)
+            except Exception:
+                with self._lock:
+                    self.discarded += 1
+                raise
+        with self._lock:
+            self.waits += 1
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except Empty:
+            raise NativeIrodsException("Timed out waiting for an iRODS connection "
+                                       "from the '{}' pool".format(self.option))
+
+    def _release(self, session, broken=False):
+        if not broken:
+            try:
+                self._idle.put_nowait(session)
+                return
+            except Full:
+                pass
+        with self._lock:
+            self.discarded += 1
+        try:
+            session.cleanup()
+        except Exception:
+            pass
+
+    @contextmanager
+    def session(self):
+        """Check out a session for the duration of a with-block."""
+        session = self._acquire()
+        with self._lock:
+            self.checkouts += 1
+        broken = False
+        try:
+            yield session
+        except (IOError, OSError, EOFError):
+            # network level failure: do not hand this connection to the next caller
+            broken = True
+            raise
+        finally:
+            self._release(session, broken=broken)
+
+    def close(self):
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except Empty:
+                break
+            self._release(session, broken=True)
+
+    def stats(self):
+        return {'option': self.option,
+                'max_size': self.max_size,
+                'created': self.created,
+                'discarded': self.discarded,
+                'idle': self._idle.qsize(),
+                'in_use': self.in_use,
+                'checkouts': self.checkouts,
+                'waits': self.waits}
+
+
+# condition keywords understood by the iRODS server, as defined in irods.keywords
+FORCE_FLAG_KW = 'forceFlag'
+DATA_TYPE_KW = 'dataType'
+DEST_RESC_NAME_KW = 'destRescName'
+
+_pools = {}
+_pools_lock = threading.Lock()
+_session_factory = _default_session_factory
+
+
+def set_session_factory(factory):
+    """Replace the factory used to create sessions, e.g. with a fake iRODS server in tests.
+
+    Existing pools are closed so that subsequent calls use the new factory.
+    """
+    global _session_factory
+    _session_factory = factory or _default_session_factory
+    reset_pools()
+
+
+def reset_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+def get_pool(option):
+    """Return the connection pool of this process for the given zone option."""
+    with _pools_lock:
+        pool = _pools.get(option)
+        if pool is None or pool.pid != os.getpid():
+            pool = IrodsConnectionPool(option, _session_factory,
+                                       max_size=getattr(settings, 'IRODS_NATIVE_POOL_SIZE', 4),
+                                       timeout=getattr(settings, 'IRODS_NATIVE_POOL_TIMEOUT',
+                                                       30))
+            _pools[option] = pool
+        return pool
+
+
+def get_stats():
+    """Return pool and latency statistics for this process."""
+    with _pools_lock:
+        pools = [pool.stats() for pool in _pools.values()]
+    return {'pid': os.getpid(),
+            'pools': pools,
+            'operations': operation_stats.as_dict()}
+
+
+class NativeBackend(object):
+    """The subset of IrodsStorage operations served over a pooled native connection.
+
+    Relative paths are resolved against cwd exactly as icommands resolve them.
+    """
+
+    def __init__(self, option, cwd, default_resource=None):
+        self.option = option
+        self.cwd = cwd
+        self.default_resource = default_resource
+
+    def _abspath(self, name):
+        if name.startswith('/'):
+            return name.rstrip('/') or '/'
+        return '/'.join([self.cwd.rstrip('/'), name.strip('/')])
+
+    @contextmanager
+    def _session(self, operation):
+        with operation_stats.timed('native:' + operation):
+            try:
+                with get_pool(self.option).session() as session:
+                    yield session
+            except (SessionException, NativeIrodsException):
+                raise
+            except Exception as ex:
+                # callers of IrodsStorage expect the same exception icommands raise
+                logger.error("native iRODS {} failed: {}".format(operation, str(ex)))
+                raise SessionException(-1, '', "{}: {}".format(type(ex).__name__, ex))
+
+    def _put_options(self, force=True, data_type_str='', resource=None):
+        options = {}
+        if force:
+            options[FORCE_FLAG_KW] = ''
+        if data_type_str:
+            options[DATA_TYPE_KW] = data_type_str
+        resource = resource or self.default_resource
+        if resource:
+            options[DEST_RESC_NAME_KW] = resource
+        return options
+
+    def exists(self, name):
+        path = self._abspath(name)
+        with self._session('exists') as session:
+            return session.collections.exists(path) or session.data_objects.exists(path)
+
+    def listdir(self, name):
+        path = self._abspath(name)
+        with self._session('listdir') as session:
+            coll = session.collections.get(path)
+            listing = ([], [], [])
+            for sub in coll.subcollections:
+                listing[0].append(sub.name)
+                listing[2].append("-1")
+            for obj in coll.data_objects:
+                listing[1].append(obj.name)
+                listing[2].append(str(obj.size))
+            return listing
+
+    def size(self, name):
+        path = self._abspath(name)
+        with self._session('size') as session:
+            return int(session.data_objects.get(path).size)
+
+    def stat(self, name):
+        path = self._abspath(name)
+        with self._session('stat') as session:
+            obj = session.data_objects.get(path)
+            modified = obj.modify_time
+            if isinstance(modified, datetime):
+                modified = calendar.timegm(modified.utctimetuple())
+            return {'size': int(obj.size),
+                    'checksum': obj.checksum or '',
+                    'modified': int(modified)}
+
+    def walk(self, name):
+        """return the absolute paths of all collections and the stats of all data objects
+        below a collection, using one catalog query for each"""
+        from irods.column import Like
+        from irods.models import Collection, DataObject
+
+        path = self._abspath(name)
+        # queries have no escape for quotes; they are matched by the '_' wildcard, and the
+        # results are filtered by IrodsStorage.walk
+        pattern = path.replace("'", "_")
+        with self._session('walk') as session:
+            folders = [row[Collection.name] for row in session.query(Collection.name)
+                       .filter(Like(Collection.name, pattern + '/%')).get_results()]
+            files = []
+            query = session.query(Collection.name, DataObject.name, DataObject.size,
+                                  DataObject.checksum, DataObject.modify_time) \
+                .filter(Like(Collection.name, pattern + '%'))
+            for row in query.get_results():
+                modified = row[DataObject.modify_time]
+                if isinstance(modified, datetime):
+                    modified = calendar.timegm(modified.utctimetuple())
+                files.append({'path': row[Collection.name] + '/' + row[DataObject.name],
+                              'size': int(row[DataObject.size]),
+                              'checksum': row[DataObject.checksum] or '',
+                              'modified': int(modified)})
+            return folders, files
+
+    def checksum(self, name):
+        path = self._abspath(name)
+        with self._session('checksum') as session:
+            return session.data_objects.get(path).chksum()
+
+    def get_avu(self, name, att_name):
+        path = self._abspath(name)
+        with self._session('getAVU') as session:
+            avus = session.collections.get(path).metadata.get_all(att_name)
+            if not avus:
+                return None
+            return avus[0].value
+
+    def set_avu(self, name, att_name, att_val, att_unit=None):
+        path = self._abspath(name)
+        with self._session('setAVU') as session:
+            metadata = session.collections.get(path).metadata
+            # equivalent of 'imeta set': replace every value of the attribute
+            for avu in metadata.get_all(att_name):
+                metadata.remove(avu)
+            if att_unit:
+                metadata.add(att_name, att_val, att_unit)
+            else:
+                metadata.add(att_name, att_val)
+
+    def mkdir(self, name):
+        path = self._abspath(name)
+        with self._session('mkdir') as session:
+            if not session.collections.exists(path):
+                session.collections.create(path)
+
+    def put(self, from_name, to_name, data_type_str=''):
+        path = self._abspath(to_name)
+        with self._session('put') as session:
+            session.data_objects.put(from_name, path,
+                                     **self._put_options(data_type_str=data_type_str))
+
+    def get(self, src_name, dest_name):
+        path = self._abspath(src_name)
+        with self._session('get') as session:
+            session.data_objects.get(path, dest_name, **{FORCE_FLAG_KW: ''})
+
+    def get_many(self, src_names, dest_dir):
+        """copy data objects into a local directory over one session"""
+        with self._session('get_many') as session:
+            for src_name in src_names:
+                path = self._abspath(src_name)
+                dest_name = os.path.join(dest_dir, path.rsplit('/', 1)[1])
+                session.data_objects.get(path, dest_name, **{FORCE_FLAG_KW: ''})
+
+    def copy(self, src_name, dest_name, resource=None):
+        src = self._abspath(src_name)
+        dest = self._abspath(dest_name)
+        with self._session('copy') as session:
+            options = self._put_options(resource=resource)
+            if session.collections.exists(src):
+                self._copy_collection(session, src, dest, options)
+            else:
+                session.data_objects.copy(src, dest, **options)
+
+    def _copy_collection(self, session, src, dest, options):
+        if not session.collections.exists(dest):
+            session.collections.create(dest)
+        coll = session.collections.get(src)
+        for obj in coll.data_objects:
+            session.data_objects.copy(obj.path, '/'.join([dest, obj.name]), **options)
+        for sub in coll.subcollections:
+            self._copy_collection(session, sub.path, '/'.join([dest, sub.name]), options)
+
+    def move(self, src_name, dest_name):
+        src = self._abspath(src_name)
+        dest = self._abspath(dest_name)
+        with self._session('move') as session:
+            if session.collections.exists(src):
+                session.collections.move(src, dest)
+            else:
+                session.data_objects.move(src, dest)
+
+    def delete(self, name):
+        path = self._abspath(name)
+        with self._session('delete') as session:
+            # 'irm -rf' semantics: missing paths are not an error
+            if session.collections.exists(path):
+                session.collections.remove(path, recurse=True, force=True)
+            elif session.data_objects.exists(path):
+                session.data_objects.unlink(path, force=True)
+
+    def open(self, name, mode='r', offset=0):
+        """Open a data object for streaming; the caller must close the returned file.
+
+        The connection stays checked out of the pool until the file is closed.
+        """
+        path = self._abspath(name)
+        pool = get_pool(self.option)
+        context = pool.session()
+        session = context.__enter__()
+        try:
+            with operation_stats.timed('native:open'):
+                handle = session.data_objects.open(path, mode)
+                if offset:
+                    handle.seek(offset)
+        except Exception as ex:
+            context.__exit__(None, None, None)
+            raise SessionException(-1, '', "{}: {}".format(type(ex).__name__, ex))
+        return _PooledFile(handle, context)
+
+
+class _PooledFile(object):
+    """File wrapper that returns its connection to the pool when closed."""
+
+    def __init__(self, handle, context):
+        self._handle = handle
+        self._context = context
+
+    def __getattr__(self, name):
+        return getattr(self._handle, name)
+
+    def __iter__(self):
+        return iter(self._handle)
+
+    def close(self):
+        if self._context is not None:
+            try:
+                self._handle.close()
+            finally:
+                self._context.__exit__(None, None, None)
+                self._context = None
+
+
+def get_backend(option):
+    """Return a NativeBackend for 'federated' or the default zone, or None if disabled."""
+    if not getattr(settings, 'IRODS_NATIVE_CLIENT', False):
+        return None
+    if option == 'federated':
+        if not getattr(settings, 'REMOTE_USE_IRODS', False):
+            return None
+        return NativeBackend('federated', settings.IRODS_CWD,
+                             getattr(settings, 'HS_IRODS_USER_ZONE_DEF_RES', None))
+    return NativeBackend('default', settings.IRODS_CWD,
+                         getattr(settings, 'IRODS_DEFAULT_RESOURCE', None))
@@ -1,4 +1,5 @@
 import os
+from functools import wraps
 from tempfile import NamedTemporaryFile
 from uuid import uuid4
 from urllib import urlencode
@@ -9,10 +10,82 @@ from django.core.files.storage import Storage
 from django.core.urlresolvers import reverse
 from django.core.exceptions import ValidationError
 
-from django_irods import icommands
+from django_irods import icommands, native, cache
 from icommands import Session, GLOBAL_SESSION, GLOBAL_ENVIRONMENT, SessionException, IRodsEnv
 
 
+def _like_literal(value):
+    """
+    quote a value for a 'like' condition of a catalog query. The general query language has no
+    escape for single quotes, so they are matched by the '_' wildcard instead; as '%' and '_'
+    in the value are wildcards as well, callers must check the results against the value.
+    """
+    return "'{}'".format(value.replace("'", "_"))
+
+
+def invalidates(*path_args):
+    """
+    decorator for IrodsStorage methods that write to iRODS: once the write completes or fails,
+    drop cached lookups for the paths passed as the named arguments
+    """
+    def decorator(func):
+        arg_names = func.__code__.co_varnames[1:func.__code__.co_argcount]
+
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return func(self, *args, **kwargs)
+            finally:
+                call_args = dict(zip(arg_names, args), **kwargs)
+                for name in path_args:
+                    self.invalidate(call_args.get(name))
+        return wrapper
+    return decorator
+
+
+class IrodsTree(object):
+    """
+    the folders and files below a collection, as returned by IrodsStorage.walk()
+
+    Paths are in the form the walked collection was named in, e.g., relative to the iRODS
+    working directory if a relative path was walked. Folders are sorted, so a folder
+    always comes before its sub-folders.
+    """
+    def __init__(self, path, folders, files):
+        self.path = path.rstrip('/')
+        # paths of all folders below path
+        self.folders = folders
+        # dicts with the 'path', 'size', 'checksum' and 'modified' time of all files below path
+        self.files = files
+
+    @property
+    def file_paths(self):
+        return [f['path'] for f in self.files]
+
+    @property
+    def total_size(self):
+        return sum(f['size'] for f in self.files)
+
+    def listdir(self, path=None):
+        """
+        list a folder of the tree without another iRODS call
+        :param path: the folder to list, the root of the tree if None
+        :return: a tuple of folder names, file names and file sizes as IrodsStorage.listdir()
+        """
+        path = path.rstrip('/') if path else self.path
+        prefix = path + '/'
+        listing = ([], [], [])
+        for folder in self.folders:
+            if folder.startswith(prefix) and '/' not in folder[len(prefix):]:
+                listing[0].append(folder[len(prefix):])
+                listing[2].append("-1")
+        for f in self.files:
+            if f['path'].startswith(prefix) and '/' not in f['path'][len(prefix):]:
+                listing[1].append(f['path'][len(prefix):])
+                listing[2].append(str(f['size']))
+        return listing
+
+
 @deconstructible
 class IrodsStorage(Storage):
     def __init__(self, option=None):
@@ -23,6 +96,10 @@ class IrodsStorage(Storage):
             self.session = GLOBAL_SESSION
             self.environment = GLOBAL_ENVIRONMENT
             icommands.ACTIVE_SESSION = self.session
+        # pooled native iRODS connection, None when IRODS_NATIVE_CLIENT is off
+        self.native = native.get_backend(option)
+        # lookups are cached per zone; sessions of individual users are not cached
+        self.cache_namespace = 'federated' if option == 'federated' else 'default'
 
     @property
     def getUniqueTmpPath(self):
@@ -57,6 +134,9 @@ class IrodsStorage(Storage):
 
         self.session.run('iinit', None, self.environment.auth)
         icommands.ACTIVE_SESSION = self.session
+        # an explicit user session must not be served by the proxy user's pool
+        self.native = None
+        self.cache_namespace = None
 
     # Set iRODS session to wwwHydroProxy for irods_storage input object for iRODS federated
     # zone direct file operations
@@ -78,8 +158,45 @@ class IrodsStorage(Storage):
         return self._open(name, mode='rb')
 
     def getFile(self, src_name, dest_name):
+        if self.native is not None:
+            self.native.get(src_name, dest_name)
+            return
         self.session.run("iget", None, '-f', src_name, dest_name)
 
+    def getFiles(self, src_names, dest_dir):
+        """
+        copy data objects into a local directory in one batch
+        :param src_names: the data object paths, with distinct file names
+        :param dest_dir: the existing local directory to copy them to
+        """
+        if not src_names:
+            return
+        if self.native is not None:
+            self.native.get_many(src_names, dest_dir)
+            return
+        args = ['-f'] + list(src_names) + [dest_dir]
+        self.session.run("iget", None, *args)
+
+    def get_stats(self):
+        """
+        return iRODS connection pool, lookup cache and operation latency statistics of this
+        process
+        :return: a dict with 'pools', 'operations' and 'cache' entries
+        """
+        stats = native.get_stats()
+        stats['cache'] = cache.get_stats()
+        return stats
+
+    def invalidate(self, name):
+        """
+        drop cached lookups for name, the paths below it and its ancestors. Writes made through
+        this object invalidate automatically; this is needed only after changing iRODS
+        by other means.
+        :param name: the iRODS path that was changed
+        """
+        cache.invalidate(self.cache_namespace, name)
+
+    @invalidates('input_path')
     def runBagitRule(self, rule_name, input_path, input_resource):
         """
         run iRODS bagit rule which generated bag-releated files without bundling
@@ -93,6 +210,7 @@ class IrodsStorage(Storage):
         # SessionException will be raised from run() in icommands.py
         self.session.run("irule", None, '-F', rule_name, input_path, input_resource)
 
+    @invalidates('out_name')
     def zipup(self, in_name, out_name):
         """
         run iRODS ibun command to generate zip file for the bag
@@ -119,8 +237,11 @@ class IrodsStorage(Storage):
 
         unzipped_folder = self._get_nonexistant_path(os.path.join(abs_path, unzipped_folder))
 
-        # SessionException will be raised from run() in icommands.py
-        self.session.run("ibun", None, '-xDzip', zip_file_path, unzipped_folder)
+        try:
+            # SessionException will be raised from run() in icommands.py
+            self.session.run("ibun", None, '-xDzip', zip_file_path, unzipped_folder)
+        finally:
+            self.invalidate(unzipped_folder)
         return unzipped_folder
 
     def _get_nonexistant_path(self, path):
@@ -133,6 +254,7 @@ class IrodsStorage(Storage):
             new_path = "{}-{}".format(path, i)
         return new_path
 
+    @invalidates('name')
     def setAVU(self, name, attName, attVal, attUnit=None):
         """
         set AVU on resource collection - this is used for on-demand bagging by indicating
@@ -147,12 +269,30 @@ class IrodsStorage(Storage):
         indicate additional info
         """
 
+        if self.native is not None:
+            self.native.set_avu(name, attName, attVal, attUnit)
+            return
+
         # SessionException will be raised from run() in icommands.py
         if attUnit:
             self.session.run("imeta", None, 'set', '-C', name, attName, attVal, attUnit)
         else:
             self.session.run("imeta", None, 'set', '-C', name, attName, attVal)
 
+    @invalidates('name')
+    def removeAVU(self, name, attName, attVal):
+        """
+        remove an AVU from resource collection
+
+        Parameters:
+        :param
+        name: the resource collection name to remove AVU from.
+        attName: the attribute name to remove
+        attVal: the attribute value to remove
+        """
+        # SessionException will be raised from run() in icommands.py
+        self.session.run("imeta", None, 'rm', '-C', name, attName, attVal)
+
     def getAVU(self, name, attName):
         """
         set AVU on resource collection - this is used for on-demand bagging by indicating
@@ -166,6 +306,12 @@ class IrodsStorage(Storage):
         attUnit: the attribute Unit to set, default is None, but can be set to
         indicate additional info
         """
+        return cache.lookup(self.cache_namespace, 'getAVU', name,
+                            lambda: self._getAVU(name, attName), attName)
+
+    def _getAVU(self, name, attName):
+        if self.native is not None:
+            return self.native.get_avu(name, attName)
 
         # SessionException will be raised from run() in icommands.py
         stdout = self.session.run("imeta", None, 'ls', '-C', name, attName)[0].split("\n")
@@ -176,6 +322,7 @@ class IrodsStorage(Storage):
             vals = stdout[2].split(":")
             return vals[1].strip()
 
+    @invalidates('dest_name')
     def copyFiles(self, src_name, dest_name, ires=None):
         """
         Parameters:
@@ -187,6 +334,11 @@ class IrodsStorage(Storage):
         """
 
         if src_name and dest_name:
+            if self.native is not None:
+                if '/' in dest_name:
+                    self.native.mkdir(dest_name.rsplit('/', 1)[0])
+                self.native.copy(src_name, dest_name, resource=ires)
+                return
             if '/' in dest_name:
                 splitstrs = dest_name.rsplit('/', 1)
                 if not self.exists(splitstrs[0]):
@@ -197,6 +349,7 @@ class IrodsStorage(Storage):
                 self.session.run("icp", None, '-rf', src_name, dest_name)
         return
 
+    @invalidates('src_name', 'dest_name')
     def moveFile(self, src_name, dest_name):
         """
         Parameters:
@@ -207,6 +360,11 @@ class IrodsStorage(Storage):
         (directory) to another data-object or collection
         """
         if src_name and dest_name:
+            if self.native is not None:
+                if '/' in dest_name:
+                    self.native.mkdir(dest_name.rsplit('/', 1)[0])
+                self.native.move(src_name, dest_name)
+                return
             if '/' in dest_name:
                 splitstrs = dest_name.rsplit('/', 1)
                 if not self.exists(splitstrs[0]):
@@ -214,6 +372,7 @@ class IrodsStorage(Storage):
             self.session.run("imv", None, src_name, dest_name)
         return
 
+    @invalidates('to_name')
     def saveFile(self, from_name, to_name, create_directory=False, data_type_str=''):
         """
         Parameters:
@@ -224,6 +383,16 @@ class IrodsStorage(Storage):
         Note if only directory needs to be created without saving a file, from_name should be empty
         and to_name should have "/" as the last character
         """
+        if self.native is not None:
+            if create_directory:
+                splitstrs = to_name.rsplit('/', 1)
+                self.native.mkdir(splitstrs[0])
+                if len(splitstrs) <= 1:
+                    return
+            if from_name:
+                self.native.put(from_name, to_name, data_type_str=data_type_str)
+            return
+
         if create_directory:
             splitstrs = to_name.rsplit('/', 1)
             self.session.run("imkdir", None, '-p', splitstrs[0])
@@ -247,10 +416,21 @@ class IrodsStorage(Storage):
 
     def _open(self, name, mode='rb'):
         tmp = NamedTemporaryFile()
-        self.session.run("iget", None, '-f', name, tmp.name)
+        self.getFile(name, tmp.name)
         return tmp
 
+    @invalidates('name')
     def _save(self, name, content):
+        if self.native is not None:
+            self.native.mkdir(name.rsplit('/', 1)[0])
+            with NamedTemporaryFile(delete=False) as f:
+                for chunk in content.chunks():
+                    f.write(chunk)
+            try:
+                self.native.put(f.name, name)
+            finally:
+                os.unlink(f.name)
+            return name
         self.session.run("imkdir", None, '-p', name.rsplit('/', 1)[0])
         with NamedTemporaryFile(delete=False) as f:
             for chunk in content.chunks():
@@ -265,10 +445,19 @@ class IrodsStorage(Storage):
             os.unlink(f.name)
         return name
 
+    @invalidates('name')
     def delete(self, name):
+        if self.native is not None:
+            self.native.delete(name)
+            return
         self.session.run("irm", None, "-rf", name)
 
     def exists(self, name):
+        return cache.lookup(self.cache_namespace, 'exists', name, lambda: self._exists(name))
+
+    def _exists(self, name):
+        if self.native is not None:
+            return self.native.exists(name)
         try:
             stdout = self.session.run("ils", None, name)[0]
             return stdout != ""
@@ -280,6 +469,14 @@ class IrodsStorage(Storage):
         return self.session.run("ils", None, "-l", path)[0]
 
     def listdir(self, path):
+        listing = cache.lookup(self.cache_namespace, 'listdir', path,
+                               lambda: self._listdir(path))
+        # copy so that callers modifying the listing do not modify the cached one
+        return tuple(list(entries) for entries in listing)
+
+    def _listdir(self, path):
+        if self.native is not None:
+            return self.native.listdir(path)
         stdout = self.ils_l(path).split("\n")
         listing = ([], [], [])
         directory = stdout[0][0:-1]
@@ -308,7 +505,139 @@ class IrodsStorage(Storage):
                     listing[2].append(size)
         return listing
 
+    def walk(self, path):
+        """
+        list a collection and everything below it with catalog queries rather than one
+        listdir per folder
+        :param path: the collection to walk
+        :return: an IrodsTree, empty if the collection does not exist
+        """
+        abspath = self._abspath(path)
+        if self.native is not None:
+            folders, files = self.native.walk(abspath)
+        else:
+            folders, files = self._walk(abspath)
+
+        # iRODS 'like' treats '_' and '%' as wildcards, quotes are matched by '_' and the data
+        # object query also matches siblings sharing the prefix, so keep only what lies below
+        # the collection
+        prefix = abspath + '/'
+        relative = path.rstrip('/')
+        folders = sorted(relative + f[len(abspath):] for f in set(folders)
+                         if f.startswith(prefix))
+        tree_files = []
+        seen = set()
+        for f in sorted(files, key=lambda f: f['path']):
+            # data objects are listed once per replica
+            if f['path'].startswith(prefix) and f['path'] not in seen:
+                seen.add(f['path'])
+                f['path'] = relative + f['path'][len(abspath):]
+                tree_files.append(f)
+        return IrodsTree(path, folders, tree_files)
+
+    def _walk(self, abspath):
+        # quotes and the wildcards in abspath widen the match; walk() keeps only what lies
+        # below the collection
+        folders = self._iquest("%s", "select COLL_NAME where COLL_NAME like {}"
+                               .format(_like_literal(abspath + '/%')))
+        rows = self._iquest("%s|%s|%s|%s/%s",
+                            "select DATA_SIZE, DATA_CHECKSUM, DATA_MODIFY_TIME, COLL_NAME, "
+                            "DATA_NAME where COLL_NAME like {}"
+                            .format(_like_literal(abspath + '%')))
+        files = []
+        for row in rows:
+            size, checksum, modified, path = row.split('|', 3)
+            files.append({'path': path, 'size': int(size), 'checksum': checksum.strip(),
+                          'modified': int(modified)})
+        return folders, files
+
+    def _iquest(self, output_format, query):
+        """
+        run a catalog query
+        :return: the output lines, an empty list if nothing matched
+        """
+        try:
+            stdout = self.session.run("iquest", None, "--no-page", output_format, query)[0]
+        except SessionException as ex:
+            if 'CAT_NO_ROWS_FOUND' in "{}{}".format(ex.stdout, ex.stderr):
+                return []
+            raise
+        lines = stdout.split("\n")
+        return [line for line in lines if line and not line.startswith('CAT_NO_ROWS_FOUND')]
+
+    def _abspath(self, name):
+        if name.startswith('/'):
+            return name.rstrip('/')
+        cwd = self.environment.cwd if self.environment else settings.IRODS_CWD
+        return os.path.join(cwd, name).rstrip('/')
+
+    def stat(self, name):
+        """
+        return size, checksum and modification time of a data object in one iRODS query
+        :param name: the data object path
+        :return: a dict with 'size' in bytes, 'checksum' as stored in iRODS (empty if not
+        computed) and 'modified' in seconds since the epoch
+        """
+        return cache.lookup(self.cache_namespace, 'stat', name, lambda: self._stat(name))
+
+    def _stat(self, name):
+        if self.native is not None:
+            return self.native.stat(name)
+        path = self._abspath(name)
+        coll_name, data_name = path.rsplit('/', 1)
+        if "'" in path:
+            condition = "COLL_NAME like {} and DATA_NAME like {}".format(
+                _like_literal(coll_name), _like_literal(data_name))
+        else:
+            condition = "COLL_NAME = '{}' and DATA_NAME = '{}'".format(coll_name, data_name)
+        rows = self._iquest("%s|%s|%s|%s/%s",
+                            "select DATA_SIZE, DATA_CHECKSUM, DATA_MODIFY_TIME, COLL_NAME, "
+                            "DATA_NAME where " + condition)
+        for row in rows:
+            size, checksum, modified, row_path = row.split('|', 3)
+            if row_path == path:
+                return {'size': int(size), 'checksum': checksum.strip(),
+                        'modified': int(modified)}
+        raise SessionException(-1, '', "{} does not exist".format(path))
+
+    @invalidates('name')
+    def checksum(self, name):
+        """
+        compute the checksum of a data object and record it in the iRODS catalog
+        :param name: the data object path
+        :return: the checksum in the default hash scheme of the zone
+        """
+        if self.native is not None:
+            return self.native.checksum(name)
+        # SessionException will be raised from run() in icommands.py
+        stdout = self.session.run("ichksum", None, "-f", name)[0]
+        return stdout.split("\n")[0].split()[-1]
+
+    def open_stream(self, name, offset=0):
+        """
+        open a data object for reading without copying it to local disk first
+        :param name: the data object path
+        :param offset: byte position to start reading from, only supported by the native
+        client (see can_seek)
+        :return: a file-like object with read() and close()
+        """
+        if self.native is not None:
+            return self.native.open(name, offset=offset)
+        if offset:
+            raise ValueError("reading from an offset requires IRODS_NATIVE_CLIENT")
+        return icommands.IcommandStream(self.session, name)
+
+    @property
+    def can_seek(self):
+        """whether open_stream can start reading in the middle of a data object"""
+        return self.native is not None
+
     def size(self, name):
+        return cache.lookup(self.cache_namespace, 'size', name, lambda: self._size(name))
+
+    def _size(self, name):
+        if self.native is not None:
+            return self.native.size(name)
         stdout = self.session.run("ils", None, "-l", name)[0].split()
         return int(stdout[3])
 
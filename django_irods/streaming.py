@@ -0,0 +1,155 @@
+"""HTTP range, validator and chunked streaming support for files served from iRODS.
+
+These are used by django_irods.views.download when a file cannot be handed to nginx
+through X-Accel-Redirect and has to be streamed by Django itself.
+"""
+
+import re
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+RANGE_RE = re.compile(r'^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$', re.I)
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range_header(header, size):
+    """ return the (start, end) byte positions, end inclusive, requested by a Range header
+
+    :param header: value of the HTTP Range header, or None
+    :param size: size of the file in bytes
+    :return: None if the whole file should be sent, which is the case when there is no
+    Range header or it is syntactically invalid or asks for several ranges (RFC 7233
+    permits ignoring it).
+    :raises RangeNotSatisfiable: if the range lies outside of the file
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header)
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if end < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def get_etag(file_info):
+    """ build a strong ETag from the iRODS checksum, falling back to size and mtime """
+    if file_info.get('checksum'):
+        return quote_etag(file_info['checksum'])
+    return quote_etag('{}-{}'.format(file_info['size'], file_info['modified']))
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return etag in [tag.strip().lstrip('W/') for tag in header.split(',')]
+
+
+def not_modified(request, etag, modified):
+    """ evaluate If-None-Match and If-Modified-Since for a GET request """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return since is not None and modified is not None and int(modified) <= since
+
+
+def range_applies(request, etag, modified):
+    """ evaluate If-Range: a Range header is honored only if the file did not change """
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        # weak validators never match for If-Range
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and modified is not None and int(modified) == since
+
+
+def iterate_stream(stream, length, chunk_size=None):
+    """ yield up to length bytes from a file-like object in chunks of bounded size
+
+    The stream is closed when iteration ends or when the response is closed early,
+    e.g., because the client went away.
+    """
+    chunk_size = chunk_size or getattr(settings, 'IRODS_STREAM_CHUNK_SIZE', 64 * 1024)
+    remaining = length
+    try:
+        while remaining > 0:
+            data = stream.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        stream.close()
+
+
+def build_response(request, file_info, open_stream, content_type, filename, seekable=True):
+    """ return a 200, 206, 304 or 416 response for a file stored in iRODS
+
+    :param request: the download request
+    :param file_info: dict with 'size', 'checksum' and 'modified' (seconds since epoch)
+    :param open_stream: callable taking a byte offset and returning a file-like object
+    positioned at that offset
+    :param content_type: mime type of the file
+    :param filename: name the file is saved as by the client
+    :param seekable: whether open_stream can start at an offset without reading the bytes
+    before it; if not, Range headers are ignored and the whole file is sent
+    """
+    size = file_info['size']
+    etag = get_etag(file_info)
+    modified = file_info.get('modified')
+
+    if not_modified(request, etag, modified):
+        response = HttpResponse(status=304)
+    else:
+        byte_range = None
+        if seekable and range_applies(request, etag, modified):
+            try:
+                byte_range = parse_range_header(request.META.get('HTTP_RANGE'), size)
+            except RangeNotSatisfiable:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = 'bytes */{}'.format(size)
+                response['Accept-Ranges'] = 'bytes'
+                return response
+
+        if byte_range is None:
+            start, length = 0, size
+            response = StreamingHttpResponse(iterate_stream(open_stream(0), length),
+                                             content_type=content_type)
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(iterate_stream(open_stream(start), length),
+                                             content_type=content_type, status=206)
+            response['Content-Range'] = 'bytes {}-{}/{}'.format(start, end, size)
+        response['Content-Length'] = length
+        response['Content-Disposition'] = 'attachment; filename="{name}"'.format(name=filename)
+
+    response['Accept-Ranges'] = 'bytes' if seekable else 'none'
+    response['ETag'] = etag
+    if modified is not None:
+        response['Last-Modified'] = http_date(int(modified))
+    return response
@@ -0,0 +1,258 @@
+"""An in-memory stand-in for an iRODS server speaking the python-irodsclient session API.
+
+Only the calls made by django_irods.native are implemented. All sessions created
+by one FakeIrodsServer share its catalog, as connections to one zone would.
+"""
+
+import hashlib
+import re
+import threading
+
+
+class FakeDoesNotExist(Exception):
+    pass
+
+
+class FakeMeta(object):
+    def __init__(self, name, value, units=None):
+        self.name = name
+        self.value = value
+        self.units = units
+
+
+class FakeMetadata(object):
+    def __init__(self, avus):
+        self._avus = avus
+
+    def get_all(self, name):
+        return [avu for avu in self._avus if avu.name == name]
+
+    def add(self, name, value, units=None):
+        self._avus.append(FakeMeta(name, value, units))
+
+    def remove(self, avu):
+        self._avus.remove(avu)
+
+
+class FakeDataObject(object):
+    def __init__(self, server, path):
+        self.path = path
+        self.name = path.rsplit('/', 1)[1]
+        content = server.objects[path]
+        self.size = len(content)
+        self.checksum = hashlib.md5(content).hexdigest()
+        self.modify_time = server.mtimes[path]
+        self.metadata = FakeMetadata(server.metadata.setdefault(path, []))
+
+    def chksum(self):
+        return self.checksum
+
+
+class FakeCollection(object):
+    def __init__(self, server, path):
+        self.path = path
+        self.name = path.rsplit('/', 1)[1]
+        self.metadata = FakeMetadata(server.metadata.setdefault(path, []))
+        self.subcollections = [FakeCollection(server, p) for p in sorted(server.collections)
+                               if p.rsplit('/', 1)[0] == path and p != path]
+        self.data_objects = [FakeDataObject(server, p) for p in sorted(server.objects)
+                             if p.rsplit('/', 1)[0] == path]
+
+
+class FakeCollectionManager(object):
+    def __init__(self, server):
+        self.server = server
+
+    def exists(self, path):
+        return path in self.server.collections
+
+    def get(self, path):
+        if path not in self.server.collections:
+            raise FakeDoesNotExist(path)
+        return FakeCollection(self.server, path)
+
+    def create(self, path):
+        parts = path.strip('/').split('/')
+        for i in range(1, len(parts) + 1):
+            self.server.collections.add('/' + '/'.join(parts[:i]))
+
+    def remove(self, path, recurse=True, force=False):
+        prefix = path + '/'
+        self.server.collections = set(p for p in self.server.collections
+                                      if p != path and not p.startswith(prefix))
+        for p in [p for p in self.server.objects if p.startswith(prefix)]:
+            del self.server.objects[p]
+
+    def move(self, src, dest):
+        prefix = src + '/'
+        self.server.collections = set(dest + p[len(src):] if p == src or p.startswith(prefix)
+                                      else p for p in self.server.collections)
+        for p in [p for p in self.server.objects if p.startswith(prefix)]:
+            self.server.objects[dest + p[len(src):]] = self.server.objects.pop(p)
+            self.server.mtimes[dest + p[len(src):]] = self.server.mtimes.pop(p)
+
+
+class FakeDataObjectManager(object):
+    def __init__(self, server):
+        self.server = server
+
+    def exists(self, path):
+        return path in self.server.objects
+
+    def get(self, path, local_path=None, **options):
+        if path not in self.server.objects:
+            raise FakeDoesNotExist(path)
+        if local_path:
+            with open(local_path, 'wb') as f:
+                f.write(self.server.objects[path])
+        return FakeDataObject(self.server, path)
+
+    def put(self, local_path, path, **options):
+        with open(local_path, 'rb') as f:
+            self.server.write(path, f.read())
+
+    def copy(self, src, dest, **options):
+        self.server.write(dest, self.server.objects[src])
+
+    def move(self, src, dest):
+        self.server.objects[dest] = self.server.objects.pop(src)
+        self.server.mtimes[dest] = self.server.mtimes.pop(src)
+
+    def unlink(self, path, force=False):
+        del self.server.objects[path]
+
+    def open(self, path, mode='r'):
+        from io import BytesIO
+        return BytesIO(self.server.objects[path])
+
+
+class FakeQuery(object):
+    """General queries on COLL_NAME and DATA_* columns filtered by '=' or 'like' criteria."""
+
+    def __init__(self, server, columns):
+        self.server = server
+        self.columns = columns
+        self.criteria = []
+
+    def filter(self, *criteria):
+        self.criteria.extend(criteria)
+        return self
+
+    @staticmethod
+    def _matches(criterion, value):
+        expected = getattr(criterion, '_value', criterion.value)
+        expected = str(expected).strip("'")
+        if criterion.op == 'like':
+            pattern = ''.join('.*' if c == '%' else '.' if c == '_' else re.escape(c)
+                              for c in expected)
+            return re.match(pattern + '$', value) is not None
+        return value == expected
+
+    def get_results(self):
+        if any(column.icat_key.startswith('DATA_') for column in self.columns):
+            rows = []
+            for path in sorted(self.server.objects):
+                obj = FakeDataObject(self.server, path)
+                rows.append({'COLL_NAME': path.rsplit('/', 1)[0], 'DATA_NAME': obj.name,
+                             'DATA_SIZE': obj.size, 'DATA_CHECKSUM': obj.checksum,
+                             'DATA_MODIFY_TIME': obj.modify_time})
+        else:
+            rows = [{'COLL_NAME': path} for path in sorted(self.server.collections)]
+        for row in rows:
+            if all(self._matches(c, row[c.query_key.icat_key]) for c in self.criteria):
+                yield dict((column, row[column.icat_key]) for column in self.columns)
+
+
+class FakeIrodsSession(object):
+    def __init__(self, server):
+        self.server = server
+        self.collections = FakeCollectionManager(server)
+        self.data_objects = FakeDataObjectManager(server)
+        self.cleaned_up = False
+
+    def query(self, *columns):
+        return FakeQuery(self.server, columns)
+
+    def cleanup(self):
+        self.cleaned_up = True
+
+
+class FakeIrodsServer(object):
+    """Shared in-memory catalog; pass server.session_factory to native.set_session_factory."""
+
+    def __init__(self, home='/hydroshareZone/home/wwwHydroProxy'):
+        self.collections = set()
+        self.objects = {}
+        self.mtimes = {}
+        self.metadata = {}
+        self.sessions = []
+        self._clock = 0
+        self._lock = threading.Lock()
+        FakeCollectionManager(self).create(home)
+
+    def write(self, path, content):
+        with self._lock:
+            self._clock += 1
+            self.objects[path] = content
+            self.mtimes[path] = self._clock
+
+    def session_factory(self, option):
+        session = FakeIrodsSession(self)
+        self.sessions.append(session)
+        return session
+
+
+class FakeIcommandsSession(object):
+    """Runs 'iquest' general queries against the catalog of a FakeIrodsServer, in place of the
+    icommands Session of IrodsStorage. Conditions are COLUMN = 'value' or COLUMN like 'value'
+    joined by 'and'; anything else is a parse error, as in iRODS."""
+
+    _condition = r"(\w+) (=|like) '([^']*)'"
+
+    def __init__(self, server):
+        self.server = server
+        self.queries = []
+
+    def run(self, icommand, data=None, *args):
+        from django_irods.icommands import SessionException
+
+        if icommand != 'iquest':
+            raise SessionException(-1, '', "{} is not supported".format(icommand))
+        output_format, query = args[-2:]
+        self.queries.append(query)
+        match = re.match(r"select (.+?) where ({0}(?: and {0})*)$".format(self._condition),
+                         query)
+        if match is None:
+            raise SessionException(-1, '', "parseUserQuery: syntax error in " + query)
+        columns = [column.strip() for column in match.group(1).split(',')]
+        criteria = re.findall(self._condition, match.group(2))
+
+        lines = []
+        for row in self._rows(columns):
+            if all(self._matches(op, expected, row[column])
+                   for column, op, expected in criteria):
+                values = tuple(str(row[column]) for column in columns)
+                lines.append(output_format % values)
+        if not lines:
+            raise SessionException(1, 'CAT_NO_ROWS_FOUND: Nothing was found matching your query',
+                                   '')
+        return "\n".join(lines) + "\n", ''
+
+    def _rows(self, columns):
+        if any(column.startswith('DATA_') for column in columns):
+            for path in sorted(self.server.objects):
+                obj = FakeDataObject(self.server, path)
+                yield {'COLL_NAME': path.rsplit('/', 1)[0], 'DATA_NAME': obj.name,
+                       'DATA_SIZE': obj.size, 'DATA_CHECKSUM': obj.checksum,
+                       'DATA_MODIFY_TIME': obj.modify_time}
+        else:
+            for path in sorted(self.server.collections):
+                yield {'COLL_NAME': path}
+
+    @staticmethod
+    def _matches(op, expected, value):
+        if op == 'like':
+            pattern = ''.join('.*' if c == '%' else '.' if c == '_' else re.escape(c)
+                              for c in expected)
+            return re.match(pattern + '$', value) is not None
+        return value == expected
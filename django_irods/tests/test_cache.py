@@ -0,0 +1,132 @@
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from django_irods import cache, native
+from django_irods.middleware import IrodsCacheMiddleware
+from django_irods.storage import IrodsStorage
+from django_irods.tests.fake_irods import FakeIrodsServer
+
+HOME = '/hydroshareZone/home/wwwHydroProxy'
+
+
+@override_settings(IRODS_NATIVE_CLIENT=True, IRODS_CWD=HOME, IRODS_CACHE_TTL=0)
+class TestLookupCache(SimpleTestCase):
+    def setUp(self):
+        super(TestLookupCache, self).setUp()
+        self.server = FakeIrodsServer(home=HOME)
+        native.set_session_factory(self.server.session_factory)
+        native.operation_stats.reset()
+        cache.reset_stats()
+        self.storage = IrodsStorage()
+        self.storage.saveFile('', 'abc/data/contents/folder/', create_directory=True)
+        self.server.write(HOME + '/abc/data/contents/file.txt', 'content')
+
+    def tearDown(self):
+        native.set_session_factory(None)
+        super(TestLookupCache, self).tearDown()
+
+    def _count(self, operation):
+        return native.operation_stats.as_dict().get('native:' + operation, {}).get('count', 0)
+
+    def test_no_caching_outside_scope(self):
+        self.storage.exists('abc/data/contents/file.txt')
+        self.storage.exists('abc/data/contents/file.txt')
+        self.assertEqual(self._count('exists'), 2)
+
+    def test_lookups_are_memoized_in_scope(self):
+        with cache.scope():
+            for _ in range(3):
+                self.assertTrue(self.storage.exists('abc/data/contents/file.txt'))
+                self.assertEqual(IrodsStorage().size('abc/data/contents/file.txt'), 7)
+                self.assertEqual(self.storage.listdir('abc/data/contents')[0], ['folder'])
+                self.assertIsNone(self.storage.getAVU('abc', 'bag_modified'))
+        self.assertEqual(self._count('exists'), 1)
+        self.assertEqual(self._count('size'), 1)
+        self.assertEqual(self._count('listdir'), 1)
+        self.assertEqual(self._count('getAVU'), 1)
+        self.assertEqual(cache.get_stats()['local_hits'], 8)
+
+    def test_middleware_starts_fresh_scope(self):
+        request = RequestFactory().get('/')
+
+        def view(request):
+            self.assertTrue(cache.is_active())
+            self.storage.exists('abc/data/contents/file.txt')
+            raise ValueError
+
+        # a scope left over on this thread by an earlier request is not reused
+        cache.activate()
+        self.storage.exists('abc/data/contents/file.txt')
+        middleware = IrodsCacheMiddleware(view)
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                middleware(request)
+            self.assertFalse(cache.is_active())
+        self.assertEqual(self._count('exists'), 3)
+
+        # the same holds with MIDDLEWARE_CLASSES, where a response may never be processed
+        cache.activate()
+        middleware.process_request(request)
+        self.storage.exists('abc/data/contents/file.txt')
+        middleware.process_exception(request, ValueError())
+        self.assertFalse(cache.is_active())
+        self.assertEqual(self._count('exists'), 4)
+
+    def test_writes_invalidate(self):
+        with cache.scope():
+            self.assertIsNone(self.storage.getAVU('abc', 'bag_modified'))
+            self.storage.setAVU('abc', 'bag_modified', 'true')
+            self.assertEqual(self.storage.getAVU('abc', 'bag_modified'), 'true')
+
+            self.assertFalse(self.storage.exists('abc/data/contents/new/x.txt'))
+            self.assertEqual(self.storage.listdir('abc/data/contents')[0], ['folder'])
+            self.storage.copyFiles('abc/data/contents/file.txt', 'abc/data/contents/new/x.txt')
+            # the new file, its parent listing and the ancestors are looked up again
+            self.assertTrue(self.storage.exists('abc/data/contents/new/x.txt'))
+            self.assertEqual(self.storage.listdir('abc/data/contents')[0], ['folder', 'new'])
+
+            self.storage.delete('abc/data/contents/new')
+            self.assertFalse(self.storage.exists('abc/data/contents/new/x.txt'))
+
+    def test_cached_listing_is_not_shared(self):
+        with cache.scope():
+            self.storage.listdir('abc/data/contents')[0].append('bogus')
+            self.assertEqual(self.storage.listdir('abc/data/contents')[0], ['folder'])
+
+    def test_user_sessions_are_not_cached(self):
+        self.storage.cache_namespace = None
+        with cache.scope():
+            self.storage.exists('abc/data/contents/file.txt')
+            self.storage.exists('abc/data/contents/file.txt')
+        self.assertEqual(self._count('exists'), 2)
+
+
+@override_settings(IRODS_NATIVE_CLIENT=True, IRODS_CWD=HOME, IRODS_CACHE_TTL=60,
+                   IRODS_CACHE_ALIAS='irods',
+                   CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+                           'irods': {'BACKEND':
+                                     'django.core.cache.backends.locmem.LocMemCache'}})
+class TestSharedLookupCache(SimpleTestCase):
+    def setUp(self):
+        super(TestSharedLookupCache, self).setUp()
+        self.server = FakeIrodsServer(home=HOME)
+        native.set_session_factory(self.server.session_factory)
+        native.operation_stats.reset()
+        self.storage = IrodsStorage()
+        self.storage.saveFile('', 'abc/data/', create_directory=True)
+
+    def tearDown(self):
+        native.set_session_factory(None)
+        super(TestSharedLookupCache, self).tearDown()
+
+    def test_shared_between_scopes(self):
+        with cache.scope():
+            self.assertIsNone(self.storage.getAVU('abc', 'metadata_dirty'))
+        with cache.scope():
+            # served from the shared tier, as another worker process would be
+            self.assertIsNone(self.storage.getAVU('abc', 'metadata_dirty'))
+        self.assertEqual(native.operation_stats.as_dict()['native:getAVU']['count'], 1)
+
+        with cache.scope():
+            self.storage.setAVU('abc', 'metadata_dirty', 'false')
+        with cache.scope():
+            self.assertEqual(self.storage.getAVU('abc', 'metadata_dirty'), 'false')
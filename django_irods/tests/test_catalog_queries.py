@@ -0,0 +1,58 @@
+from django.test import SimpleTestCase, override_settings
+
+from django_irods import cache
+from django_irods.icommands import SessionException
+from django_irods.storage import IrodsStorage
+from django_irods.tests.fake_irods import FakeIrodsServer, FakeIcommandsSession, \
+    FakeCollectionManager
+
+HOME = '/hydroshareZone/home/wwwHydroProxy'
+
+
+@override_settings(IRODS_NATIVE_CLIENT=False, IRODS_CWD=HOME)
+class TestCatalogQueries(SimpleTestCase):
+    """catalog queries of IrodsStorage run with iquest"""
+
+    def setUp(self):
+        super(TestCatalogQueries, self).setUp()
+        self.server = FakeIrodsServer(home=HOME)
+        self.storage = IrodsStorage()
+        self.assertIsNone(self.storage.native)
+        self.storage.session = FakeIcommandsSession(self.server)
+        cache.reset_stats()
+
+    def _write(self, path, content='some file content'):
+        path = HOME + '/' + path
+        FakeCollectionManager(self.server).create(path.rsplit('/', 1)[0])
+        self.server.write(path, content)
+
+    def test_stat(self):
+        self._write("abc/data/contents/file.txt")
+        self._write("abc/data/contents/O'Brien's data.csv", 'a,b')
+        self._write("abc/data/contents/O_Brien_s data.csv", 'a,b,c')
+
+        self.assertEqual(self.storage.stat('abc/data/contents/file.txt')['size'], 17)
+        # the quotes don't break the query, and the names they are matched to by a wildcard
+        # are left out
+        self.assertEqual(self.storage.stat("abc/data/contents/O'Brien's data.csv")['size'], 3)
+        self.assertEqual(self.storage.stat("abc/data/contents/O_Brien_s data.csv")['size'], 5)
+
+    def test_stat_of_missing_file(self):
+        self._write("abc/data/contents/O_Brien_s data.csv")
+        for name in ('abc/data/contents/missing.txt', "abc/data/contents/O'Brien's data.csv"):
+            with self.assertRaises(SessionException):
+                self.storage.stat(name)
+
+    def test_walk(self):
+        self._write("abc/data/contents/it's 100%_done/file.txt")
+        self._write("abc/data/contents/it's 100%_done/sub/deep.txt")
+        # collections matched by the quote and the wildcards of the query
+        self._write("abc/data/contents/it_s 100%_done/other.txt")
+        self._write("abc/data/contents/it's 100%Xdone/other.txt")
+        self._write("abc/data/contents/it's 1000 done/other.txt")
+
+        tree = self.storage.walk("abc/data/contents/it's 100%_done")
+        self.assertEqual(tree.folders, ["abc/data/contents/it's 100%_done/sub"])
+        self.assertEqual(tree.file_paths, ["abc/data/contents/it's 100%_done/file.txt",
+                                           "abc/data/contents/it's 100%_done/sub/deep.txt"])
+        self.assertEqual(self.storage.walk("abc/data/contents/it's").files, [])
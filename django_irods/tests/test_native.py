@@ -0,0 +1,148 @@
+import os
+from tempfile import NamedTemporaryFile
+
+from django.test import SimpleTestCase, override_settings
+
+from django_irods import native
+from django_irods.icommands import SessionException
+from django_irods.storage import IrodsStorage
+from django_irods.tests.fake_irods import FakeIrodsServer
+
+HOME = '/hydroshareZone/home/wwwHydroProxy'
+
+
+@override_settings(IRODS_NATIVE_CLIENT=True, IRODS_CWD=HOME, IRODS_NATIVE_POOL_SIZE=2)
+class TestNativeStorage(SimpleTestCase):
+    def setUp(self):
+        super(TestNativeStorage, self).setUp()
+        self.server = FakeIrodsServer(home=HOME)
+        native.set_session_factory(self.server.session_factory)
+        native.operation_stats.reset()
+        self.storage = IrodsStorage()
+        with NamedTemporaryFile(delete=False) as f:
+            f.write('some file content')
+        self.local_file = f.name
+
+    def tearDown(self):
+        native.set_session_factory(None)
+        os.unlink(self.local_file)
+        super(TestNativeStorage, self).tearDown()
+
+    def test_storage_api(self):
+        self.assertIsNotNone(self.storage.native)
+        self.storage.saveFile(self.local_file, 'abc/data/contents/file.txt',
+                              create_directory=True)
+        self.assertTrue(self.storage.exists('abc/data/contents/file.txt'))
+        self.assertTrue(self.storage.exists('abc/data/contents'))
+        self.assertFalse(self.storage.exists('abc/data/contents/missing.txt'))
+        self.assertEqual(self.storage.size('abc/data/contents/file.txt'), 17)
+
+        self.storage.saveFile('', 'abc/data/contents/folder/', create_directory=True)
+        dirs, files, sizes = self.storage.listdir('abc/data/contents')
+        self.assertEqual(dirs, ['folder'])
+        self.assertEqual(files, ['file.txt'])
+        self.assertEqual(sizes, ['-1', '17'])
+
+        self.storage.copyFiles('abc/data/contents', 'xyz/data/contents')
+        self.assertTrue(self.storage.exists('xyz/data/contents/file.txt'))
+        self.storage.moveFile('xyz/data/contents/file.txt', 'xyz/data/contents/moved.txt')
+        self.assertFalse(self.storage.exists('xyz/data/contents/file.txt'))
+        self.assertTrue(self.storage.exists('xyz/data/contents/moved.txt'))
+
+        self.storage.delete('xyz')
+        self.assertFalse(self.storage.exists('xyz/data/contents/moved.txt'))
+        # deleting a path that is not there is not an error, as with 'irm -rf'
+        self.storage.delete('xyz')
+
+        tmp = self.storage.download('abc/data/contents/file.txt')
+        self.assertEqual(tmp.read(), 'some file content')
+
+    def test_avu(self):
+        self.storage.saveFile('', 'abc/', create_directory=True)
+        self.assertIsNone(self.storage.getAVU('abc', 'bag_modified'))
+        self.storage.setAVU('abc', 'bag_modified', 'true')
+        self.storage.setAVU('abc', 'bag_modified', 'false')
+        self.assertEqual(self.storage.getAVU('abc', 'bag_modified'), 'false')
+
+    def test_walk(self):
+        for path in ('abc/data/contents/a/b', 'abc/data/contents/a_c', 'abc/data/contentsX'):
+            self.storage.saveFile('', path + '/', create_directory=True)
+        self.storage.saveFile(self.local_file, 'abc/data/contents/file.txt')
+        self.storage.saveFile(self.local_file, 'abc/data/contents/a/b/deep.txt')
+        self.storage.saveFile(self.local_file, 'abc/data/contentsX/sibling.txt')
+        native.operation_stats.reset()
+
+        tree = self.storage.walk('abc/data/contents')
+        self.assertEqual(native.operation_stats.as_dict()['native:walk']['count'], 1)
+        self.assertEqual(tree.folders, ['abc/data/contents/a', 'abc/data/contents/a/b',
+                                        'abc/data/contents/a_c'])
+        self.assertEqual(tree.file_paths, ['abc/data/contents/a/b/deep.txt',
+                                           'abc/data/contents/file.txt'])
+        self.assertEqual(tree.total_size, 34)
+        self.assertEqual(tree.listdir(), self.storage.listdir('abc/data/contents'))
+        self.assertEqual(tree.listdir('abc/data/contents/a/b'), ([], ['deep.txt'], ['17']))
+
+        self.assertEqual(self.storage.walk(HOME + '/abc/data/contents/a').folders,
+                         [HOME + '/abc/data/contents/a/b'])
+        self.assertEqual(self.storage.walk('abc/missing').files, [])
+
+    @override_settings(REMOTE_USE_IRODS=True, IRODS_DEFAULT_RESOURCE='dataResc',
+                       HS_IRODS_USER_ZONE_DEF_RES='userZoneResc')
+    def test_federated_pool_uses_federated_settings(self):
+        self.assertEqual(native._session_settings('default')['default_resource'], 'dataResc')
+        self.assertEqual(native._session_settings('federated')['default_resource'],
+                         'userZoneResc')
+
+        options = []
+
+        def session_factory(option):
+            options.append(option)
+            return self.server.session_factory(option)
+
+        native.set_session_factory(session_factory)
+        backend = native.get_backend('federated')
+        self.assertEqual(backend.default_resource, 'userZoneResc')
+        backend.mkdir(HOME + '/abc')
+        self.assertEqual(options, ['federated'])
+        self.assertEqual(native.get_stats()['pools'][0]['option'], 'federated')
+
+    def test_errors_raise_session_exception(self):
+        with self.assertRaises(SessionException):
+            self.storage.size('abc/not/there.txt')
+
+    def test_pool_reuses_connections(self):
+        self.storage.saveFile(self.local_file, 'abc/file.txt', create_directory=True)
+        for _ in range(10):
+            self.storage.exists('abc/file.txt')
+            IrodsStorage().size('abc/file.txt')
+        self.assertEqual(len(self.server.sessions), 1)
+
+        stats = self.storage.get_stats()
+        pool = stats['pools'][0]
+        self.assertEqual(pool['created'], 1)
+        self.assertEqual(pool['in_use'], 0)
+        self.assertEqual(stats['operations']['native:exists']['count'], 10)
+        self.assertEqual(stats['operations']['native:connect']['count'], 1)
+
+    def test_pool_is_bounded(self):
+        pool = native.get_pool('default')
+        with pool.session():
+            with pool.session():
+                self.assertEqual(pool.in_use, 2)
+        self.assertEqual(pool.in_use, 0)
+        self.assertEqual(pool.created, 2)
+
+        pool.timeout = 0.01
+        with pool.session():
+            with pool.session():
+                with self.assertRaises(native.NativeIrodsException):
+                    with pool.session():
+                        pass
+
+    def test_broken_connection_is_discarded(self):
+        pool = native.get_pool('default')
+        with self.assertRaises(IOError):
+            with pool.session():
+                raise IOError("connection reset")
+        self.assertEqual(pool.discarded, 1)
+        self.assertTrue(self.server.sessions[0].cleaned_up)
@@ -0,0 +1,96 @@
+from io import BytesIO
+
+from django.test import SimpleTestCase, RequestFactory
+from django.utils.http import http_date
+
+from django_irods.streaming import parse_range_header, build_response, RangeNotSatisfiable
+
+CONTENT = b'0123456789' * 10
+FILE_INFO = {'size': len(CONTENT), 'checksum': 'sha2:abc', 'modified': 1500000000}
+
+
+class TestStreaming(SimpleTestCase):
+    def setUp(self):
+        super(TestStreaming, self).setUp()
+        self.factory = RequestFactory()
+        self.opened = []
+
+    def _open_stream(self, offset):
+        stream = BytesIO(CONTENT)
+        stream.seek(offset)
+        self.opened.append(stream)
+        return stream
+
+    def _get(self, **headers):
+        request = self.factory.get('/django_irods/download/x', **headers)
+        return build_response(request, FILE_INFO, self._open_stream, 'text/plain', 'x.txt')
+
+    def test_parse_range_header(self):
+        self.assertIsNone(parse_range_header(None, 100))
+        self.assertIsNone(parse_range_header('bytes=0-1,5-6', 100))
+        self.assertIsNone(parse_range_header('lines=1-2', 100))
+        self.assertEqual(parse_range_header('bytes=10-19', 100), (10, 19))
+        self.assertEqual(parse_range_header('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range_header('bytes=90-500', 100), (90, 99))
+        self.assertEqual(parse_range_header('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_range_header('bytes=-500', 100), (0, 99))
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range_header('bytes=100-', 100)
+
+    def test_full_download(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['ETag'], '"sha2:abc"')
+        self.assertEqual(response['Last-Modified'], http_date(1500000000))
+        self.assertTrue(self.opened[0].closed)
+
+    def test_range_download(self):
+        response = self._get(HTTP_RANGE='bytes=15-24')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[15:25])
+        self.assertEqual(response['Content-Range'], 'bytes 15-24/100')
+        self.assertEqual(response['Content-Length'], '10')
+
+    def test_range_is_ignored_when_not_seekable(self):
+        request = self.factory.get('/django_irods/download/x', HTTP_RANGE='bytes=15-24')
+        response = build_response(request, FILE_INFO, self._open_stream, 'text/plain', 'x.txt',
+                                  seekable=False)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Accept-Ranges'], 'none')
+
+    def test_unsatisfiable_range(self):
+        response = self._get(HTTP_RANGE='bytes=200-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+        self.assertEqual(self.opened, [])
+
+    def test_if_range(self):
+        response = self._get(HTTP_RANGE='bytes=15-24', HTTP_IF_RANGE='"sha2:abc"')
+        self.assertEqual(response.status_code, 206)
+        # the file changed since the client's first part: send all of it
+        response = self._get(HTTP_RANGE='bytes=15-24', HTTP_IF_RANGE='"sha2:old"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        response = self._get(HTTP_RANGE='bytes=15-24', HTTP_IF_RANGE=http_date(1500000000))
+        self.assertEqual(response.status_code, 206)
+
+    def test_conditional_get(self):
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH='"sha2:abc"').status_code, 304)
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH='"sha2:old"').status_code, 200)
+        self.assertEqual(self._get(HTTP_IF_MODIFIED_SINCE=http_date(1500000000)).status_code,
+                         304)
+        self.assertEqual(self._get(HTTP_IF_MODIFIED_SINCE=http_date(1400000000)).status_code,
+                         200)
+
+    def test_chunks_are_bounded(self):
+        request = self.factory.get('/django_irods/download/x')
+        with self.settings(IRODS_STREAM_CHUNK_SIZE=8):
+            response = build_response(request, FILE_INFO, self._open_stream, 'text/plain',
+                                      'x.txt')
+            chunks = list(response.streaming_content)
+        self.assertEqual(max(len(chunk) for chunk in chunks), 8)
+        self.assertEqual(b''.join(chunks), CONTENT)
@@ -1,5 +1,6 @@
 from django.conf.urls import url
-from django_irods.views import rest_check_task_status, rest_download, download, check_task_status
+from django_irods.views import rest_check_task_status, rest_download, download, \
+    check_task_status, irods_stats
 
 urlpatterns = [
     # for download request from resource landing page
@@ -13,4 +14,6 @@ urlpatterns = [
     url(r'^rest_check_task_status/(?P<task_id>[A-z0-9\-]+)$',
         rest_check_task_status,
         name='rest_check_task_status'),
+    # for administrators to monitor iRODS connection pooling
+    url(r'^irods_stats/$', irods_stats, name='irods_stats'),
 ]
\ No newline at end of file
@@ -6,10 +6,11 @@ from uuid import uuid4
 
 from django.conf import settings
 from django.core.exceptions import PermissionDenied
-from django.http import HttpResponse, FileResponse, HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect
 from rest_framework.decorators import api_view
 
-from django_irods import icommands
+from django_irods import icommands, streaming
+from django_irods.storage import IrodsStorage
 from hs_core.hydroshare import check_resource_type
 from hs_core.hydroshare.hs_bagit import create_bag_files
 from hs_core.signals import pre_download_file, pre_check_bag_flag
@@ -55,6 +56,9 @@ def download(request, path, rest_call=False, use_async=True, use_reverse_proxy=T
     4. a bag that needs to be updated and then returned.
     6. a previously zipped file that was zipped asynchronously.
 
+    Files that are not handed to nginx are streamed in bounded chunks and support
+    conditional requests based on the iRODS checksum and modification time, and HTTP
+    Range and If-Range requests when they are read through the native iRODS client.
     """
     if __debug__:
         logger.debug("request path is {}".format(path))
@@ -131,21 +135,20 @@ def download(request, path, rest_call=False, use_async=True, use_reverse_proxy=T
 
             # check for single file aggregations
             if "data/contents/" in path:  # not a metadata file
-                for f in ResourceFile.objects.filter(object_id=res.id):
-                    if path == f.storage_path:
-                        is_sf_agg_file = True
-                        if not is_zip_request and f.has_logical_file and \
-                                f.logical_file.is_single_file_aggregation:
-                            download_url = request.GET.get('url_download', 'false').lower()
-                            if download_url == 'false':
-                                # redirect to referenced url in the url file instead
-                                redirect_url = f.logical_file.redirect_url
-                                if redirect_url:
-                                    return HttpResponseRedirect(redirect_url)
-                        if __debug__:
-                            logger.debug(
-                                "request for single file aggregation {}".format(path))
-                        break
+                f = ResourceFile.get_by_storage_path(res, irods_path)
+                if f is not None:
+                    is_sf_agg_file = True
+                    if not is_zip_request and f.has_logical_file and \
+                            f.logical_file.is_single_file_aggregation:
+                        download_url = request.GET.get('url_download', 'false').lower()
+                        if download_url == 'false':
+                            # redirect to referenced url in the url file instead
+                            redirect_url = f.logical_file.redirect_url
+                            if redirect_url:
+                                return HttpResponseRedirect(redirect_url)
+                    if __debug__:
+                        logger.debug(
+                            "request for single file aggregation {}".format(path))
 
             if is_zip_request:
                 daily_date = datetime.datetime.today().strftime('%Y-%m-%d')
@@ -310,10 +313,10 @@ def download(request, path, rest_call=False, use_async=True, use_reverse_proxy=T
     mime_type = mimetypes.guess_type(output_path)
     if mime_type[0] is not None:
         mtype = mime_type[0]
-    # retrieve file size to set up Content-Length header
-    # TODO: standardize this to make it less brittle
-    stdout = session.run("ils", None, "-l", irods_output_path)[0].split()
-    flen = int(stdout[3])
+    # retrieve file size to set up Content-Length header, plus checksum and modification
+    # time for the validators of a locally streamed response
+    file_info = istorage.stat(irods_output_path)
+    flen = file_info['size']
 
     # Allow reverse proxy if request was forwarded by nginx (HTTP_X_DJANGO_REVERSE_PROXY='true')
     # and reverse proxy is possible according to configuration (SENDFILE_ON=True)
@@ -388,17 +391,25 @@ def download(request, path, rest_call=False, use_async=True, use_reverse_proxy=T
     # if reverse proxy is enabled, then this is because the resource is remote and federated
     # OR the user specifically requested a non-proxied download.
 
-    options = ('-',)  # we're redirecting to stdout.
-    # this unusual way of calling works for streaming federated or local resources
     if __debug__:
         logger.debug("Locally streaming {}".format(output_path))
-    # track download count
-    res.update_download_count()
-    proc = session.run_safe('iget', None, irods_output_path, *options)
-    response = FileResponse(proc.stdout, content_type=mtype)
-    response['Content-Disposition'] = 'attachment; filename="{name}"'.format(
-        name=output_path.split('/')[-1])
-    response['Content-Length'] = flen
+
+    def open_stream(offset):
+        if 'environment' in kwargs:
+            # this unusual way of calling works for streaming federated or local resources
+            return icommands.IcommandStream(session, irods_output_path)
+        return istorage.open_stream(irods_output_path, offset=offset)
+
+    # supports Range and conditional requests so that large files can be resumed or
+    # fetched in parallel parts. iget can only stream a file from its start, so ranges are
+    # not served without the native client: each part would read all bytes before it.
+    seekable = 'environment' not in kwargs and istorage.can_seek
+    response = streaming.build_response(request, file_info, open_stream, mtype,
+                                        output_path.split('/')[-1], seekable=seekable)
+    # track download count, but only once for a file fetched in several ranges
+    if response.status_code == 200 or \
+            (response.status_code == 206 and response['Content-Range'].startswith('bytes 0-')):
+        res.update_download_count()
     return response
 
 
@@ -434,3 +445,10 @@ def check_task_status(request, task_id=None, *args, **kwargs):
 def rest_check_task_status(request, task_id, *args, **kwargs):
     # need to have a separate view function just for REST API call
     return check_task_status(request, task_id, *args, **kwargs)
+
+
+def irods_stats(request, *args, **kwargs):
+    """ report iRODS pool, cache and latency statistics of the serving process """
+    if not request.user.is_superuser:
+        raise PermissionDenied("Only administrators can view iRODS statistics")
+    return HttpResponse(json.dumps(IrodsStorage().get_stats()), content_type="application/json")
@@ -277,6 +277,8 @@ class Command(BaseCommand):
                     if gcp.allow_view != (not options['prohibit_view']):
                         gcp.allow_view = not options['prohibit_view']
                         gcp.save()
+                        GroupCommunityPrivilege.refresh_effective_privileges(
+                            group=group, community=community)
                     # pass privilege changes through the privilege system to record provenance.
                     if gcp.privilege != privilege or owner != gcp.grantor:
                         GroupCommunityPrivilege.share(group=group, community=community,
@@ -295,6 +297,8 @@ class Command(BaseCommand):
                     if gcp.allow_view != (not options['prohibit_view']):
                         gcp.allow_view = not options['prohibit_view']
                         gcp.save()
+                        GroupCommunityPrivilege.refresh_effective_privileges(
+                            group=group, community=community)
 
             elif action == 'remove':
 
@@ -0,0 +1,177 @@
+"""
+This checks the materialized effective privileges of users against the privilege tables
+and the queries that computed access before they were materialized, and optionally
+repairs them. With --refresh, it computes them without checking, e.g. after the privilege
+tables were changed without going through PrivilegeBase.update.
+
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from hs_core.models import BaseResource
+from hs_access_control.models import PrivilegeCodes
+from hs_access_control.models.effective_privilege import EffectiveResourcePrivilege, \
+    compute_effective_privileges
+from hs_access_control.management.utilities import user_from_name
+
+
+def usage():
+    print("effective_privilege usage:")
+    print("  effective_privilege [{username} ...] [--repair] [--privileges] [--refresh]")
+    print("Where:")
+    print("  {username} is a user name. If none is given, all users are checked.")
+    print("  --repair recomputes the privileges of users whose privileges differ.")
+    print("  --refresh recomputes the privileges of the users without checking them.")
+    print("  --privileges also checks the privilege of each resource the user can view.")
+
+
+def stored_privileges(user_ids):
+    """ the stored privileges of some users, in the form of compute_effective_privileges """
+    return {(r.user_id, r.resource_id): (r.user_privilege, r.group_privilege,
+                                         r.community_privilege, r.view, r.edit)
+            for r in EffectiveResourcePrivilege.objects.filter(user_id__in=user_ids)}
+
+
+def reference_view_resources(user):
+    """ the query UserAccess.view_resources made before privileges were materialized """
+    return BaseResource.objects.filter(
+        # direct access
+        Q(r2urp__user=user) |
+        # access via a group
+        Q(r2grp__group__gaccess__active=True,
+          r2grp__group__g2ugp__user=user) |
+        # access via an unprivileged peer group in a community
+        Q(r2grp__group__gaccess__active=True,
+          r2grp__group__g2gcp__allow_view=True,
+          r2grp__group__g2gcp__community__c2gcp__group__gaccess__active=True,
+          r2grp__group__g2gcp__community__c2gcp__group__g2ugp__user=user) |
+        # access via a privileged peer group in a community
+        Q(r2grp__group__gaccess__active=True,
+          r2grp__group__g2gcp__community__c2gcp__privilege=PrivilegeCodes.CHANGE,
+          r2grp__group__g2gcp__community__c2gcp__group__gaccess__active=True,
+          r2grp__group__g2gcp__community__c2gcp__group__g2ugp__user=user)
+        ).distinct()
+
+
+def reference_edit_resources(user):
+    """ the query UserAccess.edit_resources made before privileges were materialized """
+    return BaseResource.objects.filter(
+        Q(raccess__immutable=False,
+          r2urp__user=user,
+          r2urp__privilege__lte=PrivilegeCodes.CHANGE) |
+        Q(raccess__immutable=False,
+          r2grp__group__gaccess__active=True,
+          r2grp__group__g2ugp__user=user,
+          r2grp__privilege=PrivilegeCodes.CHANGE) |
+        Q(raccess__immutable=False,
+          r2grp__group__gaccess__active=True,
+          r2grp__privilege=PrivilegeCodes.CHANGE,
+          r2grp__group__g2gcp__community__c2gcp__group__gaccess__active=True,
+          r2grp__group__g2gcp__community__c2gcp__group__g2ugp__user=user,
+          r2grp__group__g2gcp__community__c2gcp__privilege=PrivilegeCodes.CHANGE))\
+        .distinct()
+
+
+def check_queries(user, privileges=False):
+    """ whether view_resources, edit_resources and privileges agree with the reference queries """
+    consistent = True
+    for name, reference in (('view_resources', reference_view_resources),
+                            ('edit_resources', reference_edit_resources)):
+        expected = set(reference(user).values_list('id', flat=True))
+        actual = set(getattr(user.uaccess, name).values_list('id', flat=True))
+        if expected != actual:
+            print("user '{}' (id={}): {} missing {} extra {}"
+                  .format(user.username, user.id, name,
+                          sorted(expected - actual), sorted(actual - expected)))
+            consistent = False
+    if privileges:
+        for resource in reference_view_resources(user).select_related('raccess'):
+            raccess = resource.raccess
+            expected = min(raccess.get_effective_user_privilege(user),
+                           raccess.get_effective_group_privilege(user),
+                           raccess.get_effective_community_privilege(user))
+            actual = raccess.get_effective_privilege(user)
+            if expected != actual:
+                print("user '{}' (id={}): privilege over {} is {}, expected {}"
+                      .format(user.username, user.id, resource.short_id, actual, expected))
+                consistent = False
+    return consistent
+
+
+class Command(BaseCommand):
+    help = """Check and repair materialized effective privileges."""
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('usernames', nargs='*', type=str)
+
+        parser.add_argument(
+            '--repair',
+            action='store_true',  # True for presence, False for absence
+            dest='repair',  # value is options['repair']
+            help='recompute privileges that differ',
+        )
+
+        parser.add_argument(
+            '--privileges',
+            action='store_true',  # True for presence, False for absence
+            dest='privileges',  # value is options['privileges']
+            help='also check the privilege over each resource the user can view',
+        )
+
+        parser.add_argument(
+            '--refresh',
+            action='store_true',  # True for presence, False for absence
+            dest='refresh',  # value is options['refresh']
+            help='recompute privileges without checking them',
+        )
+
+        parser.add_argument(
+            '--chunk',
+            type=int,
+            dest='chunk',
+            default=500,
+            help='number of users to check at a time',
+        )
+
+    def handle(self, *args, **options):
+
+        if options['usernames']:
+            user_ids = []
+            for username in options['usernames']:
+                user = user_from_name(username)
+                if user is None:
+                    usage()
+                    exit(1)
+                user_ids.append(user.id)
+        else:
+            user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+
+        chunk = options['chunk']
+        if options['refresh']:
+            for start in range(0, len(user_ids), chunk):
+                EffectiveResourcePrivilege.refresh(users=user_ids[start:start + chunk])
+            print("{} users refreshed".format(len(user_ids)))
+            return
+
+        checked = 0
+        differing = set()
+        for start in range(0, len(user_ids), chunk):
+            some_ids = user_ids[start:start + chunk]
+            computed = compute_effective_privileges(user_ids=some_ids)
+            stored = stored_privileges(some_ids)
+            for key in set(computed.keys()) | set(stored.keys()):
+                if computed.get(key) != stored.get(key):
+                    print("user id={} resource id={}: stored {} computed {}"
+                          .format(key[0], key[1], stored.get(key), computed.get(key)))
+                    differing.add(key[0])
+            for user in User.objects.filter(id__in=some_ids, is_active=True):
+                if not check_queries(user, privileges=options['privileges']):
+                    differing.add(user.id)
+            checked += len(some_ids)
+
+        print("{} users checked, {} with differing privileges".format(checked, len(differing)))
+        if options['repair'] and differing:
+            EffectiveResourcePrivilege.refresh(users=sorted(differing))
+            print("{} users repaired".format(len(differing)))
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+import django.db.models.deletion
+
+# PrivilegeCodes, as of this migration
+CHANGE = 2
+VIEW = 3
+NONE = 4
+
+USERS_PER_CHUNK = 500
+
+
+def compute_effective_privileges(apps, user_ids):
+    """
+    Compute the effective privileges of some users from the privilege tables
+
+    This is a copy of hs_access_control.models.effective_privilege.compute_effective_privileges
+    that uses the historical models of this migration.
+    """
+    UserResourcePrivilege = apps.get_model('hs_access_control', 'UserResourcePrivilege')
+    GroupResourcePrivilege = apps.get_model('hs_access_control', 'GroupResourcePrivilege')
+    access = {}
+
+    def record(key):
+        if key not in access:
+            access[key] = [NONE, NONE, NONE, False, False]
+        return access[key]
+
+    # direct user privilege
+    for user_id, resource_id, privilege in UserResourcePrivilege.objects\
+            .filter(user_id__in=user_ids).values_list('user_id', 'resource_id', 'privilege'):
+        r = record((user_id, resource_id))
+        r[0] = privilege
+        r[3] = True
+        r[4] = r[4] or privilege <= CHANGE
+
+    # privilege of active groups of which the user is a member
+    for user_id, resource_id, privilege in GroupResourcePrivilege.objects\
+            .filter(group__gaccess__active=True, group__g2ugp__user_id__in=user_ids)\
+            .values_list('group__g2ugp__user_id', 'resource_id', 'privilege'):
+        r = record((user_id, resource_id))
+        r[1] = min(r[1], privilege)
+        r[3] = True
+        r[4] = r[4] or privilege == CHANGE
+
+    # privilege of active groups in a community of which a group of the user is a member
+    peer = Q(group__gaccess__active=True,
+             group__g2gcp__community__c2gcp__group__g2ugp__user_id__in=user_ids)
+    candidates = {}
+    for user_id, resource_id, privilege, allow_view, peer_privilege, peer_active in \
+            GroupResourcePrivilege.objects.filter(peer).values_list(
+                'group__g2gcp__community__c2gcp__group__g2ugp__user_id',
+                'resource_id',
+                'privilege',
+                'group__g2gcp__allow_view',
+                'group__g2gcp__community__c2gcp__privilege',
+                'group__g2gcp__community__c2gcp__group__gaccess__active'):
+        key = (user_id, resource_id)
+        if allow_view or (privilege == CHANGE and peer_privilege == CHANGE):
+            least = candidates.setdefault(key, [NONE, NONE])
+            least[0] = min(least[0], privilege)
+            least[1] = min(least[1], peer_privilege)
+        if peer_active and (allow_view or peer_privilege == CHANGE):
+            r = record(key)
+            r[3] = True
+            r[4] = r[4] or (privilege == CHANGE and peer_privilege == CHANGE)
+    for key, least in candidates.items():
+        # CHANGE only if both the resource and the community are shared with CHANGE
+        record(key)[2] = CHANGE if least == [CHANGE, CHANGE] else VIEW
+
+    return access
+
+
+def populate_effective_privileges(apps, schema_editor):
+    """ store the effective privileges of existing users, a chunk of users at a time """
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    EffectiveResourcePrivilege = apps.get_model('hs_access_control',
+                                                'EffectiveResourcePrivilege')
+    user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(user_ids), USERS_PER_CHUNK):
+        access = compute_effective_privileges(apps, user_ids[start:start + USERS_PER_CHUNK])
+        EffectiveResourcePrivilege.objects.bulk_create([
+            EffectiveResourcePrivilege(user_id=user_id, resource_id=resource_id,
+                                       user_privilege=values[0], group_privilege=values[1],
+                                       community_privilege=values[2], view=values[3],
+                                       edit=values[4])
+            for (user_id, resource_id), values in access.items()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('hs_core', '0043_auto_20190621_0308'),
+        ('hs_access_control', '0023_auto_20190131_1523'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectiveResourcePrivilege',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_privilege', models.IntegerField(default=4, editable=False, help_text=b'privilege granted to the user')),
+                ('group_privilege', models.IntegerField(default=4, editable=False, help_text=b'privilege granted to groups of the user')),
+                ('community_privilege', models.IntegerField(default=4, editable=False, help_text=b'privilege granted through communities')),
+                ('view', models.BooleanField(default=False, editable=False, help_text=b'whether the resource is in UserAccess.view_resources')),
+                ('edit', models.BooleanField(default=False, editable=False, help_text=b'whether the resource is in UserAccess.edit_resources unless it is immutable')),
+                ('resource', models.ForeignKey(editable=False, help_text=b'resource to which privilege applies', on_delete=django.db.models.deletion.CASCADE, related_name='r2erp', to='hs_core.BaseResource')),
+                ('user', models.ForeignKey(editable=False, help_text=b'user holding privilege', on_delete=django.db.models.deletion.CASCADE, related_name='u2erp', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='effectiveresourceprivilege',
+            unique_together=set([('user', 'resource')]),
+        ),
+        migrations.RunPython(populate_effective_privileges, migrations.RunPython.noop),
+    ]
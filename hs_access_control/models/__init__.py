@@ -7,5 +7,6 @@ from user import UserAccess
 from group import GroupAccess, GroupMembershipRequest
 from resource import ResourceAccess
 from community import Community
+from effective_privilege import EffectiveResourcePrivilege
 from exceptions import PolymorphismError
 from utilities import access_provenance, access_permissions, coarse_permissions
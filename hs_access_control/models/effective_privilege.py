@@ -0,0 +1,297 @@
+from django.contrib.auth.models import User, Group
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from hs_core import authorization_cache
+from hs_core.models import BaseResource
+from hs_access_control.models.privilege import PrivilegeCodes, \
+        UserResourcePrivilege, UserGroupPrivilege, GroupResourcePrivilege
+from hs_access_control.models.group import GroupAccess
+from hs_access_control.models.community import Community
+
+#############################################
+# Materialized effective privilege of users over resources
+#
+# Effective privilege combines privilege granted to a user directly, through the groups
+# of which the user is a member, and through the communities of those groups. Computing
+# it requires joins through five privilege tables, so it is computed when privileges
+# change and stored here, one row per user and resource.
+#
+# Rows are maintained by PrivilegeBase.update(), which all share, unshare and undo_share
+# routines go through, and by signals for changes that do not: activating or deactivating
+# a group, and deleting a group or community.
+#
+# Resource flags are not part of the stored privilege; immutability is applied when
+# reading, so that changing a flag never requires an update here.
+#############################################
+
+
+class EffectiveResourcePrivilege(models.Model):
+    """ Effective privilege of a user over a resource, as of the last change in privilege
+
+    The raw privilege of each kind of access path is kept separately, because different
+    access routines combine them differently:
+
+    * ResourceAccess.get_effective_privilege takes the minimum of all three.
+    * UserAccess.view_resources and UserAccess.edit_resources use view and edit, which
+      differ from the community privilege in requiring the user's own group to be active.
+    """
+
+    user = models.ForeignKey(User,
+                             null=False,
+                             editable=False,
+                             related_name='u2erp',
+                             help_text='user holding privilege')
+
+    resource = models.ForeignKey(BaseResource,
+                                 null=False,
+                                 editable=False,
+                                 related_name='r2erp',
+                                 help_text='resource to which privilege applies')
+
+    user_privilege = models.IntegerField(editable=False,
+                                         default=PrivilegeCodes.NONE,
+                                         help_text='privilege granted to the user')
+
+    group_privilege = models.IntegerField(editable=False,
+                                          default=PrivilegeCodes.NONE,
+                                          help_text='privilege granted to groups of the user')
+
+    community_privilege = models.IntegerField(editable=False,
+                                              default=PrivilegeCodes.NONE,
+                                              help_text='privilege granted through communities')
+
+    view = models.BooleanField(editable=False,
+                               default=False,
+                               help_text='whether the resource is in UserAccess.view_resources')
+
+    edit = models.BooleanField(editable=False,
+                               default=False,
+                               help_text='whether the resource is in UserAccess.edit_resources '
+                                         'unless it is immutable')
+
+    class Meta:
+        unique_together = ('user', 'resource')
+
+    def __str__(self):
+        """ Return printed depiction for debugging """
+        return str.format("<user '{}' (id={}) holds {} ({})" +
+                          " over resource '{}' (id={})>",
+                          str(self.user.username), str(self.user.id),
+                          PrivilegeCodes.NAMES[self.privilege],
+                          str(self.privilege),
+                          str(self.resource.short_id).encode('ascii'),
+                          str(self.resource.id))
+
+    @property
+    def privilege(self):
+        """ combined privilege, not accounting for resource flags """
+        return min(self.user_privilege, self.group_privilege, self.community_privilege)
+
+    @classmethod
+    def get_privilege(cls, user, resource):
+        """
+        Get the combined privilege of a user over a resource, not accounting for resource flags
+
+        **This is a system routine** and not recommended for use in application code.
+        Use ResourceAccess.get_effective_privilege instead.
+        """
+        try:
+            return cls.objects.get(user=user, resource=resource).privilege
+        except cls.DoesNotExist:
+            return PrivilegeCodes.NONE
+
+    @classmethod
+    def refresh(cls, users=None, resources=None):
+        """
+        Recompute the stored privileges of some users or resources
+
+        :param users: users (or their ids) whose privilege over all resources is recomputed
+        :param resources: resources (or their ids) over which privileges are recomputed
+        :return: None
+
+        If both are given, only the pairs of those users and resources are recomputed.
+        If neither is given, everything is recomputed.
+        """
+        user_ids = _ids(users)
+        resource_ids = _ids(resources)
+        with transaction.atomic():
+            computed = compute_effective_privileges(user_ids, resource_ids)
+            stored = cls.objects.all()
+            if user_ids is not None:
+                stored = stored.filter(user_id__in=user_ids)
+            if resource_ids is not None:
+                stored = stored.filter(resource_id__in=resource_ids)
+
+            stale = []
+            for record in stored:
+                values = computed.pop((record.user_id, record.resource_id), None)
+                if values is None:
+                    stale.append(record.id)
+                elif values != (record.user_privilege, record.group_privilege,
+                                record.community_privilege, record.view, record.edit):
+                    (record.user_privilege, record.group_privilege,
+                     record.community_privilege, record.view, record.edit) = values
+                    record.save()
+            if stale:
+                cls.objects.filter(id__in=stale).delete()
+            cls.objects.bulk_create([
+                cls(user_id=user_id, resource_id=resource_id, user_privilege=values[0],
+                    group_privilege=values[1], community_privilege=values[2],
+                    view=values[3], edit=values[4])
+                for (user_id, resource_id), values in computed.items()])
+        authorization_cache.invalidate()
+
+
+def _ids(objects):
+    """ ids of a list or QuerySet of model objects, or None """
+    if objects is None:
+        return None
+    return [o if isinstance(o, (int, long)) else o.pk for o in objects]
+
+
+def compute_effective_privileges(user_ids=None, resource_ids=None):
+    """
+    Compute effective privileges from the privilege tables
+
+    :param user_ids: ids of users to compute for, or None for all users
+    :param resource_ids: ids of resources to compute for, or None for all resources
+    :return: dict from (user id, resource id) to (user privilege, group privilege,
+        community privilege, view, edit), for the pairs in which the user has any access
+
+    This follows the semantics of the query-based routines it replaces:
+    ResourceAccess.get_effective_user_privilege, get_effective_group_privilege and
+    get_effective_community_privilege (before applying resource flags), and
+    UserAccess.view_resources and UserAccess.edit_resources (for mutable resources).
+    """
+    NONE = PrivilegeCodes.NONE
+    CHANGE = PrivilegeCodes.CHANGE
+    access = {}
+
+    def record(key):
+        if key not in access:
+            access[key] = [NONE, NONE, NONE, False, False]
+        return access[key]
+
+    # direct user privilege
+    direct = UserResourcePrivilege.objects.all()
+    if user_ids is not None:
+        direct = direct.filter(user_id__in=user_ids)
+    if resource_ids is not None:
+        direct = direct.filter(resource_id__in=resource_ids)
+    for user_id, resource_id, privilege in \
+            direct.values_list('user_id', 'resource_id', 'privilege'):
+        r = record((user_id, resource_id))
+        r[0] = privilege
+        r[3] = True
+        r[4] = r[4] or privilege <= CHANGE
+
+    # privilege of active groups of which the user is a member
+    member = Q(group__gaccess__active=True)
+    if user_ids is not None:
+        member &= Q(group__g2ugp__user_id__in=user_ids)
+    else:
+        member &= Q(group__g2ugp__isnull=False)
+    if resource_ids is not None:
+        member &= Q(resource_id__in=resource_ids)
+    for user_id, resource_id, privilege in GroupResourcePrivilege.objects.filter(member)\
+            .values_list('group__g2ugp__user_id', 'resource_id', 'privilege'):
+        r = record((user_id, resource_id))
+        r[1] = min(r[1], privilege)
+        r[3] = True
+        r[4] = r[4] or privilege == CHANGE
+
+    # privilege of active groups in a community of which a group of the user is a member
+    peer = Q(group__gaccess__active=True)
+    if user_ids is not None:
+        peer &= Q(group__g2gcp__community__c2gcp__group__g2ugp__user_id__in=user_ids)
+    else:
+        peer &= Q(group__g2gcp__community__c2gcp__group__g2ugp__isnull=False)
+    if resource_ids is not None:
+        peer &= Q(resource_id__in=resource_ids)
+    candidates = {}
+    for user_id, resource_id, privilege, allow_view, peer_privilege, peer_active in \
+            GroupResourcePrivilege.objects.filter(peer).values_list(
+                'group__g2gcp__community__c2gcp__group__g2ugp__user_id',
+                'resource_id',
+                'privilege',
+                'group__g2gcp__allow_view',
+                'group__g2gcp__community__c2gcp__privilege',
+                'group__g2gcp__community__c2gcp__group__gaccess__active'):
+        key = (user_id, resource_id)
+        if allow_view or (privilege == CHANGE and peer_privilege == CHANGE):
+            least = candidates.setdefault(key, [NONE, NONE])
+            least[0] = min(least[0], privilege)
+            least[1] = min(least[1], peer_privilege)
+        if peer_active and (allow_view or peer_privilege == CHANGE):
+            r = record(key)
+            r[3] = True
+            r[4] = r[4] or (privilege == CHANGE and peer_privilege == CHANGE)
+    for key, least in candidates.items():
+        # CHANGE only if both the resource and the community are shared with CHANGE
+        record(key)[2] = CHANGE if least == [CHANGE, CHANGE] else PrivilegeCodes.VIEW
+
+    return {key: tuple(values) for key, values in access.items()}
+
+
+def users_affected_by_group(group):
+    """ ids of users whose privileges depend upon a group, directly or through communities """
+    return list(UserGroupPrivilege.objects
+                .filter(Q(group=group) |
+                        Q(group__g2gcp__community__c2gcp__group=group))
+                .values_list('user_id', flat=True).distinct())
+
+
+def users_affected_by_community(community):
+    """ ids of users whose privileges depend upon a community """
+    return list(UserGroupPrivilege.objects
+                .filter(group__g2gcp__community=community)
+                .values_list('user_id', flat=True).distinct())
+
+
+@receiver(pre_save, sender=GroupAccess)
+def group_access_pre_save(sender, instance, **kwargs):
+    """ note whether the active flag of a group changes """
+    if instance.pk is None:
+        instance._active_changed = False
+    else:
+        previous = GroupAccess.objects.filter(pk=instance.pk)\
+            .values_list('active', flat=True).first()
+        instance._active_changed = previous is not None and previous != instance.active
+
+
+@receiver(post_save, sender=GroupAccess)
+def group_access_post_save(sender, instance, **kwargs):
+    """ refresh the privileges that depend upon a group that was activated or deactivated """
+    if getattr(instance, '_active_changed', False):
+        EffectiveResourcePrivilege.refresh(users=users_affected_by_group(instance.group))
+
+
+@receiver(pre_delete, sender=Group)
+def group_pre_delete(sender, instance, **kwargs):
+    """ note the users whose privileges depend upon a group being deleted """
+    instance._affected_users = users_affected_by_group(instance)
+
+
+@receiver(post_delete, sender=Group)
+def group_post_delete(sender, instance, **kwargs):
+    """ refresh the privileges that depended upon a deleted group """
+    affected = getattr(instance, '_affected_users', None)
+    if affected:
+        EffectiveResourcePrivilege.refresh(users=affected)
+
+
+@receiver(pre_delete, sender=Community)
+def community_pre_delete(sender, instance, **kwargs):
+    """ note the users whose privileges depend upon a community being deleted """
+    instance._affected_users = users_affected_by_community(instance)
+
+
+@receiver(post_delete, sender=Community)
+def community_post_delete(sender, instance, **kwargs):
+    """ refresh the privileges that depended upon a deleted community """
+    affected = getattr(instance, '_affected_users', None)
+    if affected:
+        EffectiveResourcePrivilege.refresh(users=affected)
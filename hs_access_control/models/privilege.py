@@ -130,6 +130,20 @@ class PrivilegeBase(models.Model):
             del kwargs['grantor']
             cls.objects.filter(**kwargs) \
                .delete()
+        cls.refresh_effective_privileges(**kwargs)
+
+    @classmethod
+    def refresh_effective_privileges(cls, **kwargs):
+        """
+        Recompute the effective privileges that depend upon a privilege record
+
+        This is called by update() with the pair of keys of the record that was changed.
+        Privileges that do not influence the privileges of users over resources leave
+        this empty.
+
+        **This is a system routine** and not recommended for use in application code.
+        """
+        pass
 
     @classmethod
     def share(cls, **kwargs):
@@ -360,6 +374,13 @@ class UserGroupPrivilege(PrivilegeBase):
             assert len(kwargs) == 2
         return UserGroupProvenance.get_undo_users(**kwargs)
 
+    @classmethod
+    def refresh_effective_privileges(cls, **kwargs):
+        """ Recompute privileges of the user over all resources. """
+        # prevent import loops
+        from hs_access_control.models.effective_privilege import EffectiveResourcePrivilege
+        EffectiveResourcePrivilege.refresh(users=[kwargs['user']])
+
 
 class UserResourcePrivilege(PrivilegeBase):
     """ Privileges of a user over a resource
@@ -525,6 +546,13 @@ class UserResourcePrivilege(PrivilegeBase):
             assert len(kwargs) == 2
         return UserResourceProvenance.get_undo_users(**kwargs)
 
+    @classmethod
+    def refresh_effective_privileges(cls, **kwargs):
+        """ Recompute the privilege of the user over the resource. """
+        # prevent import loops
+        from hs_access_control.models.effective_privilege import EffectiveResourcePrivilege
+        EffectiveResourcePrivilege.refresh(users=[kwargs['user']], resources=[kwargs['resource']])
+
 
 class GroupResourcePrivilege(PrivilegeBase):
     """
@@ -673,6 +701,13 @@ class GroupResourcePrivilege(PrivilegeBase):
             assert len(kwargs) == 2
         return GroupResourceProvenance.get_undo_groups(**kwargs)
 
+    @classmethod
+    def refresh_effective_privileges(cls, **kwargs):
+        """ Recompute privileges of all users over the resource. """
+        # prevent import loops
+        from hs_access_control.models.effective_privilege import EffectiveResourcePrivilege
+        EffectiveResourcePrivilege.refresh(resources=[kwargs['resource']])
+
 
 class UserCommunityPrivilege(PrivilegeBase):
     """ Privileges of a user over a community
@@ -1050,3 +1085,15 @@ class GroupCommunityPrivilege(PrivilegeBase):
             assert isinstance(kwargs['grantor'], User)
             assert len(kwargs) == 2
         return GroupCommunityProvenance.get_undo_groups(**kwargs)
+
+    @classmethod
+    def refresh_effective_privileges(cls, **kwargs):
+        """ Recompute privileges of the members of the group and of groups in the community. """
+        # prevent import loops
+        from hs_access_control.models.effective_privilege import EffectiveResourcePrivilege, \
+            users_affected_by_community
+        members = UserGroupPrivilege.objects.filter(group=kwargs['group'])\
+            .values_list('user_id', flat=True)
+        affected = set(members) | set(users_affected_by_community(kwargs['community']))
+        if affected:
+            EffectiveResourcePrivilege.refresh(users=list(affected))
@@ -1,11 +1,15 @@
 from django.contrib.auth.models import User, Group
 from django.db import models
 from django.db.models import Q, Subquery
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.core.exceptions import PermissionDenied
 
+from hs_core import authorization_cache
 from hs_core.models import BaseResource
 from hs_access_control.models.privilege import PrivilegeCodes as PC, \
         UserResourcePrivilege, GroupResourcePrivilege
+from hs_access_control.models.effective_privilege import EffectiveResourcePrivilege
 
 #############################################
 # flags and methods for resources
@@ -517,10 +521,15 @@ class ResourceAccess(models.Model):
         if not this_user.is_active:
             raise PermissionDenied("Grantee user is not active")
 
-        user_priv = self.get_effective_user_privilege(this_user)
-        group_priv = self.get_effective_group_privilege(this_user)
-        community_priv = self.get_effective_community_privilege(this_user)
-        return min(user_priv, group_priv, community_priv)
+        if this_user.is_superuser:
+            return PC.OWNER
+
+        # user, group and community privileges are combined in EffectiveResourcePrivilege
+        privilege = EffectiveResourcePrivilege.get_privilege(this_user, self.resource)
+        if self.immutable and privilege == PC.CHANGE:
+            return PC.VIEW
+        else:
+            return privilege
 
     @property
     def sharing_status(self):
@@ -533,3 +542,9 @@ class ResourceAccess(models.Model):
             return "discoverable"
         else:
             return "private"
+
+
+@receiver(post_save, sender=ResourceAccess)
+def resource_access_post_save(sender, instance, **kwargs):
+    """ forget authorization decisions that may depend upon the flags of a resource """
+    authorization_cache.invalidate()
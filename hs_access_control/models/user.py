@@ -1028,27 +1028,14 @@ class UserAccess(models.Model):
         This can be subqueried in returns, because it is lazily evaluated.
         e.g., resource in self.uaccess.view_resources runs efficiently, because it
         is equivalent to self.uaccess.view_resources.filter(id=resource).exists()
+
+        Access directly, via a group, or via a peer group in a community is
+        precomputed in EffectiveResourcePrivilege.
         """
         if not self.user.is_active:
             raise PermissionDenied("Requesting user is not active")
 
-        return BaseResource.objects.filter(
-            # direct access
-            Q(r2urp__user=self.user) |
-            # access via a group
-            Q(r2grp__group__gaccess__active=True,
-              r2grp__group__g2ugp__user=self.user) |
-            # access via an unprivileged peer group in a community
-            Q(r2grp__group__gaccess__active=True,
-              r2grp__group__g2gcp__allow_view=True,
-              r2grp__group__g2gcp__community__c2gcp__group__gaccess__active=True,
-              r2grp__group__g2gcp__community__c2gcp__group__g2ugp__user=self.user) |
-            # access via a privileged peer group in a community
-            Q(r2grp__group__gaccess__active=True,
-              r2grp__group__g2gcp__community__c2gcp__privilege=PrivilegeCodes.CHANGE,
-              r2grp__group__g2gcp__community__c2gcp__group__gaccess__active=True,
-              r2grp__group__g2gcp__community__c2gcp__group__g2ugp__user=self.user)
-            ).distinct()
+        return BaseResource.objects.filter(r2erp__user=self.user, r2erp__view=True)
 
     @property
     def owned_resources(self):
@@ -1081,32 +1068,16 @@ class UserAccess(models.Model):
         if not self.user.is_active:
             raise PermissionDenied("Requesting user is not active")
 
-        # This is a mouthful.
         # a resource is editable if
         # 1. it's shared with the user and editable.
         # 2. it's shared with a group that has edit privilege and contains the user,
         # 3. it's shared with a group that has edit privilege and a community that
         #    contains the user, and the community share preserves edit
+        # which is precomputed in EffectiveResourcePrivilege.
 
-        return BaseResource.objects.filter(
-            # user has direct access
-            Q(raccess__immutable=False,
-              r2urp__user=self.user,
-              r2urp__privilege__lte=PrivilegeCodes.CHANGE) |
-            # user has direct access through being a member of a group
-            Q(raccess__immutable=False,
-              r2grp__group__gaccess__active=True,
-              r2grp__group__g2ugp__user=self.user,
-              r2grp__privilege=PrivilegeCodes.CHANGE) |
-            # user has access by being a member of a privileged group in the same community
-            # Note: CHANGE privilege overrides allow_view flag.
-            Q(raccess__immutable=False,
-              r2grp__group__gaccess__active=True,
-              r2grp__privilege=PrivilegeCodes.CHANGE,
-              r2grp__group__g2gcp__community__c2gcp__group__gaccess__active=True,
-              r2grp__group__g2gcp__community__c2gcp__group__g2ugp__user=self.user,
-              r2grp__group__g2gcp__community__c2gcp__privilege=PrivilegeCodes.CHANGE))\
-            .distinct()
+        return BaseResource.objects.filter(raccess__immutable=False,
+                                           r2erp__user=self.user,
+                                           r2erp__edit=True)
 
     def get_resources_with_explicit_access(self, this_privilege,
                                            via_user=True, via_group=False, via_community=False):
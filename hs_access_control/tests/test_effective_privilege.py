@@ -0,0 +1,122 @@
+from django.test import TestCase
+from django.contrib.auth.models import Group
+
+from hs_access_control.models import PrivilegeCodes, EffectiveResourcePrivilege
+from hs_access_control.models.effective_privilege import compute_effective_privileges
+
+from hs_core import hydroshare
+from hs_core.testing import MockIRODSTestCaseMixin
+
+from hs_access_control.tests.utilities import global_reset
+
+
+class T16EffectivePrivilege(MockIRODSTestCaseMixin, TestCase):
+    "Test that materialized effective privileges follow changes in privilege"
+
+    def setUp(self):
+        super(T16EffectivePrivilege, self).setUp()
+        global_reset()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+
+        self.dog = hydroshare.create_account(
+            'dog@gmail.com',
+            username='dog',
+            first_name='a little arfer',
+            last_name='last_name_dog',
+            superuser=False,
+            groups=[]
+        )
+
+        self.cat = hydroshare.create_account(
+            'cat@gmail.com',
+            username='cat',
+            first_name='not a dog',
+            last_name='last_name_cat',
+            superuser=False,
+            groups=[]
+        )
+
+        self.scratching = hydroshare.create_resource(
+            resource_type='GenericResource',
+            owner=self.dog,
+            title='all about sofas as scratching posts',
+            metadata=[],
+        )
+
+        self.felines = self.dog.uaccess.create_group(
+            title='felines', description="We are the felines")
+
+    def assertConsistent(self):
+        """ stored privileges agree with the privilege tables and query-based routines """
+        stored = {(r.user_id, r.resource_id): (r.user_privilege, r.group_privilege,
+                                               r.community_privilege, r.view, r.edit)
+                  for r in EffectiveResourcePrivilege.objects.all()}
+        self.assertEqual(stored, compute_effective_privileges())
+        raccess = self.scratching.raccess
+        for user in (self.dog, self.cat):
+            self.assertEqual(raccess.get_effective_privilege(user),
+                             min(raccess.get_effective_user_privilege(user),
+                                 raccess.get_effective_group_privilege(user),
+                                 raccess.get_effective_community_privilege(user)))
+
+    def test_owner(self):
+        self.assertEqual(self.scratching.raccess.get_effective_privilege(self.dog),
+                         PrivilegeCodes.OWNER)
+        self.assertTrue(self.scratching in self.dog.uaccess.view_resources)
+        self.assertTrue(self.scratching in self.dog.uaccess.edit_resources)
+        self.assertConsistent()
+
+    def test_share_with_user(self):
+        dog, cat, scratching = self.dog, self.cat, self.scratching
+        self.assertFalse(scratching in cat.uaccess.view_resources)
+        dog.uaccess.share_resource_with_user(scratching, cat, PrivilegeCodes.CHANGE)
+        self.assertEqual(scratching.raccess.get_effective_privilege(cat), PrivilegeCodes.CHANGE)
+        self.assertTrue(scratching in cat.uaccess.edit_resources)
+        self.assertConsistent()
+
+        # immutability is applied when reading
+        scratching.raccess.immutable = True
+        scratching.raccess.save()
+        self.assertEqual(scratching.raccess.get_effective_privilege(cat), PrivilegeCodes.VIEW)
+        self.assertFalse(scratching in cat.uaccess.edit_resources)
+        self.assertTrue(scratching in cat.uaccess.view_resources)
+        scratching.raccess.immutable = False
+        scratching.raccess.save()
+
+        dog.uaccess.unshare_resource_with_user(scratching, cat)
+        self.assertEqual(scratching.raccess.get_effective_privilege(cat), PrivilegeCodes.NONE)
+        self.assertFalse(scratching in cat.uaccess.view_resources)
+        self.assertConsistent()
+
+    def test_share_with_group(self):
+        dog, cat, felines, scratching = self.dog, self.cat, self.felines, self.scratching
+        dog.uaccess.share_resource_with_group(scratching, felines, PrivilegeCodes.CHANGE)
+        dog.uaccess.share_group_with_user(felines, cat, PrivilegeCodes.VIEW)
+        self.assertEqual(scratching.raccess.get_effective_privilege(cat), PrivilegeCodes.CHANGE)
+        self.assertTrue(scratching in cat.uaccess.edit_resources)
+        self.assertConsistent()
+
+        # deactivating the group revokes its privileges
+        felines.gaccess.active = False
+        felines.gaccess.save()
+        self.assertEqual(scratching.raccess.get_effective_privilege(cat), PrivilegeCodes.NONE)
+        self.assertFalse(scratching in cat.uaccess.view_resources)
+        self.assertConsistent()
+
+        felines.gaccess.active = True
+        felines.gaccess.save()
+        self.assertTrue(scratching in cat.uaccess.view_resources)
+        self.assertConsistent()
+
+        # deleting the group revokes its privileges
+        dog.uaccess.delete_group(felines)
+        self.assertFalse(scratching in cat.uaccess.view_resources)
+        self.assertConsistent()
+
+    def test_undo_share(self):
+        dog, cat, scratching = self.dog, self.cat, self.scratching
+        dog.uaccess.share_resource_with_user(scratching, cat, PrivilegeCodes.VIEW)
+        self.assertTrue(scratching in cat.uaccess.view_resources)
+        dog.uaccess.undo_share_resource_with_user(scratching, cat)
+        self.assertFalse(scratching in cat.uaccess.view_resources)
+        self.assertConsistent()
@@ -15,7 +15,8 @@ from pprint import pprint
 
 from hs_access_control.models import UserAccess, GroupAccess, ResourceAccess, \
     UserResourcePrivilege, GroupResourcePrivilege, UserGroupPrivilege, PrivilegeCodes, \
-    UserResourceProvenance, GroupResourceProvenance, UserGroupProvenance
+    UserResourceProvenance, GroupResourceProvenance, UserGroupProvenance, \
+    EffectiveResourcePrivilege
 
 
 # from hs_core import hydroshare
@@ -24,6 +25,7 @@ from hs_core.models import BaseResource
 
 
 def global_reset():
+    EffectiveResourcePrivilege.objects.all().delete()
     UserResourcePrivilege.objects.all().delete()
     UserGroupPrivilege.objects.all().delete()
     GroupResourcePrivilege.objects.all().delete()
@@ -29,13 +29,22 @@ def netcdf_post_create_resource(sender, **kwargs):
     res_file = resource.files.all().first()
 
     if res_file:
-        temp_file = utils.get_file_from_irods(res_file)
-        nc_dataset = nc_utils.get_nc_dataset(temp_file)
         nc_file_name = res_file.file_name
+        # temp dir for the header text file
+        temp_dir = utils.create_temp_dir()
+        # metadata extraction - in the vault or from a temp copy
+        with utils.files_for_reading([res_file]) as (nc_file,):
+            nc_dataset = nc_utils.get_nc_dataset(nc_file)
+            if isinstance(nc_dataset, netCDF4.Dataset):
+                # Extract the metadata from netcdf file
+                res_dublin_core_meta, res_type_specific_meta = \
+                    nc_meta.get_nc_meta_dict(nc_dataset)
+                # create the ncdump text file
+                dump_file = create_header_info_txt_file(nc_file, nc_file_name, nc_dataset,
+                                                        temp_dir=temp_dir)
+                nc_dataset.close()
 
         if isinstance(nc_dataset, netCDF4.Dataset):
-            # Extract the metadata from netcdf file
-            res_dublin_core_meta, res_type_specific_meta = nc_meta.get_nc_meta_dict(temp_file)
             # populate metadata list with extracted metadata
             metadata = []
             add_metadata_to_list(metadata, res_dublin_core_meta, res_type_specific_meta)
@@ -56,8 +65,6 @@ def netcdf_post_create_resource(sender, **kwargs):
                 else:
                     resource.metadata.create_element(k, **v)
 
-            # create the ncdump text file
-            dump_file = create_header_info_txt_file(temp_file, nc_file_name)
             dump_file_name = nc_file_name + '_header_info.txt'
             uploaded_file = UploadedFile(file=open(dump_file), name=dump_file_name)
             utils.add_file_to_resource(resource, uploaded_file)
@@ -72,8 +79,8 @@ def netcdf_post_create_resource(sender, **kwargs):
             log.error(log_msg)
 
         # cleanup the temp file directory
-        if os.path.exists(temp_file):
-            shutil.rmtree(os.path.dirname(temp_file))
+        if os.path.exists(temp_dir):
+            shutil.rmtree(temp_dir)
 
     # set metadata is dirty flag as false for resource creation
     metadata = resource.metadata
@@ -165,7 +172,7 @@ def netcdf_pre_add_files_to_resource(sender, **kwargs):
             utils.resource_modified(nc_res, user, overwrite_bag=False)
 
             # extract metadata
-            res_dublin_core_meta, res_type_specific_meta = nc_meta.get_nc_meta_dict(in_file_name)
+            res_dublin_core_meta, res_type_specific_meta = nc_meta.get_nc_meta_dict(nc_dataset)
 
             # update title info
             if res_dublin_core_meta.get('title'):
@@ -274,7 +281,8 @@ def netcdf_pre_add_files_to_resource(sender, **kwargs):
                                                    value=res_dublin_core_meta['original-box'])
 
             # create the ncdump text file
-            dump_file = create_header_info_txt_file(in_file_name, nc_file_name)
+            dump_file = create_header_info_txt_file(in_file_name, nc_file_name, nc_dataset)
+            nc_dataset.close()
             dump_file_name = nc_file_name + '_header_info.txt'
             uploaded_file = UploadedFile(file=open(dump_file), name=dump_file_name)
             files.append(uploaded_file)
@@ -0,0 +1,138 @@
+"""Loading of time series CSV files into the TimeSeriesResultValues table of ODM2 SQLite files.
+
+The CSV file is read once into NumPy columns: the date-time column is converted to the
+text that sqlite3 stores for the datetime dateutil would parse, vectorized or with a
+fixed format where the column allows it, and the data columns to floats. Values are then
+inserted series by series with chunked executemany calls inside one transaction.
+"""
+
+import csv
+import re
+from datetime import datetime
+from itertools import islice, izip
+
+import numpy as np
+from dateutil import parser
+
+READ_CHUNK_ROWS = 100000
+INSERT_CHUNK_SIZE = 10000
+
+INSERT_SQL = "INSERT INTO TimeSeriesResultValues (ValueID, ResultID, DataValue, " \
+             "ValueDateTime, ValueDateTimeUTCOffset, CensorCodeCV, " \
+             "QualityCodeCV, TimeAggregationInterval, " \
+             "TimeAggregationIntervalUnitsID) VALUES(?,?,?,?,?,?,?,?,?)"
+
+# date-times NumPy parses the way dateutil does
+ISO_DATETIME = re.compile(r'^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2})?)?$')
+
+# other fixed formats that are tried on the first value of a column
+FIXED_FORMATS = ('%m/%d/%Y %H:%M:%S', '%m/%d/%Y %H:%M', '%m/%d/%Y',
+                 '%Y/%m/%d %H:%M:%S', '%Y/%m/%d %H:%M', '%Y/%m/%d')
+
+
+def read_csv_columns(csv_path):
+    """
+    Read a validated time series CSV file in one pass
+
+    :param csv_path: path of the CSV file
+    :return: (header, date-time strings as in the file, 2D float array with one column
+        per data column)
+    """
+    date_times = []
+    chunks = []
+    with open(csv_path, 'r') as fl_obj:
+        csv_reader = csv.reader(fl_obj, delimiter=',')
+        header = csv_reader.next()
+        while True:
+            rows = list(islice(csv_reader, READ_CHUNK_ROWS))
+            if not rows:
+                break
+            date_times.extend(row[0] for row in rows)
+            chunks.append(np.array([row[1:] for row in rows], dtype=np.float64))
+    if chunks:
+        values = np.concatenate(chunks)
+    else:
+        values = np.empty((0, len(header) - 1), dtype=np.float64)
+    return header, date_times, values
+
+
+def datetime_text(date_times):
+    """
+    Convert date-time strings to the text sqlite3 stores for the datetimes dateutil parses
+
+    :param date_times: list of date-time strings in the format of a CSV file
+    :return: list of strings 'YYYY-MM-DD HH:MM:SS'
+    """
+    if not date_times:
+        return []
+    if all(ISO_DATETIME.match(dt) for dt in date_times):
+        parsed = np.array(date_times, dtype='datetime64[s]')
+        return np.char.replace(np.datetime_as_string(parsed, unit='s'), 'T', ' ').tolist()
+
+    first = parser.parse(date_times[0])
+    for fmt in FIXED_FORMATS:
+        try:
+            if datetime.strptime(date_times[0], fmt) == first:
+                break
+        except ValueError:
+            continue
+    else:
+        fmt = None
+
+    text = []
+    for dt in date_times:
+        try:
+            if fmt is None:
+                raise ValueError(dt)
+            text.append(str(datetime.strptime(dt, fmt)))
+        except ValueError:
+            text.append(str(parser.parse(dt)))
+    return text
+
+
+def time_interval_minutes(date_times):
+    """ the time interval in minutes between the first two readings """
+    return (parser.parse(date_times[1]) - parser.parse(date_times[0])).seconds / 60
+
+
+def insert_result_values(cur, header, date_times, values, result_ids, utc_offset,
+                         time_interval):
+    """
+    Insert the values of each data column as the result values of its series
+
+    :param cur: cursor of the ODM2 SQLite file; values are not committed
+    :param header: CSV header; data columns are labeled by series labels
+    :param date_times: date-time text of each row, see datetime_text()
+    :param values: 2D float array, one column per data column of the header
+    :param result_ids: dict from series label to ResultID
+    :param utc_offset: ValueDateTimeUTCOffset of all values
+    :param time_interval: TimeAggregationInterval of all values
+    :return: number of values inserted
+
+    Values are numbered consecutively from 1, series by series, in the order of the header.
+    """
+    # bulk load: the file is a temporary copy that is only kept if everything succeeds
+    cur.execute("PRAGMA synchronous = OFF")
+    cur.execute("PRAGMA journal_mode = MEMORY")
+
+    def rows():
+        value_id = 1
+        for col, label in enumerate(header[1:]):
+            result_id = result_ids[label]
+            for date_time, data_value in izip(date_times, values[:, col].tolist()):
+                if data_value != data_value:
+                    # NaN would become NULL; store it as text, as the CSV value was before
+                    data_value = 'nan'
+                yield (value_id, result_id, data_value, date_time, utc_offset,
+                       'Unknown', 'Unknown', time_interval, 102)
+                value_id += 1
+
+    inserted = 0
+    all_rows = rows()
+    while True:
+        chunk = list(islice(all_rows, INSERT_CHUNK_SIZE))
+        if not chunk:
+            break
+        cur.executemany(INSERT_SQL, chunk)
+        inserted += len(chunk)
+    return inserted
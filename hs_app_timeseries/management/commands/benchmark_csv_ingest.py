@@ -0,0 +1,111 @@
+"""
+Time the loading of time series CSV files into ODM2 SQLite files.
+
+Synthetic CSV files of increasing size are written to a temporary directory and loaded
+into copies of the blank ODM2 SQLite file, the way
+TimeSeriesMetaData.update_timeseriesresultvalues_table_insert loads uploaded CSV files.
+
+* --rows: comma separated numbers of data rows, default 1000,10000,100000
+* --columns: number of data columns (series) in each file, default 10
+* --legacy: also time the former per-value path (one parse and INSERT per value)
+"""
+import csv
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from dateutil import parser
+from django.core.management.base import BaseCommand
+
+from hs_app_timeseries import csv_ingest
+
+BLANK_SQLITE_FILE = os.path.join(os.path.dirname(csv_ingest.__file__), 'files',
+                                 'ODM2.sqlite')
+
+
+def write_csv(csv_path, rows, columns):
+    """ write a CSV file of half-hourly readings of several series """
+    start = datetime(2008, 1, 1)
+    step = timedelta(minutes=30)
+    with open(csv_path, 'wb') as fl_obj:
+        csv_writer = csv.writer(fl_obj)
+        csv_writer.writerow(['ValueDateTime'] + ['Series_{}'.format(col)
+                                                 for col in range(columns)])
+        for row in range(rows):
+            csv_writer.writerow([str(start + row * step)] +
+                                [row * 0.01 + col for col in range(columns)])
+
+
+def load(csv_path, sqlite_path):
+    con = sqlite3.connect(sqlite_path)
+    try:
+        cur = con.cursor()
+        header, date_times, values = csv_ingest.read_csv_columns(csv_path)
+        time_interval = csv_ingest.time_interval_minutes(date_times)
+        result_ids = {label: col + 1 for col, label in enumerate(header[1:])}
+        count = csv_ingest.insert_result_values(cur, header,
+                                                csv_ingest.datetime_text(date_times),
+                                                values, result_ids, -7, time_interval)
+        con.commit()
+        return count
+    finally:
+        con.close()
+
+
+def load_legacy(csv_path, sqlite_path):
+    con = sqlite3.connect(sqlite_path)
+    try:
+        cur = con.cursor()
+        count = 0
+        with open(csv_path, 'r') as fl_obj:
+            csv_reader = csv.reader(fl_obj, delimiter=',')
+            header = csv_reader.next()
+            for col in range(1, len(header)):
+                fl_obj.seek(0)
+                csv_reader.next()
+                for row in csv_reader:
+                    count += 1
+                    cur.execute(csv_ingest.INSERT_SQL,
+                                (count, col, row[col], parser.parse(row[0]), -7,
+                                 'Unknown', 'Unknown', 30, 102))
+        con.commit()
+        return count
+    finally:
+        con.close()
+
+
+class Command(BaseCommand):
+    help = "time loading synthetic time series CSV files into ODM2 SQLite files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=str, dest='rows', default='1000,10000,100000',
+                            help='comma separated numbers of data rows')
+        parser.add_argument('--columns', type=int, dest='columns', default=10,
+                            help='number of data columns')
+        parser.add_argument('--legacy', action='store_true', dest='legacy',
+                            help='also time the per-value path')
+
+    def handle(self, *args, **options):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for rows in [int(r) for r in options['rows'].split(',')]:
+                csv_path = os.path.join(temp_dir, 'data.csv')
+                write_csv(csv_path, rows, options['columns'])
+                paths = [('vectorized', load)]
+                if options['legacy']:
+                    paths.append(('legacy', load_legacy))
+                for name, loader in paths:
+                    sqlite_path = os.path.join(temp_dir, 'ODM2.sqlite')
+                    shutil.copy(BLANK_SQLITE_FILE, sqlite_path)
+                    start = time.time()
+                    count = loader(csv_path, sqlite_path)
+                    seconds = time.time() - start
+                    print("{:>10} rows x {} columns, {:<10}: {:8.2f} s, {:10.0f} values/s"
+                          .format(rows, options['columns'], name, seconds,
+                                  count / seconds if seconds else 0))
+                    os.remove(sqlite_path)
+        finally:
+            shutil.rmtree(temp_dir)
@@ -1,6 +1,5 @@
 import os
 import sqlite3
-import csv
 import shutil
 import logging
 from uuid import uuid4
@@ -23,6 +22,8 @@ from hs_core.models import BaseResource, ResourceManager, resource_processor, Co
     AbstractMetaDataElement, Creator
 from hs_core.hydroshare import utils
 
+from hs_app_timeseries import csv_ingest
+
 
 class TimeSeriesAbstractMetaDataElement(AbstractMetaDataElement):
     # for associating an metadata element with one or more time series
@@ -1166,11 +1167,6 @@ class TimeSeriesMetaDataMixin(models.Model):
                 return element
         return None
 
-    def _read_csv_specified_column(self, csv_reader, data_column_index):
-        # generator function to read (one row) the datetime column and the specified data column
-        for row in csv_reader:
-            yield row[0], row[data_column_index]
-
     def _get_series_label(self, series_id, source):
         """Generate a label given a series id
         :param  series_id: id of the time series
@@ -1708,48 +1704,24 @@ class TimeSeriesMetaDataMixin(models.Model):
 
         cur.execute("DELETE FROM TimeSeriesResultValues")
         con.commit()
-        insert_sql = "INSERT INTO TimeSeriesResultValues (ValueID, ResultID, DataValue, " \
-                     "ValueDateTime, ValueDateTimeUTCOffset, CensorCodeCV, " \
-                     "QualityCodeCV, TimeAggregationInterval, " \
-                     "TimeAggregationIntervalUnitsID) VALUES(?,?,?,?,?,?,?,?,?)"
 
-        # read the csv file to determine time interval (in minutes) between each reading
-        # we will use the first 2 rows of data to determine this value
-        utc_offset = self.utc_offset.value
-        with open(temp_csv_file, 'r') as fl_obj:
-            csv_reader = csv.reader(fl_obj, delimiter=',')
-            # read the first row (header)
-            header = csv_reader.next()
-            first_row_data = csv_reader.next()
-            second_row_data = csv_reader.next()
-            time_interval = (parser.parse(second_row_data[0]) -
-                             parser.parse(first_row_data[0])).seconds / 60
-
-        with open(temp_csv_file, 'r') as fl_obj:
-            csv_reader = csv.reader(fl_obj, delimiter=',')
-            # read the first row (header) and skip
-            csv_reader.next()
-            value_id = 1
-            data_header = header[1:]
-            for col, value in enumerate(data_header):
-                # get the ts_result object with matching series_label
-                ts_result = [ts_item for ts_item in self.time_series_results if
-                             ts_item.series_label == value][0]
-                # get the result id associated with ts_result object
-                result_data_item = [dict_item for dict_item in results_data if
-                                    dict_item['object_id'] == ts_result.id][0]
-                result_id = result_data_item['result_id']
-                data_col_index = col + 1
-                # start at the beginning of data row
-                fl_obj.seek(0)
-                csv_reader.next()
-                for date_time, data_value in self._read_csv_specified_column(
-                        csv_reader, data_col_index):
-                    date_time = parser.parse(date_time)
-                    cur.execute(insert_sql, (value_id, result_id, data_value,
-                                             date_time, utc_offset, 'Unknown', 'Unknown',
-                                             time_interval, 102), )
-                    value_id += 1
+        # read the csv file once; each data column is the data of one series
+        header, date_times, values = csv_ingest.read_csv_columns(temp_csv_file)
+
+        # we will use the first 2 rows of data to determine the time interval (in minutes)
+        # between each reading
+        time_interval = csv_ingest.time_interval_minutes(date_times)
+
+        # get the result id associated with the ts_result object of each series label
+        result_ids_by_object = {item['object_id']: item['result_id'] for item in results_data}
+        result_ids = {}
+        for ts_item in self.time_series_results:
+            if ts_item.id in result_ids_by_object:
+                result_ids.setdefault(ts_item.series_label, result_ids_by_object[ts_item.id])
+
+        csv_ingest.insert_result_values(cur, header, csv_ingest.datetime_text(date_times),
+                                        values, result_ids, self.utc_offset.value,
+                                        time_interval)
 
     def populate_blank_sqlite_file(self, temp_sqlite_file, user):
         """
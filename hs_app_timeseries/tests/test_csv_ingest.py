@@ -0,0 +1,60 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime
+
+from dateutil import parser
+from django.test import SimpleTestCase
+
+from hs_app_timeseries import csv_ingest
+
+
+class TestCSVIngest(SimpleTestCase):
+
+    def setUp(self):
+        super(TestCSVIngest, self).setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        self.csv_file = 'hs_app_timeseries/tests/ODM2_Multi_Site_One_Variable_Test.csv'
+        self.sqlite_file = os.path.join(self.temp_dir, 'ODM2.sqlite')
+        shutil.copy('hs_app_timeseries/files/ODM2.sqlite', self.sqlite_file)
+
+    def tearDown(self):
+        super(TestCSVIngest, self).tearDown()
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+
+    def test_datetime_text(self):
+        # text is the same as the text sqlite3 stores for datetimes parsed by dateutil
+        for date_times in (['2008-01-01 00:00:00', '2008-01-01T00:30', '2008-01-02'],
+                           ['01/01/2008 00:00', '01/01/2008 00:30', '1/2/2008 1:00'],
+                           ['Jan 1 2008 00:00', 'Jan 2 2008 12:30']):
+            self.assertEqual(csv_ingest.datetime_text(date_times),
+                             [str(parser.parse(dt)) for dt in date_times])
+        self.assertEqual(csv_ingest.datetime_text([]), [])
+
+    def test_insert_result_values(self):
+        header, date_times, values = csv_ingest.read_csv_columns(self.csv_file)
+        self.assertEqual(header, ['ValueDateTime', 'Temp_DegC_Mendon', 'Temp_DegC_Paradise'])
+        self.assertEqual(values.shape, (len(date_times), 2))
+        time_interval = csv_ingest.time_interval_minutes(date_times)
+        self.assertEqual(time_interval, 30)
+
+        con = sqlite3.connect(self.sqlite_file)
+        cur = con.cursor()
+        count = csv_ingest.insert_result_values(
+            cur, header, csv_ingest.datetime_text(date_times), values,
+            {'Temp_DegC_Mendon': 1, 'Temp_DegC_Paradise': 2}, -7, time_interval)
+        con.commit()
+        self.assertEqual(count, 2 * len(date_times))
+
+        rows = cur.execute("SELECT ValueID, ResultID, DataValue, ValueDateTime "
+                           "FROM TimeSeriesResultValues ORDER BY ValueID").fetchall()
+        con.close()
+        self.assertEqual(len(rows), count)
+        # values are numbered series by series, in the order of the header
+        self.assertEqual(rows[0], (1, 1, 0.1766667, '2008-01-01 00:00:00'))
+        self.assertEqual(rows[len(date_times)],
+                         (len(date_times) + 1, 2, -9999.0, '2008-01-01 00:00:00'))
+        self.assertEqual(datetime.strptime(rows[1][3], '%Y-%m-%d %H:%M:%S'),
+                         parser.parse(date_times[1]))
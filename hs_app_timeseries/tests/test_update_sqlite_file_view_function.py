@@ -14,7 +14,9 @@ from rest_framework import status
 from hs_core import hydroshare
 from hs_core.testing import MockIRODSTestCaseMixin
 
+from hs_app_timeseries.models import TimeSeriesMetaData
 from hs_app_timeseries.views import update_sqlite_file
+from hs_file_types import sqlite_cache
 
 
 class TestUpdateSQLiteFile(MockIRODSTestCaseMixin, TestCase):
@@ -70,6 +72,20 @@ class TestUpdateSQLiteFile(MockIRODSTestCaseMixin, TestCase):
         response = update_sqlite_file(request, resource_id=self.resTimeSeries.short_id)
         self.assertEqual(response.status_code, status.HTTP_302_FOUND)
 
+    def test_update_sqlite_file_reuses_working_copy(self):
+        # the sqlite file is copied from iRODS only once while it is not changed elsewhere
+        sqlite_cache.reset_stats()
+        metadata = self.resTimeSeries.metadata
+        for _ in range(2):
+            TimeSeriesMetaData.objects.filter(id=metadata.id).update(is_dirty=True)
+            metadata.update_sqlite_file(self.john)
+            metadata.refresh_from_db()
+            self.assertFalse(metadata.is_dirty)
+        stats = sqlite_cache.get_stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['discards'], 0)
+
     def test_update_sqlite_file_exception(self):
         # trying to update sqlite file for non timeseries resource should raise exception
         url = reverse('update_sqlite_file', kwargs={'resource_id': self.genResource.short_id})
@@ -1,14 +1,16 @@
 import os
 
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Prefetch
 
 from mezzanine.pages.page_processors import processor_for
 
-from hs_core.models import BaseResource, ResourceManager, ResourceFile, resource_processor
+from hs_core.models import BaseResource, ResourceManager, ResourceFile, resource_processor, \
+    page_memoized
 
 
 from hs_file_types.models import GenericLogicalFile, GeoFeatureLogicalFile, GeoRasterLogicalFile, \
-    NetCDFLogicalFile, TimeSeriesLogicalFile, FileSetLogicalFile
+    NetCDFLogicalFile, TimeSeriesLogicalFile, FileSetLogicalFile, RefTimeseriesLogicalFile
 from hs_file_types.utils import update_target_temporal_coverage, update_target_spatial_coverage
 
 
@@ -21,7 +23,7 @@ class CompositeResource(BaseResource):
         verbose_name = 'Composite Resource'
         proxy = True
 
-    @property
+    @page_memoized
     def can_be_public_or_discoverable(self):
         # resource level metadata check
         if not super(CompositeResource, self).can_be_public_or_discoverable:
@@ -34,7 +36,7 @@ class CompositeResource(BaseResource):
 
         return True
 
-    @property
+    @page_memoized
     def logical_files(self):
         """Returns a list of all logical file type objects associated with this resource """
 
@@ -49,7 +51,15 @@ class CompositeResource(BaseResource):
 
         return lf_list
 
-    @property
+    def get_page_prefetch_lookups(self):
+        """the aggregations of the resource, with their metadata, in one query per type"""
+        return [Prefetch('{}_set'.format(lf_class.__name__.lower()),
+                         queryset=lf_class.objects.select_related('metadata'))
+                for lf_class in (FileSetLogicalFile, GenericLogicalFile, GeoFeatureLogicalFile,
+                                 NetCDFLogicalFile, GeoRasterLogicalFile, RefTimeseriesLogicalFile,
+                                 TimeSeriesLogicalFile)]
+
+    @page_memoized
     def can_be_published(self):
         # resource level metadata check
         if not super(CompositeResource, self).can_be_published:
@@ -95,10 +105,9 @@ class CompositeResource(BaseResource):
          :param file_path: Resource file path (full file path starting with resource id)
          for which the aggregation object to be retrieved
         """
-        for res_file in self.files.all():
-            if res_file.full_path == file_path:
-                if res_file.has_logical_file:
-                    return res_file.logical_file
+        res_file = ResourceFile.get_by_storage_path(self, file_path)
+        if res_file is not None and res_file.has_logical_file:
+            return res_file.logical_file
         return None
 
     def get_folder_aggregation_type_to_set(self, dir_path):
@@ -15,6 +15,15 @@ def landing_page(request, page):
 
     """
     content_model = page.get_content_model()
+    # get_page_context checks view permission before loading the page data
+    edit_resource = page_processors.check_resource_mode(request)
+    context = page_processors.get_page_context(page, request.user, resource_edit=edit_resource,
+                                               extended_metadata_layout=None, request=request)
+
+    if isinstance(context, HttpResponseRedirect):
+        # sending user to login page
+        return context
+
     netcdf_logical_files = content_model.get_logical_files('NetCDFLogicalFile')
     for lf in netcdf_logical_files:
         if lf.metadata.is_dirty:
@@ -45,14 +54,6 @@ def landing_page(request, page):
                 messages.info(request, msg)
             break
 
-    edit_resource = page_processors.check_resource_mode(request)
-    context = page_processors.get_page_context(page, request.user, resource_edit=edit_resource,
-                                               extended_metadata_layout=None, request=request)
-
-    if isinstance(context, HttpResponseRedirect):
-        # sending user to login page
-        return context
-
     file_type_missing_metadata = {'file_type_missing_metadata':
                                   content_model.get_missing_file_type_metadata_info()}
     context.update(file_type_missing_metadata)
@@ -0,0 +1,187 @@
+"""Memoization of hs_core.views.utils.authorize decisions.
+
+Decisions are cached only inside a scope, which lasts for one HTTP request
+(hs_core.middleware.AuthorizationCacheMiddleware) or one Celery task (see the
+task_prerun/task_postrun handlers below), keyed by user, resource and action.
+Outside a scope every call to authorize computes its decision as before.
+
+If AUTHORIZATION_CACHE_TTL is set to a positive number of seconds, decisions are
+also shared between processes through the Django cache named by
+AUTHORIZATION_CACHE_ALIAS. Shared entries are versioned by a generation counter that
+every change in privilege or resource flags bumps (see invalidate()), so such a change
+in one process is seen by all others.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from celery.signals import task_prerun, task_postrun
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'invalidations': 0,
+          'saved_seconds': 0.0}
+
+_GENERATION_KEY = 'authorize:gen'
+
+
+def _count(stat, saved_seconds=0.0):
+    with _stats_lock:
+        _stats[stat] += 1
+        _stats['saved_seconds'] += saved_seconds
+
+
+def get_stats():
+    """Return the hit and miss counters of this process, with the hit rate and time saved."""
+    with _stats_lock:
+        stats = dict(_stats)
+    calls = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+    stats['hit_rate'] = float(stats['local_hits'] + stats['shared_hits']) / calls \
+        if calls else 0.0
+    stats['saved_seconds'] = round(stats['saved_seconds'], 6)
+    return stats
+
+
+def reset_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+        _stats['saved_seconds'] = 0.0
+
+
+def activate():
+    """Start a cache scope on this thread; scopes nest, only the outermost one clears."""
+    depth = getattr(_local, 'depth', 0)
+    if depth == 0:
+        _local.entries = {}
+    _local.depth = depth + 1
+
+
+def deactivate():
+    depth = getattr(_local, 'depth', 0)
+    if depth <= 1:
+        _local.depth = 0
+        _local.entries = None
+    else:
+        _local.depth = depth - 1
+
+
+def reset():
+    """Start a fresh, outermost scope on this thread, dropping any scope left over on it."""
+    _local.depth = 1
+    _local.entries = {}
+
+
+def clear():
+    """End every scope on this thread."""
+    _local.depth = 0
+    _local.entries = None
+
+
+def is_active():
+    return getattr(_local, 'depth', 0) > 0
+
+
+@contextmanager
+def scope():
+    """Cache authorization decisions for the duration of a with-block."""
+    activate()
+    try:
+        yield
+    finally:
+        deactivate()
+
+
+def _shared_cache():
+    ttl = getattr(settings, 'AUTHORIZATION_CACHE_TTL', 0)
+    if not ttl:
+        return None, 0
+    from django.core.cache import caches
+    return caches[getattr(settings, 'AUTHORIZATION_CACHE_ALIAS', 'default')], ttl
+
+
+def _key(user, res_id, action):
+    """Identify a decision; the flags of the user are part of it, as authorize checks them."""
+    if user.is_authenticated():
+        return (user.pk, user.is_active, user.is_superuser, res_id, action)
+    return (None, False, False, res_id, action)
+
+
+def _shared_key(shared, key):
+    generation = shared.get(_GENERATION_KEY) or 0
+    return 'authorize:{}:{}'.format(generation, ':'.join(str(k) for k in key))
+
+
+def lookup(user, res_id, action, resolve, decide):
+    """Return (resource, authorized), from the cache or by calling resolve() and decide(res).
+
+    :param user: the requesting user, possibly anonymous
+    :param res_id: short id of the resource
+    :param action: one of ACTION_TO_AUTHORIZE
+    :param resolve: callable returning the resource of res_id, raising if there is none
+    :param decide: callable taking the resource and returning whether the action is authorized
+
+    Within a scope the resource object itself is reused; the shared tier only stores the
+    decision, so the resource is still fetched.
+    """
+    if not is_active():
+        res = resolve()
+        return res, decide(res)
+
+    key = _key(user, res_id, action)
+    entry = _local.entries.get(key)
+    if entry is not None:
+        res, authorized, seconds = entry
+        _count('local_hits', seconds)
+        return res, authorized
+
+    shared, ttl = _shared_cache()
+    if shared is not None:
+        shared_key = _shared_key(shared, key)
+        cached = shared.get(shared_key)
+        if cached is not None:
+            authorized, seconds = cached
+            res = resolve()
+            _local.entries[key] = (res, authorized, seconds)
+            _count('shared_hits', seconds)
+            return res, authorized
+
+    start = time.time()
+    res = resolve()
+    authorized = decide(res)
+    seconds = time.time() - start
+    _count('misses')
+    _local.entries[key] = (res, authorized, seconds)
+    if shared is not None:
+        shared.set(shared_key, (authorized, seconds), ttl)
+    return res, authorized
+
+
+def invalidate():
+    """Forget all cached decisions, after a change in privilege or resource flags."""
+    _count('invalidations')
+    if is_active():
+        _local.entries.clear()
+
+    shared, _ = _shared_cache()
+    if shared is not None:
+        try:
+            shared.incr(_GENERATION_KEY)
+        except ValueError:
+            # no generation recorded yet
+            shared.set(_GENERATION_KEY, 1, None)
+
+
+@task_prerun.connect
+def _task_prerun(**kwargs):
+    reset()
+
+
+@task_postrun.connect
+def _task_postrun(**kwargs):
+    clear()
@@ -1,4 +1,9 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Q
+from django.utils.timezone import now
 from haystack.signals import RealtimeSignalProcessor
 from haystack.exceptions import NotHandled
 import logging
@@ -82,3 +87,89 @@ class HydroRealtimeSignalProcessor(RealtimeSignalProcessor):
                     index.remove_object(newinstance, using=using)
                 except NotHandled:
                     logger.exception("Failure: delete of %s with short_id %s failed.", str(type(instance)), newinstance.short_id)
+
+
+class HydroQueuedSignalProcessor(HydroRealtimeSignalProcessor):
+
+    """
+    Queue index updates of resources instead of sending them to Solr within the request.
+
+    Saving a public or discoverable resource (or its ResourceAccess) only records its id in
+    IndexQueueEntry; repeated saves of the same resource coalesce into that one entry. The
+    flush_index_queue task later sends the queued resources to Solr in batches. Removals
+    from the index, when a resource becomes private or is deleted, are still done at once
+    so that private resources never linger in search results.
+    """
+
+    def handle_save(self, sender, instance, **kwargs):
+        from hs_core.models import BaseResource, IndexQueueEntry
+        from hs_access_control.models import ResourceAccess
+
+        if isinstance(instance, ResourceAccess):
+            instance = instance.resource
+        if isinstance(instance, BaseResource) and hasattr(instance, 'raccess') and \
+                hasattr(instance, 'metadata'):
+            if instance.raccess.public or instance.raccess.discoverable:
+                IndexQueueEntry.enqueue(instance)
+            else:
+                super(HydroQueuedSignalProcessor, self).handle_save(BaseResource, instance)
+
+
+def index_queue_stats():
+    """
+    return the number of resources waiting to be indexed and how long, in seconds, the
+    oldest of them has been waiting
+    """
+    from hs_core.models import IndexQueueEntry
+
+    queue = IndexQueueEntry.objects.all()
+    depth = queue.count()
+    oldest = queue.order_by('first_queued').values_list('first_queued', flat=True).first()
+    lag = (now() - oldest).total_seconds() if oldest is not None else 0
+    return {'depth': depth, 'lag': lag}
+
+
+def flush_index_queue(window=None, max_delay=None, batch_size=None):
+    """
+    send queued resources to Solr in batches and remove them from the queue
+
+    :param window: seconds a resource must go without being queued again before it is
+    indexed, so that the saves of an editing session result in one update
+    :param max_delay: seconds after which a resource is indexed even if it keeps being saved
+    :param batch_size: number of resources sent to Solr in one request
+    :return: the number of resources flushed
+    """
+    from hs_core.models import IndexQueueEntry
+    from hs_core.search_indexes import send_resources_to_index
+
+    if window is None:
+        window = getattr(settings, 'HAYSTACK_QUEUE_WINDOW', 30)
+    if max_delay is None:
+        max_delay = getattr(settings, 'HAYSTACK_QUEUE_MAX_DELAY', 300)
+    if batch_size is None:
+        batch_size = getattr(settings, 'HAYSTACK_QUEUE_BATCH_SIZE', 100)
+
+    started = now()
+    ready = IndexQueueEntry.objects.filter(
+        Q(last_queued__lte=started - timedelta(seconds=window)) |
+        Q(first_queued__lte=started - timedelta(seconds=max_delay))).order_by('id')
+
+    flushed = 0
+    last_id = 0
+    while True:
+        entries = list(ready.filter(id__gt=last_id).values_list('id', 'resource_id')[:batch_size])
+        if not entries:
+            break
+        last_id = entries[-1][0]
+        send_resources_to_index([resource_id for _, resource_id in entries])
+
+        # entries queued again while this batch was sent stay for the next flush
+        IndexQueueEntry.objects.filter(id__in=[entry_id for entry_id, _ in entries],
+                                       last_queued__lte=started).delete()
+        flushed += len(entries)
+
+    if flushed:
+        stats = index_queue_stats()
+        logger.info("Flushed %d resources to the Solr index; queue depth %d, index lag %.0fs",
+                    flushed, stats['depth'], stats['lag'])
+    return flushed
@@ -208,6 +208,19 @@ def create_bag_files(resource):
     return istorage
 
 
+def bag_fingerprint(istorage, bag_root):
+    """
+    return a fingerprint of the contents of a bag written by the iRODS bagit rule: the
+    checksum of its tag manifest, which lists the checksums of all other files of the bag,
+    so it changes whenever any file of the bag does
+
+    Parameters:
+    :param istorage: IrodsStorage of the zone the resource is stored in
+    :param bag_root: the resource collection
+    """
+    return istorage.checksum(os.path.join(bag_root, 'tagmanifest-md5.txt'))
+
+
 def create_bag(resource):
     """
     Modified to implement the new bagit workflow. The previous workflow was to create a bag from
@@ -15,7 +15,7 @@ from rest_framework import status
 
 from hs_core.hydroshare import hs_bagit
 from hs_core.models import ResourceFile
-from hs_core import signals
+from hs_core import signals, metadata_xml_cache
 from hs_core.hydroshare import utils
 from hs_access_control.models import ResourceAccess, UserResourcePrivilege, PrivilegeCodes
 from hs_labels.models import ResourceLabels
@@ -71,7 +71,7 @@ def res_has_web_reference(res):
     if res.resource_type != "CompositeResource":
         return False
 
-    for f in ResourceFile.objects.filter(object_id=res.id):
+    for f in res.files.all():
         if f.has_logical_file:
             if 'url' in f.logical_file.extra_data:
                 return True
@@ -112,7 +112,8 @@ def get_science_metadata(pk):
     Exception.ServiceFailure  - The service is unable to process the request
     """
     res = utils.get_resource_by_shortkey(pk)
-    return res.metadata.get_xml()
+    metadata = res.metadata
+    return metadata_xml_cache.get_xml(metadata.get_xml, [metadata], variant='1:1')
 
 
 def get_capabilities(pk):
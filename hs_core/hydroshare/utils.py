@@ -7,6 +7,7 @@ import logging
 import shutil
 import string
 import copy
+from contextlib import contextmanager
 from uuid import uuid4
 import errno
 
@@ -273,23 +274,118 @@ def get_file_from_irods(res_file, temp_dir=None):
     res_file_path = res_file.storage_path
     file_name = os.path.basename(res_file_path)
 
+    tmpdir = _get_irods_temp_dir(temp_dir)
+    tmpfile = os.path.join(tmpdir, file_name)
+    istorage.getFile(res_file_path, tmpfile)
+    copied_file = tmpfile
+    return copied_file
+
+
+def get_files_from_irods(res_files, temp_dir=None):
+    """
+    Copy the files (res_files) of a resource from iRODS (local or federated zone) over to django
+    (one temp directory) in one batch, such as all the files of a shapefile.
+    Note: The caller is responsible for cleaning the temp directory
+
+    :param  res_files: a list of ResourceFile instances of the same resource with distinct
+    file names
+    :param  temp_dir: (optional) existing temp directory to which the files will be copied from
+    irods. If temp_dir is None then a new temporary directory will be created.
+    :return: a list of locations of the copied files in the order of res_files
+    """
+    if not res_files:
+        return []
+    istorage = res_files[0].resource.get_irods_storage()
+    tmpdir = _get_irods_temp_dir(temp_dir)
+    res_file_paths = [res_file.storage_path for res_file in res_files]
+    istorage.getFiles(res_file_paths, tmpdir)
+    return [os.path.join(tmpdir, os.path.basename(path)) for path in res_file_paths]
+
+
+def get_vault_path(res_file):
+    """
+    Return the path of the file (res_file) in an iRODS vault mounted on this host, the same
+    vault nginx serves downloads from: IRODS_VAULT_PATH for the files of local resources and
+    IRODS_USER_VAULT_PATH for those of resources federated in the user zone.
+
+    :param  res_file: an instance of ResourceFile
+    :return: the path of the file in the vault, or None if no vault holding it is mounted
+    """
+    res = res_file.resource
+    res_file_path = res_file.storage_path
+    if not res.is_federated:
+        vault = getattr(settings, 'IRODS_VAULT_PATH', '')
+    else:
+        userpath = '/' + os.path.join(
+            getattr(settings, 'HS_USER_IRODS_ZONE', 'hydroshareuserZone'),
+            'home',
+            getattr(settings, 'HS_IRODS_PROXY_USER_IN_USER_ZONE', 'localHydroProxy'))
+        if res.resource_federation_path != userpath:
+            return None
+        vault = getattr(settings, 'IRODS_USER_VAULT_PATH', '')
+        res_file_path = res_file_path[len(userpath):].lstrip('/')
+    if not vault:
+        return None
+
+    vault_path = os.path.join(vault, res_file_path)
+    if not os.path.isfile(vault_path):
+        return None
+    # a file being replaced in iRODS may not be complete in the vault yet
+    if res_file._size >= 0 and os.path.getsize(vault_path) != res_file._size:
+        return None
+    return vault_path
+
+
+@contextmanager
+def files_for_reading(res_files):
+    """
+    Provide local paths for reading the files (res_files) of a resource, such as for metadata
+    extraction. When all the files are in a mounted iRODS vault (see get_vault_path) they are
+    read there in place, otherwise they are copied from iRODS to a temp directory in one batch
+    and removed on exit. The files must be only read, and nothing may be written next to them.
+
+        with files_for_reading([res_file]) as (file_path,):
+            ...
+
+    :param  res_files: a list of ResourceFile instances of the same resource with distinct
+    file names
+    :return: a list of paths of the files in the order of res_files
+    """
+    vault_paths = [get_vault_path(res_file) for res_file in res_files]
+    if all(vault_paths):
+        yield vault_paths
+        return
+
+    file_paths = get_files_from_irods(res_files)
+    try:
+        yield file_paths
+    finally:
+        if file_paths:
+            shutil.rmtree(os.path.dirname(file_paths[0]), ignore_errors=True)
+
+
+def create_temp_dir():
+    """
+    Create a new temp directory in TEMP_FILE_DIR, e.g. for files derived from resource files.
+    Note: The caller is responsible for removing it
+    """
+    tmpdir = os.path.join(settings.TEMP_FILE_DIR, uuid4().hex)
+    if os.path.exists(tmpdir):
+        shutil.rmtree(tmpdir)
+    os.makedirs(tmpdir)
+    return tmpdir
+
+
+def _get_irods_temp_dir(temp_dir=None):
     if temp_dir is not None:
         if not temp_dir.startswith(settings.TEMP_FILE_DIR):
             raise ValueError("Specified temp directory is not valid")
         elif not os.path.exists(temp_dir):
             raise ValueError("Specified temp directory doesn't exist")
 
-        tmpdir = temp_dir
-    else:
-        tmpdir = os.path.join(settings.TEMP_FILE_DIR, uuid4().hex)
-        if os.path.exists(tmpdir):
-            shutil.rmtree(tmpdir)
-        os.makedirs(tmpdir)
+        return temp_dir
 
-    tmpfile = os.path.join(tmpdir, file_name)
-    istorage.getFile(res_file_path, tmpfile)
-    copied_file = tmpfile
-    return copied_file
+    return create_temp_dir()
 
 
 # TODO: should be ResourceFile.replace
@@ -870,7 +966,7 @@ def create_empty_contents_directory(resource):
     res_contents_dir = resource.file_path
     istorage = resource.get_irods_storage()
     if not istorage.exists(res_contents_dir):
-        istorage.session.run("imkdir", None, '-p', res_contents_dir)
+        istorage.saveFile('', res_contents_dir + '/', create_directory=True)
 
 
 def add_file_to_resource(resource, f, folder=None, source_name='',
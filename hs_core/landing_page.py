@@ -0,0 +1,106 @@
+"""Loading of the data shown on resource landing pages.
+
+Landing pages touch the metadata elements, files, aggregations and derived properties of
+a resource many times over. load() collects the rows they need in a bounded number of
+queries, independent of the number of elements, files and aggregations:
+
+* the core metadata elements, one query per element type;
+* the lookups of the resource type's get_page_prefetch_lookups(), e.g., the files with their
+  logical files, or the aggregations of a composite resource with their metadata.
+
+It also starts a memo on the resource, in which properties decorated with page_memoized
+(e.g., logical_files, aggregation_types, can_be_public_or_discoverable) keep their value
+while the page is built.
+
+For anonymous views of public resources, the view-mode parts of the page context that do
+not depend on the viewer are kept in the Django cache named by LANDING_PAGE_CACHE_ALIAS for
+LANDING_PAGE_CACHE_TTL seconds (0 disables this). They are keyed by the modification date
+of the resource, which hs_core.hydroshare.utils.resource_modified updates, so that a
+modification is shown at once in every process.
+"""
+
+import threading
+
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+
+CORE_ELEMENT_RELATIONS = ('_title', '_description', '_language', '_rights', '_type',
+                          '_publisher', 'creators', 'contributors', 'dates', 'coverages',
+                          'formats', 'identifiers', 'subjects', 'sources', 'relations',
+                          'funding_agencies')
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _count(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def get_stats():
+    """Return the hit and miss counters of the view-mode context cache of this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def load(resource):
+    """
+    Prefetch the data of the landing page of a resource and start memoizing its properties
+
+    :param resource: the content model of the resource
+    :return: the resource
+
+    Loading a resource that is already loaded does nothing.
+    """
+    if getattr(resource, '_page_memo', None) is not None:
+        return resource
+    resource._page_memo = {}
+    lookups = resource.get_page_prefetch_lookups()
+    if lookups:
+        prefetch_related_objects([resource], *lookups)
+    metadata = resource.metadata
+    if metadata is not None:
+        prefetch_related_objects([metadata], *CORE_ELEMENT_RELATIONS)
+    return resource
+
+
+def _shared_cache():
+    ttl = getattr(settings, 'LANDING_PAGE_CACHE_TTL', 0)
+    if not ttl:
+        return None, 0
+    from django.core.cache import caches
+    return caches[getattr(settings, 'LANDING_PAGE_CACHE_ALIAS', 'default')], ttl
+
+
+def get_view_context(resource, user, build):
+    """
+    Return the view-mode context of a landing page that does not depend on the viewer
+
+    :param resource: the content model of the resource
+    :param user: the viewing user
+    :param build: callable returning the context as a dict of picklable values
+    :return: the context, from the cache for anonymous views of public resources
+    """
+    shared, ttl = _shared_cache()
+    if shared is None or user.is_authenticated() or not resource.raccess.public:
+        return build()
+
+    modified = [date.start_date for date in resource.metadata.dates.all()
+                if date.type == 'modified']
+    key = 'landing-page:{}:{}'.format(resource.short_id,
+                                      modified[0].isoformat() if modified else '')
+    context = shared.get(key)
+    if context is not None:
+        _count('hits')
+        return context
+    _count('misses')
+    context = build()
+    shared.set(key, context, ttl)
+    return context
@@ -0,0 +1,87 @@
+"""
+Time pages of the REST resource list (GET /hsapi/resource/) for catalogues of increasing size.
+
+The catalogue is simulated by limiting the list to the first N public or discoverable
+resources of this site, so the site should hold at least as many resources as the largest
+size asked for. The first and the last page of each catalogue are requested anonymously
+through ResourceListCreate, rendered to JSON, and timed with their number of queries.
+
+* --sizes: comma separated catalogue sizes, default 100,1000,10000
+* --count: resources per page, default 100
+* --per-resource: also time building a list item for every resource of the catalogue,
+  one resource at a time, as the list did before it was paginated in the database
+"""
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from hs_core import hydroshare
+from hs_core.views.resource_rest_api import ResourceListCreate
+
+
+class CatalogueResourceList(ResourceListCreate):
+    """ the resource list, limited to a given set of resources """
+    resource_ids = None
+
+    def get_queryset(self):
+        return super(CatalogueResourceList, self).get_queryset()\
+            .filter(pk__in=self.resource_ids)
+
+
+def time_page(resource_ids, page, count):
+    request = RequestFactory().get('/hsapi/resource/', {'page': page, 'count': count})
+    request.user = AnonymousUser()
+    view = CatalogueResourceList.as_view(resource_ids=resource_ids)
+    with CaptureQueriesContext(connection) as queries:
+        start = time.time()
+        response = view(request)
+        response.render()
+        seconds = time.time() - start
+    return seconds, len(queries), response.status_code
+
+
+def time_per_resource(resource_ids):
+    view = ResourceListCreate()
+    with CaptureQueriesContext(connection) as queries:
+        start = time.time()
+        for r in hydroshare.get_resource_list(public=True).select_related('raccess')\
+                .filter(pk__in=resource_ids):
+            view.resourceToResourceListItem(r)
+        seconds = time.time() - start
+    return seconds, len(queries)
+
+
+class Command(BaseCommand):
+    help = "time pages of the REST resource list for catalogues of increasing size"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=str, dest='sizes', default='100,1000,10000',
+                            help='comma separated catalogue sizes')
+        parser.add_argument('--count', type=int, dest='count', default=100,
+                            help='resources per page')
+        parser.add_argument('--per-resource', action='store_true', dest='per_resource',
+                            help='also time building the items one resource at a time')
+
+    def handle(self, *args, **options):
+        all_ids = list(hydroshare.get_resource_list(public=True)
+                       .order_by('pk').values_list('pk', flat=True))
+        count = options['count']
+        for size in [int(s) for s in options['sizes'].split(',')]:
+            if size > len(all_ids):
+                self.stdout.write("{:>8} resources: skipped, the site has only {}"
+                                  .format(size, len(all_ids)))
+                continue
+            resource_ids = all_ids[:size]
+            last_page = max((size + count - 1) // count, 1)
+            for page in sorted({1, last_page}):
+                seconds, queries, status = time_page(resource_ids, page, count)
+                self.stdout.write("{:>8} resources, page {:>5}: {:8.3f} s, {:4} queries "
+                                  "(status {})".format(size, page, seconds, queries, status))
+            if options['per_resource']:
+                seconds, queries = time_per_resource(resource_ids)
+                self.stdout.write("{:>8} resources, per resource: {:8.3f} s, {:6} queries"
+                                  .format(size, seconds, queries))
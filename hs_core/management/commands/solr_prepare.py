@@ -6,13 +6,28 @@ any resource, all harvesting ceases. This has caused many bugs.
 
 from django.core.management.base import BaseCommand
 from hs_core.models import BaseResource
-from hs_core.search_indexes import BaseResourceIndex
+from hs_core.search_indexes import BaseResourceIndex, prefetch_index_data, INDEX_CHUNK_SIZE
 from pprint import pprint
 
 
+def iterate_prefetched(queryset, chunk_size=INDEX_CHUNK_SIZE):
+    """ yield resources with the metadata read by the index loaded a chunk at a time """
+    chunk = []
+    for obj in queryset.iterator():
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            prefetch_index_data(chunk)
+            for prefetched in chunk:
+                yield prefetched
+            chunk = []
+    prefetch_index_data(chunk)
+    for prefetched in chunk:
+        yield prefetched
+
+
 def debug_harvest():
     ind = BaseResourceIndex()
-    for obj in BaseResource.objects.all():
+    for obj in iterate_prefetched(BaseResource.objects.all().select_related('raccess')):
         print ("TESTING RESOURCE {}".format(obj.title.encode('ascii', 'replace')))
         print('sample_medium')
         pprint(ind.prepare_sample_medium(obj))
@@ -0,0 +1,27 @@
+"""
+This prints the state of the queue of resources waiting to be indexed in SOLR.
+* Optional argument --flush: index all queued resources now.
+"""
+
+from django.core.management.base import BaseCommand
+from hs_core.hydro_realtime_signal_processor import flush_index_queue, index_queue_stats
+
+
+class Command(BaseCommand):
+    help = "Print the depth and lag of the SOLR indexing queue."
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--flush',
+            action='store_true',  # True for presence, False for absence
+            dest='flush',         # value is options['flush']
+            help='index all queued resources now',
+        )
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            print("flushed {} resources".format(flush_index_queue(window=0, max_delay=0)))
+        stats = index_queue_stats()
+        print("queue depth: {}".format(stats['depth']))
+        print("index lag: {:.0f} seconds".format(stats['lag']))
@@ -1,11 +1,14 @@
 """This re-indexes resources in SOLR to fix problems during SOLR builds.
 * By default, prints errors on stdout.
 * Optional argument --log: logs output to system log.
+* Optional arguments --workers and --chunk: number of processes sending chunks of resources
+  to SOLR in parallel, and number of resources per chunk.
 """
 
 from django.core.management.base import BaseCommand
 from hs_core.models import BaseResource
 from hs_core.hydroshare.utils import get_resource_by_shortkey
+from hs_core.search_indexes import index_resources, INDEX_CHUNK_SIZE
 from haystack import connection_router, connections
 from haystack.exceptions import NotHandled
 import logging
@@ -99,25 +102,49 @@ class Command(BaseCommand):
             help='limit to resources with subfolders',
         )
 
-    def repair_filtered_solr(self, resource, options):
-        if (options['type'] is None or resource.resource_type == options['type']) and \
-           (options['storage'] is None or resource.storage_type == options['storage']) and \
-           (options['access'] != 'public' or resource.raccess.public) and \
-           (options['access'] != 'discoverable' or resource.raccess.discoverable) and \
-           (options['access'] != 'private' or not resource.raccess.discoverable) and \
-           (not options['has_subfolders'] or has_subfolders(resource)):
-            storage = resource.get_irods_storage()
-            if storage.exists(resource.root_path):
-                repair_solr(resource.short_id)
-            else:
-                print("{} does not exist in iRODS".format(resource.short_id))
+        parser.add_argument(
+            '--workers',
+            dest='workers',
+            type=int,
+            default=1,
+            help='number of processes sending resources to SOLR in parallel',
+        )
+
+        parser.add_argument(
+            '--chunk',
+            dest='chunk',
+            type=int,
+            default=INDEX_CHUNK_SIZE,
+            help='number of resources loaded and sent to SOLR together',
+        )
+
+    def filter_resource(self, resource, options):
+        """Return whether the resource matches the filter options."""
+        return (options['type'] is None or resource.resource_type == options['type']) and \
+            (options['storage'] is None or resource.storage_type == options['storage']) and \
+            (options['access'] != 'public' or resource.raccess.public) and \
+            (options['access'] != 'discoverable' or resource.raccess.discoverable) and \
+            (options['access'] != 'private' or not resource.raccess.discoverable) and \
+            (not options['has_subfolders'] or has_subfolders(resource))
 
     def handle(self, *args, **options):
         if len(options['resource_ids']) > 0:  # an array of resource short_id to check.
-            for rid in options['resource_ids']:
-                resource = get_resource_by_shortkey(rid)
-                self.repair_filtered_solr(resource, options)
-
+            resources = [get_resource_by_shortkey(rid) for rid in options['resource_ids']]
         else:
-            for resource in BaseResource.objects.all():
-                self.repair_filtered_solr(resource, options)
+            resources = BaseResource.objects.all().select_related('raccess').iterator()
+
+        resource_ids = []
+        for resource in resources:
+            if not self.filter_resource(resource, options):
+                continue
+            if resource.get_irods_storage().exists(resource.root_path):
+                self.stdout.write("re-indexing {} in solr".format(resource.short_id))
+                resource_ids.append(resource.pk)
+            else:
+                self.stdout.write("{} does not exist in iRODS".format(resource.short_id))
+
+        # documents are built from metadata loaded for a whole chunk of resources at once
+        indexed = index_resources(resource_ids, chunk_size=options['chunk'],
+                                  workers=options['workers'])
+        self.stdout.write("{} resources indexed, {} removed from solr".format(
+            indexed, len(resource_ids) - indexed))
@@ -0,0 +1,148 @@
+"""Caching of rendered science metadata XML documents.
+
+Rendering the metadata XML of a resource or an aggregation queries every metadata
+element. If METADATA_XML_CACHE_TTL is set to a positive number of seconds, rendered
+documents are kept in the Django cache named by METADATA_XML_CACHE_ALIAS, which must be
+shared by all processes (e.g., memcached or redis), so that unchanged metadata is served
+without touching the ORM.
+
+A document is keyed by the versions of the objects it is rendered from. Each version is
+a token in the same cache that is replaced whenever the object changes (see the signal
+handler below, which connect_signals() registers for the metadata models only):
+
+* a metadata container (CoreMetaData or AbstractFileMetaData subclass), when it is saved,
+  when any of its elements is saved or deleted, or when its resource is saved;
+* a logical file (aggregation), when it is saved or one of its files is saved or deleted.
+
+Changes made with QuerySet.update() send no signals; call invalidate() after those.
+"""
+
+import logging
+import threading
+from uuid import uuid4
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import post_save, post_delete
+
+logger = logging.getLogger(__name__)
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def _count(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def get_stats():
+    """Return the hit, miss and invalidation counters of this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def _shared_cache():
+    ttl = getattr(settings, 'METADATA_XML_CACHE_TTL', 0)
+    if not ttl:
+        return None, 0
+    from django.core.cache import caches
+    return caches[getattr(settings, 'METADATA_XML_CACHE_ALIAS', 'default')], ttl
+
+
+def _version_key(content_type_id, object_id):
+    return 'mdxml:v:{}:{}'.format(content_type_id, object_id)
+
+
+def _object_version_key(obj):
+    content_type = ContentType.objects.get_for_model(obj)
+    return _version_key(content_type.id, obj.pk)
+
+
+def _bump(content_type_id, object_id):
+    shared, _ = _shared_cache()
+    if shared is None or object_id is None:
+        return
+    _count('invalidations')
+    # a new random token, rather than an incremented number, so that a version evicted from
+    # the cache never comes back to a value under which an old document is stored
+    shared.set(_version_key(content_type_id, object_id), uuid4().hex, None)
+
+
+def invalidate(obj):
+    """Forget the documents rendered from a metadata container or logical file."""
+    content_type = ContentType.objects.get_for_model(obj)
+    _bump(content_type.id, obj.pk)
+
+
+def get_xml(render, sources, variant=''):
+    """
+    Return a metadata XML document, from the cache or by calling render()
+
+    :param render: callable returning the document
+    :param sources: the metadata containers and logical files the document is rendered from;
+        the first identifies the document
+    :param variant: distinguishes documents rendered from the same sources with different
+        options, e.g., pretty printing
+    :return: the document
+    """
+    shared, ttl = _shared_cache()
+    if shared is None:
+        return render()
+
+    version_keys = [_object_version_key(source) for source in sources]
+    versions = shared.get_many(version_keys)
+    for version_key in version_keys:
+        if version_key not in versions:
+            shared.add(version_key, uuid4().hex, None)
+            versions[version_key] = shared.get(version_key)
+    key = 'mdxml:{}:{}:{}'.format(version_keys[0], variant,
+                                  ':'.join(str(versions[k]) for k in version_keys))
+    xml = shared.get(key)
+    if xml is not None:
+        _count('hits')
+        return xml
+    _count('misses')
+    xml = render()
+    shared.set(key, xml, ttl)
+    return xml
+
+
+def _metadata_changed(sender, instance, **kwargs):
+    if _shared_cache()[0] is None:
+        return
+    # importing here to avoid circular import problem
+    from hs_core.models import AbstractMetaDataElement, AbstractResource, ResourceFile
+
+    if isinstance(instance, AbstractMetaDataElement):
+        _bump(instance.content_type_id, instance.object_id)
+    elif isinstance(instance, AbstractResource):
+        _bump(instance.content_type_id, instance.object_id)
+    elif isinstance(instance, ResourceFile):
+        _bump(instance.logical_file_content_type_id, instance.logical_file_object_id)
+    else:
+        invalidate(instance)
+
+
+def connect_signals():
+    """Connect the handler to the saves and deletes of the models documents are rendered from.
+
+    Called once all models are loaded, from the ready() of the hs_core app.
+    """
+    from hs_core.models import AbstractMetaDataElement, AbstractResource, CoreMetaData, \
+        ResourceFile
+    from hs_file_types.models.base import AbstractFileMetaData, AbstractLogicalFile
+
+    bases = (AbstractMetaDataElement, AbstractResource, ResourceFile, CoreMetaData,
+             AbstractFileMetaData, AbstractLogicalFile)
+    for model in apps.get_models():
+        if issubclass(model, bases):
+            post_save.connect(_metadata_changed, sender=model)
+            post_delete.connect(_metadata_changed, sender=model)
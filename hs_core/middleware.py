@@ -0,0 +1,29 @@
+from django.utils.deprecation import MiddlewareMixin
+
+from hs_core import authorization_cache
+
+
+class AuthorizationCacheMiddleware(MiddlewareMixin):
+    """Scope memoization of authorize() decisions to a single request.
+
+    Each request starts a fresh scope, so decisions never carry over from an earlier request
+    served by the same thread, even one that ended without a response.
+    """
+
+    def __call__(self, request):
+        authorization_cache.reset()
+        try:
+            return self.get_response(request)
+        finally:
+            authorization_cache.clear()
+
+    # MIDDLEWARE_CLASSES does not call __call__
+    def process_request(self, request):
+        authorization_cache.reset()
+
+    def process_response(self, request, response):
+        authorization_cache.clear()
+        return response
+
+    def process_exception(self, request, exception):
+        authorization_cache.clear()
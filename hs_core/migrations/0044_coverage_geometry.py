@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+
+import django.contrib.gis.db.models.fields
+from django.contrib.gis.geos import Point, Polygon
+from django.db import migrations
+
+
+def geometry_from_value(coverage_type, value_json):
+    """ the geometry of a box or point coverage value as of this migration, or None """
+    try:
+        value = json.loads(value_json)
+        if coverage_type == 'box':
+            geometry = Polygon.from_bbox(tuple(float(value[limit]) for limit in
+                                               ('eastlimit', 'southlimit',
+                                                'westlimit', 'northlimit')))
+        else:
+            geometry = Point(float(value['east']), float(value['north']))
+    except (KeyError, TypeError, ValueError):
+        return None
+    geometry.srid = 4326
+    return geometry
+
+
+def populate_geometry(apps, schema_editor):
+    Coverage = apps.get_model('hs_core', 'Coverage')
+    for coverage in Coverage.objects.filter(type__in=('box', 'point')).iterator():
+        geometry = geometry_from_value(coverage.type, coverage._value)
+        if geometry is not None:
+            Coverage.objects.filter(id=coverage.id).update(_geometry=geometry)
+
+
+def backwards(apps, schema_editor):
+    # the column is dropped by reversing AddField
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hs_core', '0043_auto_20190621_0308'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coverage',
+            name='_geometry',
+            field=django.contrib.gis.db.models.fields.GeometryField(blank=True, null=True,
+                                                                    srid=4326),
+        ),
+        migrations.RunPython(populate_geometry, backwards),
+    ]
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hs_core', '0044_coverage_geometry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexQueueEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False,
+                                        verbose_name='ID')),
+                ('resource_id', models.IntegerField(unique=True)),
+                ('short_id', models.CharField(max_length=32)),
+                ('first_queued', models.DateTimeField(db_index=True,
+                                                      default=django.utils.timezone.now)),
+                ('last_queued', models.DateTimeField(db_index=True,
+                                                     default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -13,6 +13,8 @@ from markdown import markdown
 from django_irods.icommands import SessionException
 
 from django.contrib.postgres.fields import HStoreField
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.geos import Polygon, Point
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.auth.models import User, Group
@@ -20,7 +22,7 @@ from django.contrib.contenttypes.models import ContentType
 from django.db import models
 from django.db.models import Q, Sum
 from django.db.models.signals import post_save
-from django.db import transaction
+from django.db import transaction, IntegrityError
 from django.dispatch import receiver
 from django.utils.timezone import now
 from django_irods.storage import IrodsStorage
@@ -41,9 +43,11 @@ from mezzanine.pages.managers import PageManager
 
 from dominate.tags import div, legend, table, tbody, tr, th, td, h4
 
+from hs_core import metadata_xml_cache
 from hs_core.irods import ResourceIRODSMixin, ResourceFileIRODSMixin
 
 import unicodedata
+from functools import wraps
 
 
 def clean_for_xml(s):
@@ -1177,12 +1181,45 @@ class Coverage(AbstractMetaDataElement):
                     'projection': name of the projection (optional)}"
     """
     _value = models.CharField(max_length=1024)
+    # geometry of a box or point coverage, kept in sync with _value on save so that
+    # spatial queries use the spatial index rather than parsing every coverage value
+    _geometry = GeometryField(srid=4326, null=True, blank=True)
 
     @property
     def value(self):
         """Return json representation of coverage values."""
         return json.loads(self._value)
 
+    @staticmethod
+    def geometry_from_value(coverage_type, value_json):
+        """Return the geometry of a box or point coverage value, None for other coverages.
+
+        :param coverage_type: the coverage type (box, point or period)
+        :param value_json: the json string stored in _value
+        """
+        try:
+            value = json.loads(value_json)
+            if coverage_type == 'box':
+                geometry = Polygon.from_bbox(tuple(float(value[limit]) for limit in
+                                                   ('eastlimit', 'southlimit',
+                                                    'westlimit', 'northlimit')))
+            elif coverage_type == 'point':
+                geometry = Point(float(value['east']), float(value['north']))
+            else:
+                return None
+        except (KeyError, TypeError, ValueError):
+            logger = logging.getLogger(__name__)
+            logger.error("Coverage value invalid for {} coverage: {}".format(coverage_type,
+                                                                             value_json))
+            return None
+        geometry.srid = 4326
+        return geometry
+
+    def save(self, *args, **kwargs):
+        """Update the geometry of the coverage from its value before saving."""
+        self._geometry = self.geometry_from_value(self.type, self._value)
+        super(Coverage, self).save(*args, **kwargs)
+
     @classmethod
     def create(cls, **kwargs):
         """Define custom create method for Coverage model.
@@ -1676,6 +1713,24 @@ class ResourceManager(PageManager):
         return qs
 
 
+def page_memoized(func):
+    """Define a property whose value is kept while a landing page is built.
+
+    The value is computed on every access, unless hs_core.landing_page.load() started a memo
+    on the object, so code changing a resource always sees current values.
+    """
+    @wraps(func)
+    def wrapper(self):
+        memo = getattr(self, '_page_memo', None)
+        if memo is None:
+            return func(self)
+        # keyed by the function, so that overrides calling super() keep separate values
+        if func not in memo:
+            memo[func] = func(self)
+        return memo[func]
+    return property(wrapper)
+
+
 class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
     """
     Create Abstract Class for all Resources.
@@ -1756,7 +1811,7 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
         """Return the last updated date stored in metadata"""
         return self.metadata.dates.all().filter(type='modified')[0].start_date
 
-    @property
+    @page_memoized
     def has_required_metadata(self):
         """Return True only if all required metadata is present."""
         if self.metadata is None or not self.metadata.has_all_required_elements():
@@ -1766,7 +1821,7 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
                 return False
         return True
 
-    @property
+    @page_memoized
     def can_be_public_or_discoverable(self):
         """Return True if the resource can be set to public or discoverable.
 
@@ -2022,7 +2077,7 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
         """
         istorage = self.get_irods_storage()
         root_path = self.root_path
-        istorage.session.run("imeta", None, 'rm', '-C', root_path, attribute, value)
+        istorage.removeAVU(root_path, attribute, value)
 
     def setAVU(self, attribute, value):
         """Set an AVU at the resource level.
@@ -2038,7 +2093,7 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
         # the need for setting quota holder on the resource collection before adding files into
         # the resource collection in order for the real-time iRODS quota micro-services to work
         if not istorage.exists(root_path):
-            istorage.session.run("imkdir", None, '-p', root_path)
+            istorage.saveFile('', root_path + '/', create_directory=True)
         istorage.setAVU(root_path, attribute, value)
 
     def getAVU(self, attribute):
@@ -2138,8 +2193,11 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
         must override this method. See Composite Resource
         type as an example
         """
-        return self.metadata.get_xml(pretty_print=pretty_print,
-                                     include_format_elements=include_format_elements)
+        metadata = self.metadata
+        return metadata_xml_cache.get_xml(
+            lambda: metadata.get_xml(pretty_print=pretty_print,
+                                     include_format_elements=include_format_elements),
+            [metadata], variant='{}:{}'.format(int(pretty_print), int(include_format_elements)))
 
     def is_aggregation_xml_file(self, file_path):
         """Checks if the file path *file_path* is one of the aggregation related xml file paths
@@ -2361,7 +2419,15 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
                 return {'content': readme_file_content, 'file_name': readme_file.file_name}
         return readme_file
 
-    @property
+    def get_page_prefetch_lookups(self):
+        """Return the prefetch_related lookups loaded with a landing page of the resource.
+
+        Resource types that keep aggregations must override this method to prefetch them.
+        See Composite Resource type as an example
+        """
+        return ['files__logical_file_content_object']
+
+    @page_memoized
     def logical_files(self):
         """Get a list of logical files for resource."""
         logical_files_list = []
@@ -2371,7 +2437,7 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
                     logical_files_list.append(res_file.logical_file)
         return logical_files_list
 
-    @property
+    @page_memoized
     def aggregation_types(self):
         """Gets a list of all aggregation types that currently exist in this resource"""
         aggr_types = []
@@ -2411,13 +2477,13 @@ class AbstractResource(ResourcePermissionsMixin, ResourceIRODSMixin):
 
         return logical_files_list
 
-    @property
+    @page_memoized
     def has_logical_spatial_coverage(self):
         """Checks if any of the logical files has spatial coverage"""
 
         return any(lf.metadata.spatial_coverage is not None for lf in self.logical_files)
 
-    @property
+    @page_memoized
     def has_logical_temporal_coverage(self):
         """Checks if any of the logical files has temporal coverage"""
 
@@ -2713,6 +2779,40 @@ class ResourceFile(ResourceFileIRODSMixin):
         # otherwise, the copy must precede this step.
         return ResourceFile.objects.create(**kwargs)
 
+    @classmethod
+    def bulk_link(cls, resource, files):
+        """Create records for many files that already exist in iRODS in one insert.
+
+        :param resource: resource that contains the files.
+        :param files: list of (folder, file name, size) tuples, as for the third form
+        of create(), plus the size in bytes as listed by iRODS.
+        :return: the ResourceFile of every file, in the order given. Files that are already
+        linked keep their existing record.
+
+        Unlike create(), existing records are looked up with a single query and new ones
+        are inserted by bulk_create, so no save() is called and no signals are sent.
+        """
+        path_field = 'fed_resource_file' if resource.is_federated else 'resource_file'
+        other_field = 'resource_file' if resource.is_federated else 'fed_resource_file'
+        paths = [get_resource_file_path(resource, name, folder=folder)
+                 for folder, name, _ in files]
+
+        res_files = {}
+        for res_file in cls.objects.filter(object_id=resource.id,
+                                           **{path_field + '__in': paths}):
+            res_files[getattr(res_file, path_field).name] = res_file
+
+        new_files = []
+        for (folder, _, size), path in zip(files, paths):
+            if path not in res_files:
+                res_file = cls(content_object=resource, file_folder=folder, _size=size,
+                               **{path_field: path, other_field: None})
+                res_files[path] = res_file
+                new_files.append(res_file)
+        # primary keys are set on the new objects, as the database is PostgreSQL
+        cls.objects.bulk_create(new_files)
+        return [res_files[path] for path in paths]
+
     # TODO: automagically handle orphaned logical files
     def delete(self):
         """Delete a resource file record and the file contents.
@@ -2966,16 +3066,29 @@ class ResourceFile(ResourceFileIRODSMixin):
     @classmethod
     def get(cls, resource, file, folder=None):
         """Get a ResourceFile record via its short path."""
+        return cls._filter_by_storage_path(
+            resource, get_resource_file_path(resource, file, folder)).get()
+
+    @classmethod
+    def get_by_storage_path(cls, resource, storage_path):
+        """Get a ResourceFile record via its storage path, or None if there is no such file.
+
+        :param resource: resource containing the file
+        :param storage_path: path as returned by storage_path, i.e., starting with the
+        resource id or, for a federated resource, with the federation path
+
+        This is a single query over the (object_id, path) indexes of ResourceFile.
+        """
+        return cls._filter_by_storage_path(resource, storage_path).first()
+
+    @classmethod
+    def _filter_by_storage_path(cls, resource, storage_path):
         if resource.resource_federation_path:
-            return ResourceFile.objects.get(object_id=resource.id,
-                                            fed_resource_file=get_resource_file_path(resource,
-                                                                                     file,
-                                                                                     folder))
+            return ResourceFile.objects.filter(object_id=resource.id,
+                                               fed_resource_file=storage_path)
         else:
-            return ResourceFile.objects.get(object_id=resource.id,
-                                            resource_file=get_resource_file_path(resource,
-                                                                                 file,
-                                                                                 folder))
+            return ResourceFile.objects.filter(object_id=resource.id,
+                                               resource_file=storage_path)
 
     # TODO: move to BaseResource as instance method
     @classmethod
@@ -3171,6 +3284,32 @@ class Bags(models.Model):
         return self.content_object.get_content_model()
 
 
+class IndexQueueEntry(models.Model):
+    """Represent a resource whose Solr index document is waiting to be updated.
+
+    Entries are written by HydroQueuedSignalProcessor and consumed in batches by the
+    flush_index_queue task. Repeated saves of a resource update last_queued of its one entry.
+    """
+
+    # not a foreign key: the entry of a deleted resource is used to remove it from the index
+    resource_id = models.IntegerField(unique=True)
+    short_id = models.CharField(max_length=32)
+    first_queued = models.DateTimeField(default=now, db_index=True)
+    last_queued = models.DateTimeField(default=now, db_index=True)
+
+    @classmethod
+    def enqueue(cls, resource):
+        """Queue a resource for indexing, coalescing with an entry already queued for it."""
+        if cls.objects.filter(resource_id=resource.pk).update(last_queued=now()):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(resource_id=resource.pk, short_id=resource.short_id)
+        except IntegrityError:
+            # queued concurrently by another request
+            pass
+
+
 class PublicResourceManager(models.Manager):
     """Extend Django model Manager to allow for public resource access."""
 
@@ -3304,14 +3443,21 @@ class BaseResource(Page, AbstractResource):
     @property
     def bag_url(self):
         """Get bag url of resource data bag."""
+        return self.get_bag_url(self.short_id)
+
+    @staticmethod
+    def get_bag_url(short_id):
+        """Get bag url of the resource identified by short_id without fetching the resource.
+
+        The download url does not depend upon federation, so no federated iRODS session
+        needs to be started to compute it.
+        """
         bagit_path = getattr(settings, 'IRODS_BAGIT_PATH', 'bags')
         bagit_postfix = getattr(settings, 'IRODS_BAGIT_POSTFIX', 'zip')
         bag_path = "{path}/{resource_id}.{postfix}".format(path=bagit_path,
-                                                           resource_id=self.short_id,
+                                                           resource_id=short_id,
                                                            postfix=bagit_postfix)
-        istorage = self.get_irods_storage()
-        bag_url = istorage.url(bag_path)
-        return bag_url
+        return IrodsStorage().url(bag_path)
 
     # URIs relative to resource
     # these are independent of federation strategy
@@ -3556,42 +3702,79 @@ class CoreMetaData(models.Model):
         """Return base resource object that the metadata defines."""
         return BaseResource.objects.filter(object_id=self.id).first()
 
+    def _is_prefetched(self, relation_name):
+        """Whether the elements of a relation were prefetched, e.g. by hs_core.landing_page."""
+        return relation_name in getattr(self, '_prefetched_objects_cache', {})
+
+    def _first_element(self, relation_name, matches=None):
+        """Return the first prefetched element of a relation, as its first() would.
+
+        :param relation_name: name of the GenericRelation of the elements, which must have been
+        prefetched (see _is_prefetched)
+        :param matches: optional function selecting the elements to consider
+        """
+        prefetched = getattr(self, '_prefetched_objects_cache', {}).get(relation_name)
+        if prefetched is None:
+            return None
+        elements = [element for element in prefetched if matches is None or matches(element)]
+        if not elements:
+            return None
+        if elements[0]._meta.ordering:
+            return elements[0]
+        return min(elements, key=lambda element: element.pk)
+
     @property
     def title(self):
         """Return the first title object from metadata."""
+        if self._is_prefetched('_title'):
+            return self._first_element('_title')
         return self._title.all().first()
 
     @property
     def description(self):
         """Return the first description object from metadata."""
+        if self._is_prefetched('_description'):
+            return self._first_element('_description')
         return self._description.all().first()
 
     @property
     def language(self):
         """Return the first _language object from metadata."""
+        if self._is_prefetched('_language'):
+            return self._first_element('_language')
         return self._language.all().first()
 
     @property
     def rights(self):
         """Return the first rights object from metadata."""
+        if self._is_prefetched('_rights'):
+            return self._first_element('_rights')
         return self._rights.all().first()
 
     @property
     def type(self):
         """Return the first _type object from metadata."""
+        if self._is_prefetched('_type'):
+            return self._first_element('_type')
         return self._type.all().first()
 
     @property
     def publisher(self):
         """Return the first _publisher object from metadata."""
+        if self._is_prefetched('_publisher'):
+            return self._first_element('_publisher')
         return self._publisher.all().first()
 
     @property
     def spatial_coverage(self):
+        if self._is_prefetched('coverages'):
+            return self._first_element('coverages', lambda cov: cov.type != 'period')
         return self.coverages.exclude(type='period').first()
 
     @property
     def temporal_coverage(self):
+        if self._is_prefetched('coverages'):
+            return self._first_element('coverages', lambda cov: cov.type == 'period')
         return self.coverages.filter(type='period').first()
 
     @property
@@ -3957,7 +4140,6 @@ class CoreMetaData(models.Model):
         resource = BaseResource.objects.filter(object_id=self.id).first()
         rt = [rt for rt in get_resource_types()
               if rt._meta.object_name == resource.resource_type][0]
-        resource = rt.objects.get(id=resource.id)
 
         # create the title element
         if self.title:
@@ -4111,13 +4293,12 @@ class CoreMetaData(models.Model):
         rdf_Description_resource.set('{%s}about' % self.NAMESPACES['rdf'], self.type.url)
         rdfs1_label = etree.SubElement(rdf_Description_resource,
                                        '{%s}label' % self.NAMESPACES['rdfs1'])
-        rdfs1_label.text = resource._meta.verbose_name
+        rdfs1_label.text = rt._meta.verbose_name
         rdfs1_isDefinedBy = etree.SubElement(rdf_Description_resource,
                                              '{%s}isDefinedBy' % self.NAMESPACES['rdfs1'])
         rdfs1_isDefinedBy.text = current_site_url() + "/terms"
 
         # encode extended key/value arbitrary metadata
-        resource = BaseResource.objects.filter(object_id=self.id).first()
         for key, value in resource.extra_metadata.items():
             hsterms_key_value = etree.SubElement(
                 rdf_Description, '{%s}extendedMetadata' % self.NAMESPACES['hsterms'])
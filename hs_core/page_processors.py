@@ -8,6 +8,7 @@ from mezzanine.pages.page_processors import processor_for
 
 from forms import ExtendedMetadataForm
 from hs_core import languages_iso
+from hs_core.landing_page import load as load_page_data, get_view_context
 from hs_core.hydroshare.resource import METADATA_STATUS_SUFFICIENT, METADATA_STATUS_INSUFFICIENT, \
     res_has_web_reference
 from hs_core.models import GenericResource, Relation
@@ -57,14 +58,15 @@ def get_page_context(page, user, resource_edit=False, extended_metadata_layout=N
             raise PermissionDenied()
         return redirect_to_login(request.path)
 
+    # collect the data of the page in a bounded number of queries
+    load_page_data(content_model)
+
     discoverable = content_model.raccess.discoverable
     validation_error = None
     resource_is_mine = False
     if user.is_authenticated():
         resource_is_mine = content_model.rlabels.is_mine(user)
 
-    metadata_status = _get_metadata_status(content_model)
-
     belongs_to_collections = content_model.collections.all()
 
     relevant_tools = None
@@ -114,84 +116,15 @@ def get_page_context(page, user, resource_edit=False, extended_metadata_layout=N
 
     qholder = content_model.get_quota_holder()
 
-    readme = content_model.get_readme_file_content()
-    if readme is None:
-        readme = ''
-    has_web_ref = res_has_web_reference(content_model)
-
-    keywords = json.dumps([sub.value for sub in content_model.metadata.subjects.all()])
-
     # user requested the resource in READONLY mode
     if not resource_edit:
         content_model.update_view_count(request)
-        temporal_coverage = content_model.metadata.temporal_coverage
-        temporal_coverage_data_dict = {}
-        if temporal_coverage:
-            start_date = parser.parse(temporal_coverage.value['start'])
-            end_date = parser.parse(temporal_coverage.value['end'])
-            temporal_coverage_data_dict['start_date'] = start_date.strftime('%Y-%m-%d')
-            temporal_coverage_data_dict['end_date'] = end_date.strftime('%Y-%m-%d')
-            temporal_coverage_data_dict['name'] = temporal_coverage.value.get('name', '')
-
-        spatial_coverage = content_model.metadata.spatial_coverage
-        spatial_coverage_data_dict = {}
-        spatial_coverage_data_dict['default_units'] = \
-            content_model.metadata.spatial_coverage_default_units
-        spatial_coverage_data_dict['default_projection'] = \
-            content_model.metadata.spatial_coverage_default_projection
-        spatial_coverage_data_dict['exists'] = False
-        if spatial_coverage:
-            spatial_coverage_data_dict['exists'] = True
-            spatial_coverage_data_dict['name'] = spatial_coverage.value.get('name', None)
-            spatial_coverage_data_dict['units'] = spatial_coverage.value['units']
-            spatial_coverage_data_dict['zunits'] = spatial_coverage.value.get('zunits', None)
-            spatial_coverage_data_dict['projection'] = spatial_coverage.value.get('projection',
-                                                                                  None)
-            spatial_coverage_data_dict['type'] = spatial_coverage.type
-            if spatial_coverage.type == 'point':
-                spatial_coverage_data_dict['east'] = spatial_coverage.value['east']
-                spatial_coverage_data_dict['north'] = spatial_coverage.value['north']
-                spatial_coverage_data_dict['elevation'] = spatial_coverage.value.get('elevation',
-                                                                                     None)
-            else:
-                spatial_coverage_data_dict['northlimit'] = spatial_coverage.value['northlimit']
-                spatial_coverage_data_dict['eastlimit'] = spatial_coverage.value['eastlimit']
-                spatial_coverage_data_dict['southlimit'] = spatial_coverage.value['southlimit']
-                spatial_coverage_data_dict['westlimit'] = spatial_coverage.value['westlimit']
-                spatial_coverage_data_dict['uplimit'] = spatial_coverage.value.get('uplimit', None)
-                spatial_coverage_data_dict['downlimit'] = spatial_coverage.value.get('downlimit',
-                                                                                     None)
-        languages_dict = dict(languages_iso.languages)
-        language = languages_dict[content_model.metadata.language.code] if \
-            content_model.metadata.language else None
-        title = content_model.metadata.title.value if content_model.metadata.title else None
-        abstract = content_model.metadata.description.abstract if \
-            content_model.metadata.description else None
-
-        missing_metadata_elements = content_model.metadata.get_required_missing_elements()
         maps_key = settings.MAPS_KEY if hasattr(settings, 'MAPS_KEY') else ''
 
         context = {
                    'cm': content_model,
                    'resource_edit_mode': resource_edit,
                    'metadata_form': None,
-                   'citation': content_model.get_citation(),
-                   'title': title,
-                   'readme': readme,
-                   'abstract': abstract,
-                   'creators': content_model.metadata.creators.all(),
-                   'contributors': content_model.metadata.contributors.all(),
-                   'temporal_coverage': temporal_coverage_data_dict,
-                   'spatial_coverage': spatial_coverage_data_dict,
-                   'keywords': keywords,
-                   'language': language,
-                   'rights': content_model.metadata.rights,
-                   'sources': content_model.metadata.sources.all(),
-                   'relations': content_model.metadata.relations.all(),
-                   'show_relations_section': show_relations_section(content_model),
-                   'fundingagencies': content_model.metadata.funding_agencies.all(),
-                   'metadata_status': metadata_status,
-                   'missing_metadata_elements': missing_metadata_elements,
                    'validation_error': validation_error if validation_error else None,
                    'resource_creation_error': create_resource_error,
                    'relevant_tools': relevant_tools,
@@ -207,10 +140,11 @@ def get_page_context(page, user, resource_edit=False, extended_metadata_layout=N
                    'allow_resource_copy': allow_copy,
                    'quota_holder': qholder,
                    'belongs_to_collections': belongs_to_collections,
-                   'show_web_reference_note': has_web_ref,
                    'current_user': user,
                    'maps_key': maps_key
         }
+        context.update(get_view_context(
+            content_model, user, lambda: _get_view_mode_metadata_context(content_model)))
 
         if 'task_id' in request.session:
             task_id = request.session.get('task_id', None)
@@ -233,6 +167,13 @@ def get_page_context(page, user, resource_edit=False, extended_metadata_layout=N
     if not can_change:
         raise PermissionDenied()
 
+    metadata_status = _get_metadata_status(content_model)
+    readme = content_model.get_readme_file_content()
+    if readme is None:
+        readme = ''
+    has_web_ref = res_has_web_reference(content_model)
+    keywords = json.dumps([sub.value for sub in content_model.metadata.subjects.all()])
+
     temporal_coverage = content_model.metadata.temporal_coverage
     temporal_coverage_data_dict = {}
     if temporal_coverage:
@@ -317,6 +258,76 @@ def get_page_context(page, user, resource_edit=False, extended_metadata_layout=N
     return context
 
 
+def _get_view_mode_metadata_context(content_model):
+    """Return the parts of the view mode page context that do not depend on the viewer."""
+    readme = content_model.get_readme_file_content()
+    if readme is None:
+        readme = ''
+
+    temporal_coverage = content_model.metadata.temporal_coverage
+    temporal_coverage_data_dict = {}
+    if temporal_coverage:
+        start_date = parser.parse(temporal_coverage.value['start'])
+        end_date = parser.parse(temporal_coverage.value['end'])
+        temporal_coverage_data_dict['start_date'] = start_date.strftime('%Y-%m-%d')
+        temporal_coverage_data_dict['end_date'] = end_date.strftime('%Y-%m-%d')
+        temporal_coverage_data_dict['name'] = temporal_coverage.value.get('name', '')
+
+    spatial_coverage = content_model.metadata.spatial_coverage
+    spatial_coverage_data_dict = {}
+    spatial_coverage_data_dict['default_units'] = \
+        content_model.metadata.spatial_coverage_default_units
+    spatial_coverage_data_dict['default_projection'] = \
+        content_model.metadata.spatial_coverage_default_projection
+    spatial_coverage_data_dict['exists'] = False
+    if spatial_coverage:
+        spatial_coverage_data_dict['exists'] = True
+        spatial_coverage_data_dict['name'] = spatial_coverage.value.get('name', None)
+        spatial_coverage_data_dict['units'] = spatial_coverage.value['units']
+        spatial_coverage_data_dict['zunits'] = spatial_coverage.value.get('zunits', None)
+        spatial_coverage_data_dict['projection'] = spatial_coverage.value.get('projection', None)
+        spatial_coverage_data_dict['type'] = spatial_coverage.type
+        if spatial_coverage.type == 'point':
+            spatial_coverage_data_dict['east'] = spatial_coverage.value['east']
+            spatial_coverage_data_dict['north'] = spatial_coverage.value['north']
+            spatial_coverage_data_dict['elevation'] = spatial_coverage.value.get('elevation', None)
+        else:
+            spatial_coverage_data_dict['northlimit'] = spatial_coverage.value['northlimit']
+            spatial_coverage_data_dict['eastlimit'] = spatial_coverage.value['eastlimit']
+            spatial_coverage_data_dict['southlimit'] = spatial_coverage.value['southlimit']
+            spatial_coverage_data_dict['westlimit'] = spatial_coverage.value['westlimit']
+            spatial_coverage_data_dict['uplimit'] = spatial_coverage.value.get('uplimit', None)
+            spatial_coverage_data_dict['downlimit'] = spatial_coverage.value.get('downlimit', None)
+    languages_dict = dict(languages_iso.languages)
+    language = languages_dict[content_model.metadata.language.code] if \
+        content_model.metadata.language else None
+    title = content_model.metadata.title.value if content_model.metadata.title else None
+    abstract = content_model.metadata.description.abstract if \
+        content_model.metadata.description else None
+
+    # lists rather than querysets, so that the context can be cached
+    return {
+        'citation': content_model.get_citation(),
+        'title': title,
+        'readme': readme,
+        'abstract': abstract,
+        'creators': list(content_model.metadata.creators.all()),
+        'contributors': list(content_model.metadata.contributors.all()),
+        'temporal_coverage': temporal_coverage_data_dict,
+        'spatial_coverage': spatial_coverage_data_dict,
+        'keywords': json.dumps([sub.value for sub in content_model.metadata.subjects.all()]),
+        'language': language,
+        'rights': content_model.metadata.rights,
+        'sources': list(content_model.metadata.sources.all()),
+        'relations': list(content_model.metadata.relations.all()),
+        'show_relations_section': show_relations_section(content_model),
+        'fundingagencies': list(content_model.metadata.funding_agencies.all()),
+        'metadata_status': _get_metadata_status(content_model),
+        'missing_metadata_elements': content_model.metadata.get_required_missing_elements(),
+        'show_web_reference_note': res_has_web_reference(content_model),
+    }
+
+
 def check_resource_mode(request):
     """Determine whether the `request` represents an attempt to edit a resource.
 
@@ -1,12 +1,17 @@
 """Define search indexes for hs_core module."""
 
-from haystack import indexes
+from collections import defaultdict
+from multiprocessing import Pool
+
+from django import db
+from haystack import connection_router, connections, indexes
 from hs_core.models import BaseResource
+from hs_access_control.models import PrivilegeCodes, UserResourcePrivilege
 from hs_geographic_feature_resource.models import GeographicFeatureMetaData
 from hs_app_netCDF.models import NetcdfMetaData
 from ref_ts.models import RefTSMetadata
 from hs_app_timeseries.models import TimeSeriesMetaData
-from django.db.models import Q
+from django.db.models import Q, prefetch_related_objects
 from datetime import datetime
 from nameparser import HumanName
 import probablepeople
@@ -63,6 +68,142 @@ def normalize_name(name):
     return normalized.strip()
 
 
+# relations of the metadata of every resource type that are read by BaseResourceIndex
+METADATA_PREFETCH = ('_title', '_description', '_publisher', '_language', 'creators',
+                     'contributors', 'subjects', 'coverages', 'formats', 'identifiers',
+                     'sources', 'relations')
+
+# relations read only from the metadata of particular resource types
+EXTENDED_METADATA_PREFETCH = (
+    (GeographicFeatureMetaData, ('geometryinformations', 'fieldinformations')),
+    (NetcdfMetaData, ('variables',)),
+    (RefTSMetadata, ('variables', 'sites', 'methods', 'quality_levels', 'datasources')),
+    (TimeSeriesMetaData, ('_variables', '_sites', '_methods', '_time_series_results')),
+)
+
+# number of resources loaded and sent to SOLR together by index_resources()
+INDEX_CHUNK_SIZE = 100
+
+
+def prefetch_index_data(resources):
+    """
+    Load everything BaseResourceIndex reads of a list of resources in a fixed number of queries.
+
+    Related metadata elements are cached on the objects, so that the prepare_* methods of the
+    index read them from memory rather than running their own queries for each field.
+    """
+    resources = [res for res in resources if not getattr(res, '_index_prefetched', False)]
+    if not resources:
+        return
+    prefetch_related_objects(resources, 'content_object', 'comments',
+                             'files__logical_file_content_object')
+
+    metadata_by_class = defaultdict(list)
+    for res in resources:
+        if res.content_object is not None:
+            metadata_by_class[type(res.content_object)].append(res.content_object)
+    # generic relations can only be prefetched for metadata objects of one class at a time
+    for metadata_class, metadata in metadata_by_class.items():
+        lookups = list(METADATA_PREFETCH)
+        for extended_class, extended_lookups in EXTENDED_METADATA_PREFETCH:
+            if issubclass(metadata_class, extended_class):
+                lookups.extend(extended_lookups)
+        prefetch_related_objects(metadata, *lookups)
+
+    owners = defaultdict(list)
+    for privilege in UserResourcePrivilege.objects.filter(resource__in=resources,
+                                                          privilege=PrivilegeCodes.OWNER,
+                                                          user__is_active=True)\
+            .select_related('user'):
+        owners[privilege.resource_id].append(privilege.user)
+    for res in resources:
+        res._index_owners = owners[res.pk]
+        res._index_prefetched = True
+
+
+def first_element(related):
+    """ Return the element of a metadata relation with the lowest id, as .first() would. """
+    elements = list(related.all())
+    return min(elements, key=lambda element: element.pk) if elements else None
+
+
+def first_creator(obj):
+    """ Return the first creator of a resource. """
+    for creator in obj.metadata.creators.all():
+        if creator.order == 1:
+            return creator
+    return None
+
+
+def resource_owners(obj):
+    """ Return the active owners of a resource. """
+    if hasattr(obj, '_index_owners'):
+        return obj._index_owners
+    return list(obj.raccess.owners.all())
+
+
+def send_resources_to_index(resource_ids, using=None):
+    """
+    Index public and discoverable resources and remove other resources from SOLR.
+
+    Resources that no longer exist are removed by their index identifier.
+    :param resource_ids: primary keys of the resources
+    :param using: the haystack connection to write to; all write connections if None
+    :return: the number of resources sent to SOLR to be indexed
+    """
+    resources = list(BaseResource.objects.filter(pk__in=resource_ids).select_related('raccess'))
+    to_index = [res for res in resources if res.raccess.public or res.raccess.discoverable]
+    indexed_ids = set(res.pk for res in to_index)
+    to_remove = [res for res in resources if res.pk not in indexed_ids]
+    found = set(res.pk for res in resources)
+    to_remove.extend('hs_core.baseresource.{}'.format(resource_id)
+                     for resource_id in resource_ids if resource_id not in found)
+    prefetch_index_data(to_index)
+
+    for alias in [using] if using else connection_router.for_write():
+        backend = connections[alias].get_backend()
+        index = connections[alias].get_unified_index().get_index(BaseResource)
+        if to_index:
+            backend.update(index, to_index, commit=not to_remove)
+        for i, obj in enumerate(to_remove):
+            backend.remove(obj, commit=i == len(to_remove) - 1)
+    return len(to_index)
+
+
+def _send_chunk_to_index(resource_ids):
+    """ index one chunk of resources in a worker process of index_resources() """
+    try:
+        return send_resources_to_index(resource_ids)
+    finally:
+        db.connections.close_all()
+
+
+def index_resources(resource_ids, chunk_size=INDEX_CHUNK_SIZE, workers=1):
+    """
+    Send resources to SOLR in chunks, optionally building documents in parallel processes.
+
+    Each chunk of resources is loaded together with all metadata the index reads in a fixed
+    number of queries (see prefetch_index_data) and sent to SOLR in one request.
+    :param resource_ids: primary keys of the resources
+    :param chunk_size: number of resources per chunk
+    :param workers: number of worker processes; chunks are sent from this process if 1
+    :return: the number of resources indexed
+    """
+    resource_ids = list(resource_ids)
+    chunks = [resource_ids[i:i + chunk_size] for i in range(0, len(resource_ids), chunk_size)]
+    if workers <= 1 or len(chunks) <= 1:
+        return sum(send_resources_to_index(chunk) for chunk in chunks)
+
+    # database connections must not be shared with forked worker processes
+    db.connections.close_all()
+    pool = Pool(workers)
+    try:
+        return sum(pool.imap_unordered(_send_chunk_to_index, chunks))
+    finally:
+        pool.close()
+        pool.join()
+
+
 class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     """Define base class for resource indexes."""
 
@@ -154,7 +295,12 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     def index_queryset(self, using=None):
         """Return queryset including discoverable and public resources."""
         return self.get_model().objects.filter(Q(raccess__discoverable=True) |
-                                               Q(raccess__public=True))
+                                               Q(raccess__public=True)).select_related('raccess')
+
+    def prepare(self, obj):
+        """Load the data read by the prepare_* methods, unless loaded for a batch already."""
+        prefetch_index_data([obj])
+        return super(BaseResourceIndex, self).prepare(obj)
 
     def prepare_created(self, obj):
         return obj.created.strftime('%Y-%m-%dT%H:%M:%SZ')
@@ -164,16 +310,18 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
 
     def prepare_title(self, obj):
         """Return metadata title if exists, otherwise return 'none'."""
-        if hasattr(obj, 'metadata') and obj.metadata.title.value is not None:
-            return obj.metadata.title.value.lstrip()
+        title = first_element(obj.metadata._title) if hasattr(obj, 'metadata') else None
+        if title is not None and title.value is not None:
+            return title.value.lstrip()
         else:
             return 'none'
 
     def prepare_abstract(self, obj):
         """Return metadata abstract if exists, otherwise return None."""
-        if hasattr(obj, 'metadata') and obj.metadata.description is not None and \
-                obj.metadata.description.abstract is not None:
-            return obj.metadata.description.abstract.lstrip()
+        description = first_element(obj.metadata._description) \
+            if hasattr(obj, 'metadata') else None
+        if description is not None and description.abstract is not None:
+            return description.abstract.lstrip()
         else:
             return None
 
@@ -184,11 +332,11 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         This must be represented as a single-value field to enable sorting.
         """
         if hasattr(obj, 'metadata'):
-            first_creator = obj.metadata.creators.filter(order=1).first()
-            if first_creator.name:
-                return first_creator.name.lstrip()
-            elif first_creator.organization:
-                return first_creator.organization.strip()
+            creator = first_creator(obj)
+            if creator.name:
+                return creator.name.lstrip()
+            elif creator.organization:
+                return creator.organization.strip()
             else:
                 return 'none'
         else:
@@ -202,12 +350,12 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         This must be represented as a single-value field to enable sorting.
         """
         if hasattr(obj, 'metadata'):
-            first_creator = obj.metadata.creators.filter(order=1).first()
-            if first_creator.name:
-                normalized = normalize_name(first_creator.name)
+            creator = first_creator(obj)
+            if creator.name:
+                normalized = normalize_name(creator.name)
                 return normalized
-            elif first_creator.organization:
-                return first_creator.organization.strip()
+            elif creator.organization:
+                return creator.organization.strip()
             else:
                 return 'none'
         else:
@@ -220,9 +368,9 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         This field is stored but not indexed, to avoid hitting the Django database during response.
         """
         if hasattr(obj, 'metadata'):
-            first_creator = obj.metadata.creators.filter(order=1).first()
-            if first_creator.description is not None:
-                return first_creator.description
+            creator = first_creator(obj)
+            if creator.description is not None:
+                return creator.description
             else:
                 return None
         else:
@@ -236,8 +384,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """
         if hasattr(obj, 'metadata'):
             return [normalize_name(creator.name)
-                    for creator in obj.metadata.creators.all()
-                    .exclude(name__isnull=True).exclude(name='')]
+                    for creator in obj.metadata.creators.all() if creator.name]
         else:
             return []
 
@@ -249,8 +396,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """
         if hasattr(obj, 'metadata'):
             output1 = [normalize_name(contributor.name)
-                       for contributor in obj.metadata.contributors.all()
-                       .exclude(name__isnull=True).exclude(name='')]
+                       for contributor in obj.metadata.contributors.all() if contributor.name]
             return list(set(output1))  # eliminate duplicates
         else:
             return []
@@ -263,7 +409,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """
         if hasattr(obj, 'metadata'):
             return [subject.value.strip() for subject in obj.metadata.subjects.all()
-                    .exclude(value__isnull=True)]
+                    if subject.value is not None]
         else:
             return []
 
@@ -283,7 +429,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         Return metadata publisher if it exists; otherwise return empty array.
         """
         if hasattr(obj, 'metadata'):
-            publisher = obj.metadata.publisher
+            publisher = first_element(obj.metadata._publisher)
             if publisher is not None:
                 return unicode(publisher).lstrip()
             else:
@@ -295,7 +441,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """Return metadata emails if exists, otherwise return empty array."""
         if hasattr(obj, 'metadata'):
             return [creator.email.strip() for creator in obj.metadata.creators.all()
-                    .exclude(email__isnull=True).exclude(email='')]
+                    if creator.email]
         else:
             return []
 
@@ -322,7 +468,8 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     def prepare_replaced(self, obj):
         """Return True if 'isReplacedBy' attribute exists, otherwise return False."""
         if hasattr(obj, 'metadata'):
-            return obj.metadata.relations.all().filter(type='isReplacedBy').exists()
+            return any(relation.type == 'isReplacedBy'
+                       for relation in obj.metadata.relations.all())
         else:
             return False
 
@@ -525,7 +672,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     def prepare_language(self, obj):
         """Return resource language if exists, otherwise return None."""
         if hasattr(obj, 'metadata'):
-            return obj.metadata.language.code.strip()
+            return first_element(obj.metadata._language).code.strip()
         else:
             return None
 
@@ -567,7 +714,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
     def prepare_owner_login(self, obj):
         """Return list of usernames that have ownership access to resource."""
         if hasattr(obj, 'raccess'):
-            return [owner.username for owner in obj.raccess.owners.all()]
+            return [owner.username for owner in resource_owners(obj)]
         else:
             return []
 
@@ -576,7 +723,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """Return list of names of resource owners."""
         names = []
         if hasattr(obj, 'raccess'):
-            for owner in obj.raccess.owners.all():
+            for owner in resource_owners(obj):
                 name = normalize_name(owner.first_name.capitalize() +
                                       ' ' + owner.last_name.capitalize())
                 names.append(name)
@@ -589,24 +736,22 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         output1 = []
         output2 = []
         if hasattr(obj, 'raccess'):
-            for owner in obj.raccess.owners.all():
+            for owner in resource_owners(obj):
                 name = normalize_name(owner.first_name.capitalize() +
                                       ' ' + owner.last_name.capitalize())
                 output0.append(name)
 
         if hasattr(obj, 'metadata'):
             output1 = [normalize_name(creator.name)
-                       for creator in obj.metadata.creators.all()
-                       .exclude(name__isnull=True).exclude(name='')]
+                       for creator in obj.metadata.creators.all() if creator.name]
             output2 = [normalize_name(contributor.name)
-                       for contributor in obj.metadata.contributors.all()
-                       .exclude(name__isnull=True).exclude(name='')]
+                       for contributor in obj.metadata.contributors.all() if contributor.name]
         return list(set(output0 + output1 + output2))  # eliminate duplicates
 
     def prepare_owners_count(self, obj):
         """Return count of resource owners if 'raccess' attribute exists, othrerwise return 0."""
         if hasattr(obj, 'raccess'):
-            return obj.raccess.owners.all().count()
+            return len(resource_owners(obj))
         else:
             return 0
 
@@ -664,7 +809,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """
         if hasattr(obj, 'metadata'):
             if isinstance(obj.metadata, GeographicFeatureMetaData):
-                geometry_info = obj.metadata.geometryinformation
+                geometry_info = first_element(obj.metadata.geometryinformations)
                 if geometry_info is not None:
                     return geometry_info.geometryType
                 else:
@@ -680,7 +825,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """
         if hasattr(obj, 'metadata'):
             if isinstance(obj.metadata, GeographicFeatureMetaData):
-                field_info = obj.metadata.fieldinformations.all().first()
+                field_info = first_element(obj.metadata.fieldinformations)
                 if field_info is not None and field_info.fieldName is not None:
                     return field_info.fieldName.strip()
                 else:
@@ -696,7 +841,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """
         if hasattr(obj, 'metadata'):
             if isinstance(obj.metadata, GeographicFeatureMetaData):
-                field_info = obj.metadata.fieldinformations.all().first()
+                field_info = first_element(obj.metadata.fieldinformations)
                 if field_info is not None and field_info.fieldType is not None:
                     return field_info.fieldType.strip()
                 else:
@@ -712,7 +857,7 @@ class BaseResourceIndex(indexes.SearchIndex, indexes.Indexable):
         """
         if hasattr(obj, 'metadata'):
             if isinstance(obj.metadata, GeographicFeatureMetaData):
-                field_info = obj.metadata.fieldinformations.all().first()
+                field_info = first_element(obj.metadata.fieldinformations)
                 if field_info is not None and field_info.fieldTypeCode is not None:
                     return field_info.fieldTypeCode.strip()
                 else:
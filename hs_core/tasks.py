@@ -21,7 +21,7 @@ from django.core.mail import send_mail
 from rest_framework import status
 
 from hs_core.hydroshare import utils
-from hs_core.hydroshare.hs_bagit import create_bag_files
+from hs_core.hydroshare.hs_bagit import create_bag_files, bag_fingerprint
 from hs_core.hydroshare.resource import get_activated_doi, get_resource_doi, \
     get_crossref_url, deposit_res_metadata_with_crossref
 from django_irods.storage import IrodsStorage
@@ -30,6 +30,7 @@ from theme.models import UserQuota, QuotaMessage, UserProfile, User
 from django_irods.icommands import SessionException
 
 from hs_core.models import BaseResource
+from hs_core.hydro_realtime_signal_processor import flush_index_queue
 from theme.utils import get_quota_message
 
 # Pass 'django' into getLogger instead of __name__
@@ -67,6 +68,13 @@ def nightly_zips_cleanup():
                 istorage.delete(zips_daily_date)
 
 
+@periodic_task(ignore_result=True,
+               run_every=timedelta(seconds=getattr(settings, 'HAYSTACK_QUEUE_FLUSH_INTERVAL', 30)))
+def flush_index_queue_task():
+    """ send resources queued by HydroQueuedSignalProcessor to Solr """
+    flush_index_queue()
+
+
 @periodic_task(ignore_result=True, run_every=crontab(minute=0, hour=0))
 def sync_email_subscriptions():
     sixty_days = datetime.today() - timedelta(days=60)
@@ -455,7 +463,12 @@ def create_bag_by_irods(resource_id):
             # multiple ibun commands try to create the same zip file or the very same resource
             # gets deleted by another request when being downloaded
             istorage.runBagitRule(bagit_rule_file, bagit_input_path, bagit_input_resource)
-            istorage.zipup(irods_bagit_input_path, bag_full_name)
+            fingerprint = bag_fingerprint(istorage, irods_bagit_input_path)
+            # only zip the bag again if any of its files changed since it was last zipped
+            if fingerprint != istorage.getAVU(irods_bagit_input_path, 'bag_fingerprint') or \
+                    not istorage.exists(bag_full_name):
+                istorage.zipup(irods_bagit_input_path, bag_full_name)
+                istorage.setAVU(irods_bagit_input_path, 'bag_fingerprint', fingerprint)
             istorage.setAVU(irods_bagit_input_path, 'bag_modified', "false")
             return True
         except SessionException as ex:
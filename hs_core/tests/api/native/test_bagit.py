@@ -66,3 +66,14 @@ class TestBagIt(TestCase):
         hs_bagit.delete_files_and_bag(self.test_res)
         # resource should not have any bags
         self.assertEquals(self.test_res.bags.count(), 0)
+
+    def test_bag_fingerprint(self):
+        istorage = self.test_res.get_irods_storage()
+        bag_root = self.test_res.root_path
+        create_bag_by_irods(self.test_res.short_id)
+        fingerprint = istorage.getAVU(bag_root, 'bag_fingerprint')
+        self.assertEqual(fingerprint, hs_bagit.bag_fingerprint(istorage, bag_root))
+
+        # the fingerprint only changes with the contents of the bag
+        create_bag_by_irods(self.test_res.short_id)
+        self.assertEqual(istorage.getAVU(bag_root, 'bag_fingerprint'), fingerprint)
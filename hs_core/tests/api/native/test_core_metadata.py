@@ -506,6 +506,10 @@ class TestCoreMetadata(MockIRODSTestCaseMixin, TestCase):
                       msg="Coverage type 'box' does not exist")
         self.assertIn('period', [cov.type for cov in self.res.metadata.coverages.all()],
                       msg="Coverage type 'Period' does not exist")
+        # the indexed geometry follows the coverage value
+        cov_box = self.res.metadata.coverages.get(type='box')
+        self.assertEqual(cov_box._geometry.extent, (16.6789, 16.45678, 120.6789, 56.45678))
+        self.assertIsNone(self.res.metadata.coverages.get(type='period')._geometry)
 
         # test that the name, uplimit, downlimit, zunits and projection are optional
         self.res.metadata.coverages.get(type='box').delete()
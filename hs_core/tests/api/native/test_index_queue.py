@@ -0,0 +1,45 @@
+from django.contrib.auth.models import Group
+from django.test import TestCase
+
+from hs_core import hydroshare
+from hs_core.hydro_realtime_signal_processor import index_queue_stats
+from hs_core.models import IndexQueueEntry
+
+
+class TestIndexQueue(TestCase):
+    def setUp(self):
+        super(TestIndexQueue, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'index_queue@email.com',
+            username='indexqueue',
+            first_name='some_first_name',
+            last_name='some_last_name',
+            superuser=False,
+            groups=[self.group]
+        )
+        self.res = hydroshare.create_resource('GenericResource', self.user,
+                                              'Test Index Queue Resource')
+
+    def test_enqueue_coalesces(self):
+        IndexQueueEntry.objects.all().delete()
+        self.assertEqual(index_queue_stats(), {'depth': 0, 'lag': 0})
+
+        IndexQueueEntry.enqueue(self.res)
+        entry = IndexQueueEntry.objects.get(resource_id=self.res.pk)
+        IndexQueueEntry.enqueue(self.res)
+        IndexQueueEntry.enqueue(self.res)
+
+        self.assertEqual(IndexQueueEntry.objects.count(), 1)
+        requeued = IndexQueueEntry.objects.get(resource_id=self.res.pk)
+        self.assertEqual(requeued.first_queued, entry.first_queued)
+        self.assertGreaterEqual(requeued.last_queued, entry.last_queued)
+        self.assertEqual(index_queue_stats()['depth'], 1)
+
+    def test_private_resource_is_not_queued(self):
+        IndexQueueEntry.objects.all().delete()
+        self.res.raccess.public = False
+        self.res.raccess.discoverable = False
+        self.res.raccess.save()
+        self.res.save()
+        self.assertFalse(IndexQueueEntry.objects.filter(resource_id=self.res.pk).exists())
@@ -0,0 +1,123 @@
+from django.contrib.auth.models import AnonymousUser, Group
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.db import connection
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from hs_composite_resource.page_processors import landing_page as composite_landing_page
+from hs_core import hydroshare, landing_page
+from hs_core.page_processors import get_page_context
+from hs_file_types.models import FileSetLogicalFile, GenericLogicalFile
+
+
+class _ResourcePage(object):
+    def __init__(self, resource):
+        self.resource = resource
+
+    def get_content_model(self):
+        return self.resource
+
+
+class TestLandingPage(TestCase):
+    def setUp(self):
+        super(TestLandingPage, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'landing_page@email.com',
+            username='landingpage',
+            first_name='some_first_name',
+            last_name='some_last_name',
+            superuser=False,
+            groups=[self.group]
+        )
+        self.res = hydroshare.create_resource('GenericResource', self.user,
+                                              'Test Landing Page Resource')
+        self.factory = RequestFactory()
+
+    def _get_request(self, resource, user):
+        request = self.factory.get('/resource/{}/'.format(resource.short_id))
+        request.user = user
+        SessionMiddleware().process_request(request)
+        request.session.save()
+        return request
+
+    def _get_context(self, user):
+        request = self._get_request(self.res, user)
+        # a fresh instance, as for every request
+        resource = hydroshare.get_resource_by_shortkey(self.res.short_id)
+        return get_page_context(_ResourcePage(resource), user, request=request)
+
+    def _get_composite_context(self, resource):
+        request = self._get_request(resource, self.user)
+        page = _ResourcePage(hydroshare.get_resource_by_shortkey(resource.short_id))
+        return composite_landing_page(request, page)
+
+    def _add_aggregations(self, resource, count, start=0):
+        for i in range(start, start + count):
+            fileset = FileSetLogicalFile.create(resource)
+            fileset.folder = 'folder_{}'.format(i)
+            fileset.save()
+            GenericLogicalFile.create(resource).save()
+
+    def _add_elements(self, count, start=0):
+        for i in range(start, start + count):
+            self.res.metadata.create_element('creator', name='Creator {}'.format(i))
+            self.res.metadata.create_element('subject', value='keyword {}'.format(i))
+            self.res.metadata.create_element('relation', type='isPartOf',
+                                             value='http://example.com/{}'.format(i))
+
+    @override_settings(LANDING_PAGE_CACHE_TTL=0)
+    def test_queries_do_not_grow_with_metadata(self):
+        self._add_elements(2)
+        with CaptureQueriesContext(connection) as few:
+            context = self._get_context(self.user)
+        self.assertEqual(len(context['creators']), 3)
+
+        self._add_elements(10, start=2)
+        with CaptureQueriesContext(connection) as many:
+            context = self._get_context(self.user)
+        self.assertEqual(len(context['creators']), 13)
+        self.assertEqual(len(context['relations']), 12)
+        self.assertTrue(context['show_relations_section'])
+
+        self.assertEqual(len(many.captured_queries), len(few.captured_queries))
+
+    @override_settings(LANDING_PAGE_CACHE_TTL=0)
+    def test_composite_queries_do_not_grow_with_aggregations(self):
+        composite = hydroshare.create_resource('CompositeResource', self.user,
+                                               'Test Landing Page Composite Resource')
+        self._add_aggregations(composite, 2)
+        with CaptureQueriesContext(connection) as few:
+            self._get_composite_context(composite)
+
+        self._add_aggregations(composite, 10, start=2)
+        with CaptureQueriesContext(connection) as many:
+            context = self._get_composite_context(composite)
+        resource = context['cm']
+        self.assertEqual(len(resource.logical_files), 24)
+        self.assertEqual(len(resource.aggregation_types), 2)
+
+        self.assertEqual(len(many.captured_queries), len(few.captured_queries))
+
+    @override_settings(LANDING_PAGE_CACHE_TTL=60, LANDING_PAGE_CACHE_ALIAS='default')
+    def test_anonymous_view_of_public_resource_is_cached(self):
+        self.res.raccess.public = True
+        self.res.raccess.save()
+        landing_page.reset_stats()
+
+        context = self._get_context(AnonymousUser())
+        self.assertEqual(context['title'], 'Test Landing Page Resource')
+        self.assertEqual(landing_page.get_stats(), {'hits': 0, 'misses': 1})
+        self._get_context(AnonymousUser())
+        self.assertEqual(landing_page.get_stats(), {'hits': 1, 'misses': 1})
+
+        # a modification of the resource is shown at once
+        title = self.res.metadata.title
+        self.res.metadata.update_element('title', title.id, value='Changed Title')
+        hydroshare.utils.resource_modified(self.res, self.user, overwrite_bag=False)
+        context = self._get_context(AnonymousUser())
+        self.assertEqual(context['title'], 'Changed Title')
+
+        # views by users are not cached
+        self._get_context(self.user)
+        self.assertEqual(landing_page.get_stats()['hits'], 1)
@@ -0,0 +1,52 @@
+from django.contrib.auth.models import Group
+from django.test import TestCase, override_settings
+
+from hs_core import hydroshare, metadata_xml_cache
+
+
+@override_settings(METADATA_XML_CACHE_TTL=60, METADATA_XML_CACHE_ALIAS='default')
+class TestMetadataXMLCache(TestCase):
+    def setUp(self):
+        super(TestMetadataXMLCache, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'metadata_xml@email.com',
+            username='metadataxml',
+            first_name='some_first_name',
+            last_name='some_last_name',
+            superuser=False,
+            groups=[self.group]
+        )
+        self.res = hydroshare.create_resource('GenericResource', self.user,
+                                              'Test Metadata XML Resource')
+
+    def test_unchanged_metadata_is_cached(self):
+        metadata_xml_cache.reset_stats()
+        xml = self.res.get_metadata_xml()
+        self.assertEqual(metadata_xml_cache.get_stats()['misses'], 1)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.res.get_metadata_xml(), xml)
+        self.assertEqual(metadata_xml_cache.get_stats()['hits'], 1)
+
+        # other options are rendered separately
+        self.assertNotEqual(self.res.get_metadata_xml(pretty_print=False), xml)
+        self.assertEqual(metadata_xml_cache.get_stats()['misses'], 2)
+
+    def test_element_change_invalidates(self):
+        self.assertIn('Test Metadata XML Resource', self.res.get_metadata_xml())
+
+        title = self.res.metadata.title
+        self.res.metadata.update_element('title', title.id, value='Changed Title')
+        xml = self.res.get_metadata_xml()
+        self.assertIn('Changed Title', xml)
+        self.assertNotIn('Test Metadata XML Resource', xml)
+
+        self.res.metadata.create_element('subject', value='cached keyword')
+        self.assertIn('cached keyword', self.res.get_metadata_xml())
+
+    def test_resource_change_invalidates(self):
+        self.res.get_metadata_xml()
+        self.res.extra_metadata = {'cached key': 'cached value'}
+        self.res.save()
+        self.assertIn('cached value', self.res.get_metadata_xml())
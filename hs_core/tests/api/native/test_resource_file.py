@@ -319,3 +319,41 @@ class TestResourceFileAPI(MockIRODSTestCaseMixin,
 
         # delete resources to clean up
         hydroshare.delete_resource(self.res.short_id)
+
+    def test_get_by_storage_path(self):
+        """ a file is found by its storage path with a single query """
+        hydroshare.add_resource_files(self.res.short_id, self.test_file_1)
+        resfile = self.res.files.all()[0]
+        shortpath = os.path.join(self.res.short_id, "data", "contents", "file1.txt")
+
+        with self.assertNumQueries(1):
+            found = ResourceFile.get_by_storage_path(self.res, shortpath)
+        self.assertEqual(found, resfile)
+        self.assertEqual(ResourceFile.get(self.res, "file1.txt"), resfile)
+
+        otherpath = os.path.join(self.res.short_id, "data", "contents", "file2.txt")
+        self.assertIsNone(ResourceFile.get_by_storage_path(self.res, otherpath))
+
+        # delete resources to clean up
+        hydroshare.delete_resource(self.res.short_id)
+
+    def test_bulk_link(self):
+        """ files already in iRODS are linked with one lookup and one insert """
+        hydroshare.add_resource_files(self.res.short_id, self.test_file_1)
+        resfile = self.res.files.all()[0]
+        files = [(None, 'file1.txt', 27), ('foo', 'file2.txt', 10), ('foo/bar', 'file3.txt', 5)]
+
+        with self.assertNumQueries(2):
+            linked = ResourceFile.bulk_link(self.res, files)
+        self.assertEqual(linked[0], resfile)
+        self.assertEqual(self.res.files.all().count(), 3)
+        self.assertIsNotNone(linked[2].pk)
+        self.assertEqual(linked[2].short_path, 'foo/bar/file3.txt')
+        self.assertEqual(linked[2].size, 5)
+
+        # linking again does not duplicate records
+        ResourceFile.bulk_link(self.res, files)
+        self.assertEqual(self.res.files.all().count(), 3)
+
+        # delete resources to clean up
+        hydroshare.delete_resource(self.res.short_id)
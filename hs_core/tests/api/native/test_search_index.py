@@ -0,0 +1,41 @@
+from django.contrib.auth.models import Group
+from django.test import TestCase
+
+from hs_core import hydroshare
+from hs_core.models import BaseResource
+from hs_core.search_indexes import BaseResourceIndex, prefetch_index_data
+
+
+class TestSearchIndex(TestCase):
+    def setUp(self):
+        super(TestSearchIndex, self).setUp()
+        self.group, _ = Group.objects.get_or_create(name='Hydroshare Author')
+        self.user = hydroshare.create_account(
+            'search_index@email.com',
+            username='searchindex',
+            first_name='Some',
+            last_name='User',
+            superuser=False,
+            groups=[self.group]
+        )
+        for title in ('Resource One', 'Resource Two'):
+            res = hydroshare.create_resource('GenericResource', self.user, title,
+                                             keywords=['water', 'snow'])
+            res.metadata.create_element('creator', name='Doe, Jane', order=2)
+
+    def test_prepare_from_prefetched_data(self):
+        index = BaseResourceIndex()
+        resources = list(BaseResource.objects.all().select_related('raccess'))
+        prefetch_index_data(resources)
+
+        # every field is built from the data loaded for the whole batch
+        with self.assertNumQueries(0):
+            for res in resources:
+                self.assertEqual(index.prepare_title(res), res.title)
+                self.assertEqual(index.prepare_author_raw(res), 'User, Some')
+                self.assertEqual(index.prepare_author(res), 'User, Some')
+                self.assertEqual(sorted(index.prepare_creator(res)), ['Doe, Jane', 'User, Some'])
+                self.assertEqual(sorted(index.prepare_subject(res)), ['snow', 'water'])
+                self.assertEqual(index.prepare_owner_login(res), ['searchindex'])
+                self.assertEqual(index.prepare_owners_count(res), 1)
+                self.assertFalse(index.prepare_replaced(res))
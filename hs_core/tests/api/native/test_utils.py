@@ -1,6 +1,11 @@
+import os
+import shutil
+import tempfile
+
 from django.contrib.auth.models import Group
 from django.contrib.sites.models import Site
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
 
 from mezzanine.conf import settings
 
@@ -121,4 +126,35 @@ class TestUtils(MockIRODSTestCaseMixin, TestCase):
         modified_date2 = self.res.metadata.dates.filter(type='modified').first()
         self.assertTrue((modified_date2.start_date - modified_date1.start_date).total_seconds() > 0)
         self.assertEquals(self.res.last_changed_by, self.user2)
-        self.assertEquals(self.res.last_updated, modified_date2.start_date)
\ No newline at end of file
+        self.assertEquals(self.res.last_updated, modified_date2.start_date)
+
+    def test_files_for_reading(self):
+        res_file = utils.add_file_to_resource(
+            self.res, SimpleUploadedFile('vault.txt', 'file content'))
+        self.assertEqual(res_file.size, len('file content'))
+        vault = tempfile.mkdtemp()
+        try:
+            vault_path = os.path.join(vault, res_file.storage_path)
+            os.makedirs(os.path.dirname(vault_path))
+            with open(vault_path, 'w') as vault_file:
+                vault_file.write('file content')
+
+            # the file is read in the vault
+            with override_settings(IRODS_VAULT_PATH=vault):
+                self.assertEqual(utils.get_vault_path(res_file), vault_path)
+                with utils.files_for_reading([res_file]) as (file_path,):
+                    self.assertEqual(file_path, vault_path)
+            self.assertTrue(os.path.isfile(vault_path))
+
+            # a file of a different size in the vault is not complete yet
+            with open(vault_path, 'w') as vault_file:
+                vault_file.write('file')
+            with override_settings(IRODS_VAULT_PATH=vault):
+                self.assertEqual(utils.get_vault_path(res_file), None)
+                with utils.files_for_reading([res_file]) as (file_path,):
+                    self.assertTrue(file_path.startswith(settings.TEMP_FILE_DIR))
+                    with open(file_path) as temp_file:
+                        self.assertEqual(temp_file.read(), 'file content')
+                self.assertFalse(os.path.exists(os.path.dirname(file_path)))
+        finally:
+            shutil.rmtree(vault)
@@ -1,6 +1,8 @@
 import json
 import os
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 
 from hs_core.hydroshare import resource
@@ -23,6 +25,25 @@ class TestResourceList(HSRESTTestCase):
         self.assertEqual(content['count'], 1)
         self.assertEqual(content['results'][0]['resource_id'], pid)
 
+    def test_resource_list_query_count(self):
+        # the number of queries to list a page does not depend on the number of resources
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get('/hsapi/resource/', format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(context.captured_queries)
+
+        res = resource.create_resource('GenericResource', self.user, 'My Test Resource')
+        self.resources_to_delete.append(res.short_id)
+        num_queries = count_queries()
+
+        for i in range(3):
+            res = resource.create_resource('GenericResource', self.user,
+                                           'My Test Resource {}'.format(i))
+            res.metadata.create_element('creator', name='Creator {}'.format(i))
+            self.resources_to_delete.append(res.short_id)
+        self.assertEqual(count_queries(), num_queries)
+
     def test_resource_list_by_type(self):
 
         gen_res = resource.create_resource('GenericResource',
@@ -4,6 +4,8 @@ from django.contrib.auth.models import Group, AnonymousUser
 from django.test import TestCase, RequestFactory
 from rest_framework.exceptions import PermissionDenied, NotFound
 
+from hs_core import authorization_cache
+from hs_core.middleware import AuthorizationCacheMiddleware
 from hs_core.hydroshare import resource
 from hs_core.hydroshare import users
 from hs_core.testing import MockIRODSTestCaseMixin
@@ -843,6 +845,73 @@ class TestAuthorize(MockIRODSTestCaseMixin, TestCase):
         self.assertEquals(res, self.res)
         self.assertEquals(user, anonymous_user)
 
+    def test_memoized_in_scope(self):
+        other_user = users.create_account(
+            'other_user@email.com',
+            username='otheruser',
+            first_name='other_first_name',
+            last_name='other_last_name',
+            superuser=False,
+            groups=[])
+        authorization_cache.reset_stats()
+        with authorization_cache.scope():
+            self.request.user = self.user
+            res1, authorized, _ = authorize(self.request, res_id=self.res.short_id,
+                                            needed_permission=ACTION_TO_AUTHORIZE.EDIT_RESOURCE)
+            res2, authorized, _ = authorize(self.request, res_id=self.res.short_id,
+                                            needed_permission=ACTION_TO_AUTHORIZE.EDIT_RESOURCE)
+            self.assertTrue(authorized)
+            self.assertIs(res1, res2)
+            stats = authorization_cache.get_stats()
+            self.assertEquals(stats['misses'], 1)
+            self.assertEquals(stats['local_hits'], 1)
+
+            # decisions are keyed by user
+            self.request.user = other_user
+            _, authorized, _ = authorize(self.request, res_id=self.res.short_id,
+                                         needed_permission=ACTION_TO_AUTHORIZE.VIEW_RESOURCE,
+                                         raises_exception=False)
+            self.assertFalse(authorized)
+
+            # sharing invalidates cached decisions
+            self.user.uaccess.share_resource_with_user(self.res, other_user, PrivilegeCodes.VIEW)
+            _, authorized, _ = authorize(self.request, res_id=self.res.short_id,
+                                         needed_permission=ACTION_TO_AUTHORIZE.VIEW_RESOURCE)
+            self.assertTrue(authorized)
+
+            # so does changing resource flags
+            self.request.user = AnonymousUser()
+            _, authorized, _ = authorize(self.request, res_id=self.res.short_id,
+                                         needed_permission=ACTION_TO_AUTHORIZE.VIEW_RESOURCE,
+                                         raises_exception=False)
+            self.assertFalse(authorized)
+            self.res.raccess.public = True
+            self.res.raccess.save()
+            _, authorized, _ = authorize(self.request, res_id=self.res.short_id,
+                                         needed_permission=ACTION_TO_AUTHORIZE.VIEW_RESOURCE)
+            self.assertTrue(authorized)
+
+        # outside a scope nothing is cached
+        self.assertFalse(authorization_cache.is_active())
+
+    def test_middleware_starts_fresh_scope(self):
+        def view(request):
+            self.assertTrue(authorization_cache.is_active())
+            authorize(request, res_id=self.res.short_id,
+                      needed_permission=ACTION_TO_AUTHORIZE.EDIT_RESOURCE)
+            raise ValueError
+
+        self.request.user = self.user
+        # a scope left over on this thread by an earlier request is not reused
+        authorization_cache.activate()
+        authorization_cache.reset_stats()
+        middleware = AuthorizationCacheMiddleware(view)
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                middleware(self.request)
+            self.assertFalse(authorization_cache.is_active())
+        self.assertEquals(authorization_cache.get_stats()['misses'], 2)
+
     def _run_tests(self, request, parameters):
         for params in parameters:
             if params['exception'] is None:
@@ -0,0 +1,94 @@
+import json
+
+from django.test import SimpleTestCase
+
+from hs_core.views.discovery_json_view import map_item, cluster_map_items, stream_json_array, \
+    iterate_map_items
+
+
+def _doc(short_id, **coverage):
+    return {'short_id': short_id, 'title': 'Resource ' + short_id,
+            'resource_type': 'CompositeResource', 'absolute_url': '/resource/' + short_id,
+            'author': 'Doe, John', 'coverage': [json.dumps(coverage)]}
+
+
+class _Results(object):
+    def __init__(self, docs, next_cursor):
+        self.docs = docs
+        self.nextCursorMark = next_cursor
+
+
+class _SearchQuery(object):
+    """ the parts of a haystack SearchQuerySet and Solr backend used by iterate_map_items """
+
+    def __init__(self, pages):
+        self.query = self
+        self.backend = self
+        self.conn = self
+        self.pages = pages
+        self.searches = []
+
+    def build_query(self):
+        return 'text:river'
+
+    def build_params(self):
+        return {}
+
+    def build_search_kwargs(self, query_string, **kwargs):
+        return {'fq': ['public:true'], 'start': 0, 'facet': 'on',
+                'facet.field': ['author', 'subject'], 'f.author.facet.limit': 10, 'hl': 'on'}
+
+    def search(self, query_string, **kwargs):
+        self.searches.append(dict(kwargs))
+        return self.pages[kwargs['cursorMark']]
+
+
+class TestDiscoveryMap(SimpleTestCase):
+
+    def test_map_item(self):
+        item = map_item(_doc('abc', east='10.5', north='20.5', units='Decimal degrees'))
+        self.assertEqual(item['coverage_type'], 'point')
+        self.assertEqual(item['east'], '10.5')
+        self.assertEqual(item['get_absolute_url'], '/resource/abc')
+        self.assertNotIn('first_author_url', item)
+
+        item = map_item(_doc('def', northlimit=50, eastlimit=40, southlimit=30, westlimit=20))
+        self.assertEqual(item['coverage_type'], 'box')
+        self.assertEqual(item['westlimit'], 20)
+
+        # stored fields of a resource without coverage
+        item = map_item({'short_id': 'ghi', 'coverage': None})
+        self.assertNotIn('coverage_type', item)
+
+    def test_cluster_map_items(self):
+        items = [map_item(_doc('a', east=10.1, north=10.1)),
+                 map_item(_doc('b', east=10.3, north=10.3)),
+                 map_item(_doc('c', east=-100, north=40)),
+                 map_item(_doc('d', northlimit=50, eastlimit=40, southlimit=30, westlimit=20))]
+        clustered = list(cluster_map_items(iter(items), 4))
+        self.assertEqual(len(clustered), 3)
+        self.assertEqual(clustered[0]['short_id'], 'd')
+        self.assertEqual(clustered[1]['coverage_type'], 'cluster')
+        self.assertEqual(clustered[1]['count'], 2)
+        self.assertAlmostEqual(clustered[1]['east'], 10.2)
+        self.assertEqual(clustered[2]['short_id'], 'c')
+
+        # zoomed in far enough, every point stands alone
+        self.assertEqual(len(list(cluster_map_items(iter(items), 12))), 4)
+
+    def test_iterate_map_items(self):
+        sqs = _SearchQuery({'*': _Results([_doc('a', east=1, north=2)], 'AoE1'),
+                            'AoE1': _Results([_doc('b', east=3, north=4)], 'AoE2'),
+                            'AoE2': _Results([], 'AoE2')})
+        items = list(iterate_map_items(sqs, page_size=1))
+        self.assertEqual([item['short_id'] for item in items], ['a', 'b'])
+        self.assertEqual([search['cursorMark'] for search in sqs.searches], ['*', 'AoE1', 'AoE2'])
+        # filters are kept, but nothing that only serves facets, highlighting or paging
+        for search in sqs.searches:
+            self.assertEqual(search['fq'], ['public:true'])
+            self.assertEqual(sorted(search), ['cursorMark', 'fl', 'fq', 'rows', 'sort'])
+
+    def test_stream_json_array(self):
+        self.assertEqual(json.loads(''.join(stream_json_array(iter([])))), [])
+        items = [{'short_id': 'a'}, {'short_id': 'b'}]
+        self.assertEqual(json.loads(''.join(stream_json_array(iter(items)))), items)
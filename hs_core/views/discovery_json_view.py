@@ -1,8 +1,134 @@
 import json
-from django.http import HttpResponse
+from collections import OrderedDict
+
+from django.http import HttpResponse, StreamingHttpResponse
 from haystack.generic_views import FacetedSearchView
+from haystack.query import EmptySearchQuerySet
 from hs_core.discovery_form import DiscoveryForm, FACETS_TO_SHOW
 
+# stored fields needed to place a resource on the map
+MAP_FIELDS = ('short_id', 'title', 'resource_type', 'absolute_url', 'author', 'author_url',
+              'coverage')
+# number of documents fetched from Solr per request while streaming map results
+MAP_PAGE_SIZE = 1000
+# number of cluster cells along the side of a map tile at a given zoom level
+MAP_CLUSTER_CELLS_PER_TILE = 4
+
+
+def map_item(solr):
+    """ build the map entry of a resource from its stored Solr fields
+
+    :param solr: dict of stored fields, either a haystack result's stored fields or a raw
+    Solr document
+    """
+    # assign title and url values to the object
+    json_obj = {}
+    json_obj['short_id'] = solr.get('short_id')
+    json_obj['title'] = solr.get('title')
+    json_obj['resource_type'] = solr.get('resource_type')
+
+    json_obj['get_absolute_url'] = solr.get('absolute_url')
+    json_obj['first_author'] = solr.get('author')
+    # TODO: would be better for this to be derived than stored.
+    if solr.get('author_url'):
+        json_obj['first_author_url'] = solr['author_url']
+
+    # iterate over all the coverage values
+    for coverage in solr.get('coverage') or []:
+        json_coverage = json.loads(coverage)
+        if 'east' in json_coverage:
+            json_obj['coverage_type'] = 'point'
+            json_obj['east'] = json_coverage['east']
+            json_obj['north'] = json_coverage['north']
+        elif 'northlimit' in json_coverage:
+            json_obj['coverage_type'] = 'box'
+            json_obj['northlimit'] = json_coverage['northlimit']
+            json_obj['eastlimit'] = json_coverage['eastlimit']
+            json_obj['southlimit'] = json_coverage['southlimit']
+            json_obj['westlimit'] = json_coverage['westlimit']
+        # else, skip
+    return json_obj
+
+
+def _is_unused_by_map(param):
+    """ whether a Solr parameter only affects facet counts, highlighting or stats """
+    name = param.split('.', 2)[2] if param.startswith('f.') and param.count('.') >= 2 \
+        else param
+    return name.split('.')[0] in ('facet', 'hl', 'stats', 'spellcheck')
+
+
+def iterate_map_items(sqs, page_size=MAP_PAGE_SIZE):
+    """ yield the map entries of all results of a search, paging through Solr with cursorMark
+
+    Only the stored fields needed for the map are requested, and only one page of
+    documents is held in memory at a time. The parameters of the search are built once;
+    facets, highlighting and stats are left out, as they are not shown on the map, and
+    only the cursorMark changes from one page to the next.
+    """
+    if isinstance(sqs, EmptySearchQuerySet):
+        return
+    query = sqs.query
+    backend = query.backend
+    query_string = query.build_query()
+    search_kwargs = {key: value for key, value in
+                     backend.build_search_kwargs(query_string, **query.build_params()).items()
+                     if not _is_unused_by_map(key)}
+    # a cursor requires a sort on the unique key and replaces start offsets
+    search_kwargs.pop('start', None)
+    search_kwargs.update({'fl': ','.join(MAP_FIELDS), 'rows': page_size, 'sort': 'id asc'})
+
+    cursor = '*'
+    while True:
+        search_kwargs['cursorMark'] = cursor
+        results = backend.conn.search(query_string, **search_kwargs)
+        for doc in results.docs:
+            yield map_item(doc)
+        next_cursor = getattr(results, 'nextCursorMark', None)
+        if not results.docs or next_cursor is None or next_cursor == cursor:
+            break
+        cursor = next_cursor
+
+
+def cluster_map_items(items, zoom):
+    """ merge the points that fall into the same grid cell at the given zoom level
+
+    Boxes and resources without coverage are passed through as they come; points are
+    yielded after all items have been seen, a point alone in its cell unchanged and
+    several points as one entry of coverage_type 'cluster' placed at their mean position.
+    """
+    cell_size = 360.0 / (2 ** zoom) / MAP_CLUSTER_CELLS_PER_TILE
+    cells = OrderedDict()
+    for item in items:
+        if item.get('coverage_type') != 'point':
+            yield item
+            continue
+        try:
+            east, north = float(item['east']), float(item['north'])
+        except (TypeError, ValueError):
+            yield item
+            continue
+        cell = cells.setdefault((int(east // cell_size), int(north // cell_size)), [])
+        cell.append((east, north, item))
+
+    for points in cells.values():
+        if len(points) == 1:
+            yield points[0][2]
+        else:
+            yield {'coverage_type': 'cluster',
+                   'count': len(points),
+                   'east': sum(p[0] for p in points) / len(points),
+                   'north': sum(p[1] for p in points) / len(points)}
+
+
+def stream_json_array(items):
+    """ yield a well formed JSON array of items piece by piece """
+    yield '['
+    separator = ''
+    for item in items:
+        yield separator + json.dumps(item)
+        separator = ','
+    yield ']'
+
 
 # View class for generating JSON data format from Haystack
 # returned JSON objects array is used for building the map view
@@ -24,40 +150,8 @@ class DiscoveryJsonView(FacetedSearchView):
 
             # iterate all the search results
             for result in self.get_queryset():
-                # initialize a null JSON object
-                json_obj = {}
-
                 # fetch as much information as possible from stored fields
-                solr = result.get_stored_fields()
-
-                # assign title and url values to the object
-                json_obj['short_id'] = solr['short_id']
-                json_obj['title'] = solr['title']
-                json_obj['resource_type'] = solr['resource_type']
-
-                json_obj['get_absolute_url'] = solr['absolute_url']
-                json_obj['first_author'] = solr['author']
-                # TODO: would be better for this to be derived than stored.
-                if solr['author_url']:
-                    json_obj['first_author_url'] = solr['author_url']
-
-                # iterate over all the coverage values
-                if solr['coverage'] is not None:
-                    for coverage in solr['coverage']:
-                        json_coverage = json.loads(coverage)
-                        if 'east' in json_coverage:
-                            json_obj['coverage_type'] = 'point'
-                            json_obj['east'] = json_coverage['east']
-                            json_obj['north'] = json_coverage['north']
-                        elif 'northlimit' in json_coverage:
-                            json_obj['coverage_type'] = 'box'
-                            json_obj['northlimit'] = json_coverage['northlimit']
-                            json_obj['eastlimit'] = json_coverage['eastlimit']
-                            json_obj['southlimit'] = json_coverage['southlimit']
-                            json_obj['westlimit'] = json_coverage['westlimit']
-                        # else, skip
-                        else:
-                            continue
+                json_obj = map_item(result.get_stored_fields())
 
                 # encode object to JSON string format
                 coor_obj = json.dumps(json_obj)
@@ -71,3 +165,27 @@ class DiscoveryJsonView(FacetedSearchView):
             return HttpResponse(the_data, content_type='application/json')
         else:
             return HttpResponse(json.dumps('[]'), content_type='application/json')
+
+
+class DiscoveryMapView(FacetedSearchView):
+    """ stream the map entries of a discovery search as one JSON array of objects
+
+    Results are paged from Solr with cursorMark and written out as they arrive. If a
+    'zoom' parameter is given, points are clustered on a grid for that map zoom level.
+    """
+    facet_fields = FACETS_TO_SHOW
+    form_class = DiscoveryForm
+
+    def form_valid(self, form):
+        if not len(self.request.GET):
+            return HttpResponse('[]', content_type='application/json')
+
+        items = iterate_map_items(form.search())
+        zoom = self.request.GET.get('zoom')
+        if zoom:
+            try:
+                items = cluster_map_items(items, min(max(int(zoom), 0), 30))
+            except ValueError:
+                return HttpResponse(json.dumps({'zoom': 'must be an integer'}), status=400,
+                                    content_type='application/json')
+        return StreamingHttpResponse(stream_json_array(items), content_type='application/json')
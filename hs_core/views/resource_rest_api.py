@@ -5,6 +5,7 @@ import tempfile
 import shutil
 import logging
 import json
+from collections import defaultdict
 
 from django.core.urlresolvers import reverse
 from django.core.exceptions import ObjectDoesNotExist, SuspiciousFileOperation
@@ -12,6 +13,7 @@ from django.core.exceptions import ValidationError as CoreValidationError
 from django.http import HttpResponseRedirect
 from django.shortcuts import redirect
 from django.contrib.sites.models import Site
+from django.contrib.contenttypes.models import ContentType
 
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.views import APIView
@@ -21,7 +23,8 @@ from rest_framework.request import Request
 from rest_framework.exceptions import ValidationError, NotAuthenticated, PermissionDenied, NotFound
 
 from hs_core import hydroshare
-from hs_core.models import AbstractResource
+from hs_core.models import AbstractResource, BaseResource, ResourceFile, Title, Description, \
+    Creator, Coverage, Date
 from hs_core.hydroshare.utils import get_resource_by_shortkey, get_resource_types, \
     get_content_types
 from hs_core.views import utils as view_utils
@@ -41,42 +44,97 @@ logger = logging.getLogger(__name__)
 # Mixins
 class ResourceToListItemMixin(object):
     def resourceToResourceListItem(self, r):
+        return self.resourcesToResourceListItems([r])[0]
+
+    def resourcesToResourceListItems(self, resources):
+        """Build the list items for a sequence of resources with a fixed number of queries.
+
+        Metadata elements and aggregations of all resources are fetched in bulk rather than
+        through the per resource accessors (metadata, first_creator, last_updated,
+        aggregation_types), so the cost of listing a page does not grow with its size.
+        """
+        resources = list(resources)
+        if not resources:
+            return []
+
+        # metadata elements point to the metadata object of a resource, which is
+        # identified by the content type and object id stored in the resource
+        metadata_filter = {'content_type_id__in': set(r.content_type_id for r in resources),
+                           'object_id__in': set(r.object_id for r in resources)}
+
+        def elements_by_metadata(element_class, *fields):
+            elements = defaultdict(list)
+            for e in element_class.objects.filter(**metadata_filter).values(
+                    'content_type_id', 'object_id', *fields):
+                elements[(e['content_type_id'], e['object_id'])].append(e)
+            return elements
+
+        titles = elements_by_metadata(Title, 'value')
+        descriptions = elements_by_metadata(Description, 'abstract')
+        creators = elements_by_metadata(Creator, 'name', 'order')
+        coverages = elements_by_metadata(Coverage, 'type', '_value')
+        modified_dates = defaultdict(list)
+        for e in Date.objects.filter(type='modified', **metadata_filter).values(
+                'content_type_id', 'object_id', 'start_date'):
+            modified_dates[(e['content_type_id'], e['object_id'])].append(e)
+
+        # aggregation types in the order their files were added, as aggregation_types does
+        aggregation_types = defaultdict(list)
+        logical_file_types = ResourceFile.objects \
+            .filter(object_id__in=[r.id for r in resources],
+                    logical_file_content_type__isnull=False) \
+            .order_by('id').values_list('object_id', 'logical_file_content_type_id')
+        for res_id, lf_content_type_id in logical_file_types:
+            lf_class = ContentType.objects.get_for_id(lf_content_type_id).model_class()
+            aggr_type = lf_class.get_aggregation_display_name().split(":")[0]
+            if aggr_type not in aggregation_types[res_id]:
+                aggregation_types[res_id].append(aggr_type)
+
         # URLs in metadata should be fully qualified.
         # ALWAYS qualify them with www.hydroshare.org, rather than the local server name.
         site_url = hydroshare.utils.current_site_url()
-        bag_url = site_url + r.bag_url
-        science_metadata_url = site_url + reverse('get_update_science_metadata', args=[r.short_id])
-        resource_map_url = site_url + reverse('get_resource_map', args=[r.short_id])
-        resource_url = site_url + r.get_absolute_url()
-        coverages = [{"type": v['type'], "value": json.loads(v['_value'])}
-                     for v in r.metadata.coverages.values()]
-        authors = []
-        for c in r.metadata.creators.all():
-            authors.append(c.name)
-        doi = None
-        if r.raccess.published:
-            doi = "10.4211/hs.{}".format(r.short_id)
-        resource_list_item = serializers.ResourceListItem(resource_type=r.resource_type,
-                                                          resource_id=r.short_id,
-                                                          resource_title=r.metadata.title.value,
-                                                          abstract=r.metadata.description,
-                                                          authors=authors,
-                                                          creator=r.first_creator.name,
-                                                          doi=doi,
-                                                          public=r.raccess.public,
-                                                          discoverable=r.raccess.discoverable,
-                                                          shareable=r.raccess.shareable,
-                                                          immutable=r.raccess.immutable,
-                                                          published=r.raccess.published,
-                                                          date_created=r.created,
-                                                          date_last_updated=r.last_updated,
-                                                          bag_url=bag_url,
-                                                          coverages=coverages,
-                                                          science_metadata_url=science_metadata_url,
-                                                          resource_map_url=resource_map_url,
-                                                          resource_url=resource_url,
-                                                          content_types=r.aggregation_types)
-        return resource_list_item
+        resource_list_items = []
+        for r in resources:
+            metadata_key = (r.content_type_id, r.object_id)
+            bag_url = site_url + BaseResource.get_bag_url(r.short_id)
+            science_metadata_url = site_url + reverse('get_update_science_metadata',
+                                                      args=[r.short_id])
+            resource_map_url = site_url + reverse('get_resource_map', args=[r.short_id])
+            resource_url = site_url + r.get_absolute_url()
+            res_coverages = [{"type": v['type'], "value": json.loads(v['_value'])}
+                             for v in coverages[metadata_key]]
+            res_creators = creators[metadata_key]
+            authors = [c['name'] for c in res_creators]
+            first_creator = [c['name'] for c in res_creators if c['order'] == 1]
+            title = titles[metadata_key]
+            description = descriptions[metadata_key]
+            modified = modified_dates[metadata_key]
+            doi = None
+            if r.raccess.published:
+                doi = "10.4211/hs.{}".format(r.short_id)
+            resource_list_item = serializers.ResourceListItem(
+                resource_type=r.resource_type,
+                resource_id=r.short_id,
+                resource_title=title[0]['value'] if title else None,
+                abstract=description[0]['abstract'] if description else None,
+                authors=authors,
+                creator=first_creator[0] if first_creator else None,
+                doi=doi,
+                public=r.raccess.public,
+                discoverable=r.raccess.discoverable,
+                shareable=r.raccess.shareable,
+                immutable=r.raccess.immutable,
+                published=r.raccess.published,
+                date_created=r.created,
+                date_last_updated=modified[0]['start_date'] if modified else None,
+                bag_url=bag_url,
+                coverages=res_coverages,
+                science_metadata_url=science_metadata_url,
+                resource_map_url=resource_map_url,
+                resource_url=resource_url,
+                content_types=aggregation_types[r.id])
+            resource_list_items.append(resource_list_item)
+        return resource_list_items
 
 
 class ResourceFileToListItemMixin(object):
@@ -295,13 +353,19 @@ class ResourceListCreate(ResourceToListItemMixin, generics.ListCreateAPIView):
             filter_parms['type'] = list(filter_parms['type'])
 
         filter_parms['public'] = not self.request.user.is_authenticated()
-        filtered_res_list = []
-
-        for r in hydroshare.get_resource_list(**filter_parms):
-            resource_list_item = self.resourceToResourceListItem(r)
-            filtered_res_list.append(resource_list_item)
 
-        return filtered_res_list
+        # list items are only built for the requested page, see list()
+        return hydroshare.get_resource_list(**filter_parms).select_related('raccess')
+
+    def list(self, request, *args, **kwargs):
+        # the database counts and slices the resources, then the page is serialized in bulk
+        queryset = self.get_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(self.resourcesToResourceListItems(page), many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(self.resourcesToResourceListItems(queryset), many=True)
+        return Response(serializer.data)
 
     # covers serialization of output from GET request
     def get_serializer_class(self):
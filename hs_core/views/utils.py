@@ -12,6 +12,7 @@ from urllib2 import Request, urlopen, HTTPError, URLError
 from uuid import uuid4
 
 import paramiko
+from celery import current_task
 from dateutil import parser
 from django.apps import apps
 from django.contrib.auth.models import Group, User
@@ -21,6 +22,7 @@ from django.core.exceptions import SuspiciousFileOperation
 from django.core.files.base import File
 from django.core.urlresolvers import reverse
 from django.core.validators import URLValidator
+from django.db import transaction
 from django.db.models import When, Case, Value, BooleanField, Prefetch
 from django.db.models.query import prefetch_related_objects
 from django.http import HttpResponse, QueryDict
@@ -34,7 +36,7 @@ from rest_framework.exceptions import NotFound, PermissionDenied, ValidationErro
 from django_irods.icommands import SessionException
 from django_irods.storage import IrodsStorage
 from hs_access_control.models import PrivilegeCodes
-from hs_core import hydroshare
+from hs_core import authorization_cache, hydroshare
 from hs_core.hydroshare import add_resource_files
 from hs_core.hydroshare import check_resource_type, delete_resource_file
 from hs_core.hydroshare.utils import check_aggregations
@@ -363,15 +365,33 @@ def authorize(request, res_id, needed_permission=ACTION_TO_AUTHORIZE.VIEW_RESOUR
        needed_permission=ACTION_TO_AUTHORIZE.CREATE_RESOURCE_VERSION)
 
     Note: resource 'shareable' status has no effect on authorization
+
+    Within a request or Celery task, decisions are memoized by user, resource and action
+    (see hs_core.authorization_cache).
     """
-    authorized = False
     user = get_user(request)
 
-    try:
-        res = hydroshare.utils.get_resource_by_shortkey(res_id, or_404=False)
-    except ObjectDoesNotExist:
-        raise NotFound(detail="No resource was found for resource id:%s" % res_id)
+    def resolve():
+        try:
+            return hydroshare.utils.get_resource_by_shortkey(res_id, or_404=False)
+        except ObjectDoesNotExist:
+            raise NotFound(detail="No resource was found for resource id:%s" % res_id)
+
+    def decide(res):
+        return _is_authorized(user, res, needed_permission)
+
+    res, authorized = authorization_cache.lookup(user, res_id, needed_permission,
+                                                 resolve, decide)
+
+    if raises_exception and not authorized:
+        raise PermissionDenied()
+    else:
+        return res, authorized, user
+
 
+def _is_authorized(user, res, needed_permission):
+    """ decide whether user may take the action needed_permission on resource res """
+    authorized = False
     if needed_permission == ACTION_TO_AUTHORIZE.VIEW_METADATA:
         if res.raccess.discoverable or res.raccess.public:
             authorized = True
@@ -394,11 +414,7 @@ def authorize(request, res_id, needed_permission=ACTION_TO_AUTHORIZE.VIEW_RESOUR
             authorized = user.uaccess.can_share_resource(res, 2)
     elif needed_permission == ACTION_TO_AUTHORIZE.VIEW_RESOURCE:
         authorized = res.raccess.public
-
-    if raises_exception and not authorized:
-        raise PermissionDenied()
-    else:
-        return res, authorized, user
+    return authorized
 
 
 def validate_json(js):
@@ -687,11 +703,8 @@ def show_relations_section(res_obj):
     :return: Bool
     """
 
-    all_relation_count = res_obj.metadata.relations.count()
-    has_part_count = res_obj.metadata.relations.filter(type="hasPart").count()
-    if all_relation_count > has_part_count:
-        return True
-    return False
+    # all() so that relations prefetched for the landing page are used
+    return any(rel.type != "hasPart" for rel in res_obj.metadata.relations.all())
 
 
 # TODO: no handling of pre_create or post_create signals
@@ -722,23 +735,61 @@ def link_irods_file_to_django(resource, filepath):
         return ret
 
 
+def link_irods_files_to_django(resource, files):
+    """
+    Link many newly created irods files to Django resource model in chunks
+
+    :param resource: the BaseResource object representing a HydroShare resource
+    :param files: list of dicts with the full 'path' and the 'size' of each file, as the
+        files of an IrodsTree
+    :return: List of ResourceFile of the files
+    """
+    res_files = []
+    file_format_types = set()
+    chunk_size = getattr(settings, 'HS_LINK_FILES_CHUNK_SIZE', 1000)
+    for start in range(0, len(files), chunk_size):
+        chunk = []
+        for f in files[start:start + chunk_size]:
+            folder, base = ResourceFile.resource_path_is_acceptable(resource, f['path'],
+                                                                    test_exists=False)
+            chunk.append((folder, base, f['size']))
+            file_format_types.add(get_file_mime_type(f['path']))
+        # each chunk is committed on its own rather than holding one long transaction
+        with transaction.atomic():
+            res_files.extend(ResourceFile.bulk_link(resource, chunk))
+        report_task_progress(len(res_files), len(files))
+
+    existing_types = set(mime.value for mime in resource.metadata.formats.all())
+    for file_format_type in sorted(file_format_types - existing_types):
+        resource.metadata.create_element('format', value=file_format_type)
+    return res_files
+
+
+def report_task_progress(done, total):
+    """
+    Report the progress of a long running operation as the state of the celery task that
+    runs it; does nothing when not called from a task
+    """
+    if current_task and current_task.request.id:
+        try:
+            current_task.update_state(state='PROGRESS', meta={'done': done, 'total': total})
+        except Exception as ex:
+            # e.g., no result backend is configured
+            logger.debug("task progress not reported: {}".format(ex))
+
+
 def link_irods_folder_to_django(resource, istorage, foldername, exclude=()):
-    res_files = _link_irods_folder_to_django(resource, istorage, foldername, exclude=())
-    folders = listfolders_recursively(istorage, foldername)
-    check_aggregations(resource, folders, res_files)
+    tree = istorage.walk(foldername)
+    res_files = _link_irods_folder_to_django(resource, istorage, foldername, exclude=(),
+                                             tree=tree)
+    check_aggregations(resource, tree.folders, res_files)
 
 
 def listfolders_recursively(istorage, path):
-    folders = []
-    listing = istorage.listdir(path)
-    for folder in listing[0]:
-        folder_path = os.path.join(path, folder)
-        folders.append(folder_path)
-        folders = folders + listfolders_recursively(istorage, folder_path)
-    return folders
+    return istorage.walk(path).folders
 
 
-def _link_irods_folder_to_django(resource, istorage, foldername, exclude=()):
+def _link_irods_folder_to_django(resource, istorage, foldername, exclude=(), tree=None):
     """
     Recursively Link irods folder and all files and sub-folders inside the folder to Django
     Database after iRODS file and folder operations to get Django and iRODS in sync
@@ -748,6 +799,7 @@ def _link_irods_folder_to_django(resource, istorage, foldername, exclude=()):
     :param foldername: the folder name, as a fully qualified path
     :param exclude: UNUSED: a tuple that includes file names to be excluded from
         linking under the folder;
+    :param tree: the IrodsTree of foldername if the caller already walked it
     :return: List of ResourceFile of newly linked files
     """
     if __debug__:
@@ -757,18 +809,12 @@ def _link_irods_folder_to_django(resource, istorage, foldername, exclude=()):
 
     res_files = []
     if foldername:
-        store = istorage.listdir(foldername)
-        # add files into Django resource model
-        for file in store[1]:
-            if file not in exclude:
-                file_path = os.path.join(foldername, file)
-                # This assumes that file_path is a full path
-                res_files.append(link_irods_file_to_django(resource, file_path))
-        # recursively add sub-folders into Django resource model
-        for folder in store[0]:
-            res_files = res_files + \
-                        _link_irods_folder_to_django(resource, istorage,
-                                                     os.path.join(foldername, folder), exclude)
+        if tree is None:
+            tree = istorage.walk(foldername)
+        # add files of the folder and all its sub-folders into Django resource model
+        # This assumes that file paths are full paths
+        res_files = link_irods_files_to_django(
+            resource, [f for f in tree.files if os.path.basename(f['path']) not in exclude])
     return res_files
 
 
@@ -908,7 +954,7 @@ def zip_folder(user, res_id, input_coll_path, output_zip_fname, bool_remove_orig
 
     content_dir = os.path.dirname(res_coll_input)
     output_zip_full_path = os.path.join(content_dir, output_zip_fname)
-    istorage.session.run("ibun", None, '-cDzip', '-f', output_zip_full_path, res_coll_input)
+    istorage.zipup(res_coll_input, output_zip_full_path)
 
     output_zip_size = istorage.size(output_zip_full_path)
 
@@ -965,17 +1011,21 @@ def unzip_file(user, res_id, zip_with_rel_path, bool_remove_original, overwrite=
             # unzip to a temporary folder
             unzip_path = istorage.unzip(zip_with_full_path, unzipped_folder=uuid4().hex)
             # list all files to be moved into the resource
-            unzipped_files = listfiles_recursively(istorage, unzip_path)
+            unzipped_tree = istorage.walk(unzip_path)
+            unzipped_files = unzipped_tree.file_paths
             unzipped_foldername = os.path.basename(unzip_path)
             destination_folders = []
             # list all folders to be written into the resource
-            for folder in listfolders(istorage, unzip_path):
+            for folder in unzipped_tree.listdir()[0]:
                 destination_folder = os.path.join(working_dir, folder)
                 destination_folders.append(destination_folder)
+            # files that may be overwritten
+            existing_files = set(istorage.walk(working_dir).file_paths)
             # walk through each unzipped file, delete aggregations if they exist
             for file in unzipped_files:
                 destination_file = _get_destination_filename(file, unzipped_foldername)
-                if (istorage.exists(destination_file)):
+                # deleting an aggregation may have removed the file since the walk
+                if destination_file in existing_files and istorage.exists(destination_file):
                     if resource.resource_type == "CompositeResource":
                         aggregation_object = resource.get_file_aggregation_object(
                             destination_file)
@@ -997,13 +1047,13 @@ def unzip_file(user, res_id, zip_with_rel_path, bool_remove_original, overwrite=
                 destination_file = _get_destination_filename(file, unzipped_foldername)
                 istorage.moveFile(file, destination_file)
             # and now link them to the resource
-            res_files = []
-            for file in unzipped_files:
-                destination_file = _get_destination_filename(file, unzipped_foldername)
+            destination_files = []
+            for f in unzipped_tree.files:
+                destination_file = _get_destination_filename(f['path'], unzipped_foldername)
                 destination_file = destination_file.replace(res_id + "/", "")
                 destination_file = resource.get_irods_path(destination_file)
-                res_file = link_irods_file_to_django(resource, destination_file)
-                res_files.append(res_file)
+                destination_files.append({'path': destination_file, 'size': f['size']})
+            res_files = link_irods_files_to_django(resource, destination_files)
 
             # scan for aggregations
             check_aggregations(resource, destination_folders, res_files)
@@ -1041,13 +1091,7 @@ def _get_destination_filename(file, unzipped_foldername):
 
 
 def listfiles_recursively(istorage, path):
-    files = []
-    listing = istorage.listdir(path)
-    for file in listing[1]:
-        files.append(os.path.join(path, file))
-    for folder in listing[0]:
-        files = files + listfiles_recursively(istorage, os.path.join(path, folder))
-    return files
+    return istorage.walk(path).file_paths
 
 
 def listfolders(istorage, path):
@@ -1077,7 +1121,7 @@ def create_folder(res_id, folder_path):
     # check for duplicate folder path
     if istorage.exists(coll_path):
         raise ValidationError("Folder already exists")
-    istorage.session.run("imkdir", None, '-p', coll_path)
+    istorage.saveFile('', coll_path + '/', create_directory=True)
 
 
 def remove_folder(user, res_id, folder_path):
@@ -0,0 +1,124 @@
+"""
+Time the extraction of metadata from NetCDF files.
+
+Synthetic NetCDF files with long time axes are written to a temporary directory, and their
+header text, coverage and variable metadata are extracted from one open dataset, the way
+NetCDFLogicalFile.set_file_type extracts them from uploaded files.
+
+* --steps: comma separated numbers of time steps, default 10000,1000000,10000000
+* --grid: number of latitudes and of longitudes, default 100
+* --legacy: also time reading every coordinate and bounds variable in full, as the former
+  coverage extraction did twice per file
+"""
+import os
+import shutil
+import tempfile
+import time
+
+import netCDF4
+import numpy
+from django.core.management.base import BaseCommand
+
+from hs_file_types.nc_functions import nc_dump, nc_meta, nc_utils
+
+
+def write_netcdf(nc_path, steps, grid):
+    """ write a CF NetCDF file of a gridded field and a daily series over *steps* days """
+    nc_dataset = netCDF4.Dataset(nc_path, 'w')
+    try:
+        nc_dataset.title = 'Synthetic NetCDF file'
+        nc_dataset.Conventions = 'CF-1.6'
+        nc_dataset.createDimension('time', steps)
+        nc_dataset.createDimension('lat', grid)
+        nc_dataset.createDimension('lon', grid)
+        nc_dataset.createDimension('nv', 2)
+
+        time_var = nc_dataset.createVariable('time', 'f8', ('time',))
+        time_var.units = 'days since 1900-01-01 00:00:00'
+        time_var.calendar = 'standard'
+        time_var.bounds = 'time_bnds'
+        time_bnds = nc_dataset.createVariable('time_bnds', 'f8', ('time', 'nv'))
+        chunk = 1000000
+        for start in range(0, steps, chunk):
+            days = numpy.arange(start, min(start + chunk, steps), dtype='f8')
+            time_var[start:start + days.size] = days
+            time_bnds[start:start + days.size, :] = numpy.column_stack([days - 0.5, days + 0.5])
+
+        lat_var = nc_dataset.createVariable('lat', 'f4', ('lat',))
+        lat_var.units = 'degrees_north'
+        lat_var[:] = numpy.linspace(30, 45, grid)
+        lon_var = nc_dataset.createVariable('lon', 'f4', ('lon',))
+        lon_var.units = 'degrees_east'
+        lon_var[:] = numpy.linspace(-115, -100, grid)
+
+        elevation = nc_dataset.createVariable('elevation', 'f4', ('lat', 'lon'))
+        elevation.units = 'm'
+        elevation[:] = numpy.random.random((grid, grid)) * 1000
+        discharge = nc_dataset.createVariable('discharge', 'f4', ('time',))
+        discharge.units = 'm3/s'
+        discharge.long_name = 'daily discharge'
+        for start in range(0, steps, chunk):
+            discharge[start:min(start + chunk, steps)] = \
+                numpy.random.random(min(chunk, steps - start))
+    finally:
+        nc_dataset.close()
+
+
+def extract(nc_path):
+    nc_dataset = nc_utils.get_nc_dataset(nc_path)
+    try:
+        header = nc_dump.get_nc_header_string(nc_path, nc_dataset)
+        dublin_core_meta, type_specific_meta = nc_meta.get_nc_meta_dict(nc_dataset)
+    finally:
+        nc_dataset.close()
+    return header, dublin_core_meta, type_specific_meta
+
+
+def read_coordinates(nc_path):
+    nc_dataset = nc_utils.get_nc_dataset(nc_path)
+    try:
+        for var_name in nc_utils.get_nc_variables_coordinate_type_mapping(nc_dataset):
+            nc_dataset.variables[var_name][:]
+    finally:
+        nc_dataset.close()
+
+
+class Command(BaseCommand):
+    help = "time extracting metadata from synthetic NetCDF files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--steps', type=str, dest='steps',
+                            default='10000,1000000,10000000',
+                            help='comma separated numbers of time steps')
+        parser.add_argument('--grid', type=int, dest='grid', default=100,
+                            help='number of latitudes and of longitudes')
+        parser.add_argument('--legacy', action='store_true', dest='legacy',
+                            help='also time full reads of the coordinate variables')
+
+    def handle(self, *args, **options):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for steps in [int(s) for s in options['steps'].split(',')]:
+                nc_path = os.path.join(temp_dir, 'data.nc')
+                write_netcdf(nc_path, steps, options['grid'])
+                size = os.path.getsize(nc_path) / 1024.0 ** 2
+
+                start = time.time()
+                _, dublin_core_meta, _ = extract(nc_path)
+                seconds = time.time() - start
+                print("{:>10} steps ({:.0f} MB), {:<16}: {:8.3f} s, period {} - {}"
+                      .format(steps, size, 'extraction', seconds,
+                              dublin_core_meta['period'].get('start'),
+                              dublin_core_meta['period'].get('end')))
+
+                if options['legacy']:
+                    start = time.time()
+                    # once for the original box and once for the box
+                    read_coordinates(nc_path)
+                    read_coordinates(nc_path)
+                    seconds = time.time() - start
+                    print("{:>10} steps ({:.0f} MB), {:<16}: {:8.3f} s"
+                          .format(steps, size, 'coordinate reads', seconds))
+                os.remove(nc_path)
+        finally:
+            shutil.rmtree(temp_dir)
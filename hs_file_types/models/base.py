@@ -25,6 +25,7 @@ from lxml import etree
 
 from hs_core.hydroshare.utils import current_site_url, get_resource_file_by_id, \
     set_dirty_bag_flag, add_file_to_resource, resource_modified
+from hs_core import metadata_xml_cache
 from hs_core.models import ResourceFile, AbstractMetaDataElement, Coverage, CoreMetaData
 from hs_core.hydroshare.resource import delete_resource_file
 from hs_core.signals import post_remove_file_aggregation
@@ -1334,7 +1335,9 @@ class AbstractLogicalFile(models.Model):
         map_from_file_name = os.path.join(tmpdir, 'map.xml')
         try:
             with open(meta_from_file_name, 'w') as out:
-                out.write(self.metadata.get_xml())
+                # the document also includes the language and rights of the resource
+                out.write(metadata_xml_cache.get_xml(
+                    self.metadata.get_xml, [self.metadata, self, self.resource.metadata]))
             to_file_name = self.metadata_file_path
             istorage.saveFile(meta_from_file_name, to_file_name, True)
             log.debug("Aggregation metadata xml file:{} created".format(to_file_name))
@@ -1,12 +1,15 @@
 import os
+import hashlib
 import logging
 import shutil
+import threading
 import zipfile
 import xmltodict
 from lxml import etree
 
 from osgeo import ogr, osr
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import models, transaction
 from django.utils.html import strip_tags
@@ -27,6 +30,27 @@ from base import AbstractFileMetaData, AbstractLogicalFile
 
 UNKNOWN_STR = "unknown"
 
+# hit and miss counters of the cache of metadata extracted from shapefiles
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _count(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def get_stats():
+    """Return the hit and miss counters of the shapefile metadata cache of this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
 
 class GeoFeatureFileMetaData(GeographicFeatureMetaDataMixin, AbstractFileMetaData):
     # the metadata element models are from the geographic feature resource type app
@@ -425,8 +449,10 @@ def extract_metadata_and_files(resource, res_file, file_type=True):
         if f.lower().endswith('.shp'):
             shp_file = f
             break
+    # the same shapefile content was parsed before if it was moved, copied or aggregated again
+    metadata_key = get_metadata_key(shp_res_files)
     try:
-        meta_dict = extract_metadata(shp_file_full_path=shp_file)
+        meta_dict = extract_metadata(shp_file_full_path=shp_file, metadata_key=metadata_key)
         return meta_dict, shape_files, shp_res_files
     except Exception as ex:
         # remove temp dir
@@ -528,7 +554,6 @@ def get_all_related_shp_files(resource, selected_resource_file, file_type):
 
     shape_temp_files = []
     shape_res_files = []
-    temp_dir = ''
     if selected_resource_file.extension.lower() == '.shp':
         for f in resource.files.all():
             if f.file_folder == selected_resource_file.file_folder:
@@ -537,17 +562,8 @@ def get_all_related_shp_files(resource, selected_resource_file, file_type):
                 if f.extension.lower() in GeoFeatureLogicalFile.get_allowed_storage_file_types():
                     collect_shape_resource_files(f)
 
-        for f in shape_res_files:
-            temp_file = utils.get_file_from_irods(f)
-            if not temp_dir:
-                temp_dir = os.path.dirname(temp_file)
-            else:
-                file_temp_dir = os.path.dirname(temp_file)
-                dst_dir = os.path.join(temp_dir, os.path.basename(temp_file))
-                shutil.copy(temp_file, dst_dir)
-                shutil.rmtree(file_temp_dir)
-                temp_file = dst_dir
-            shape_temp_files.append(temp_file)
+        # all files of the shapefile in one batch into one temp directory
+        shape_temp_files = utils.get_files_from_irods(shape_res_files)
 
     elif selected_resource_file.extension.lower() == '.zip':
         temp_file = utils.get_file_from_irods(selected_resource_file)
@@ -653,13 +669,68 @@ def _check_if_shape_files(files, temp_files=True):
     return True
 
 
-def extract_metadata(shp_file_full_path):
+def get_metadata_key(shp_res_files):
+    """
+    Returns a key identifying the content of a shapefile for caching its extracted metadata, or
+    None if the content can't be identified. The same content moved, copied or aggregated again
+    has the same key.
+    :param shp_res_files: the ResourceFiles of the shapefile, or the zip file containing it
+    """
+
+    # the .shp.xml file is parsed separately each time it is added
+    res_files = [f for f in shp_res_files if not f.file_name.lower().endswith('.shp.xml')]
+    if not res_files:
+        return None
+    key = hashlib.md5()
+    try:
+        for res_file in sorted(res_files, key=lambda f: f.extension.lower()):
+            istorage = res_file.resource.get_irods_storage()
+            checksum = istorage.stat(res_file.storage_path)['checksum']
+            if not checksum:
+                checksum = istorage.checksum(res_file.storage_path)
+            key.update(res_file.extension.lower())
+            key.update(checksum)
+    except Exception as ex:
+        logging.getLogger().warning("Failed to get shapefile checksums. Error:{}".format(
+            ex.message))
+        return None
+    return key.hexdigest()
+
+
+def _shared_cache():
+    ttl = getattr(settings, 'GEOFEATURE_METADATA_CACHE_TTL', 30 * 24 * 3600)
+    if not ttl:
+        return None, 0
+    from django.core.cache import caches
+    return caches[getattr(settings, 'GEOFEATURE_METADATA_CACHE_ALIAS', 'default')], ttl
+
+
+def extract_metadata(shp_file_full_path, metadata_key=None):
     """
     Collects metadata from a .shp file specified by *shp_file_full_path*
     :param shp_file_full_path:
+    :param metadata_key: (optional) a key identifying the content of the shapefile (see
+    get_metadata_key) to look up and keep the collected metadata in the cache
     :return: returns a dict of collected metadata
     """
 
+    shared, ttl = _shared_cache()
+    cache_key = None
+    if shared is not None and metadata_key:
+        cache_key = 'geofeature-meta:{}'.format(metadata_key)
+        metadata_dict = shared.get(cache_key)
+        if metadata_dict is not None:
+            _count('hits')
+            return metadata_dict
+        _count('misses')
+
+    metadata_dict = _extract_metadata(shp_file_full_path)
+    if cache_key is not None:
+        shared.set(cache_key, metadata_dict, ttl)
+    return metadata_dict
+
+
+def _extract_metadata(shp_file_full_path):
     try:
         metadata_dict = {}
 
@@ -803,11 +874,16 @@ def parse_shp(shp_file_path):
         fieldPrecision = layerDefinition.GetFieldDefn(i).GetPrecision()
         attr_dict["fieldPrecision"] = fieldPrecision
 
-    # get layer extent
-    layer_extent = layer.GetExtent()
+    # get layer extent - from the file header where the format has one, by reading all the
+    # features otherwise
+    layer_extent = layer.GetExtent(force=0, can_return_null=True)
+    if layer_extent is None:
+        layer_extent = layer.GetExtent()
 
-    # get feature count
-    featureCount = layer.GetFeatureCount()
+    # get feature count - from the index (.shx) where the format has one
+    featureCount = layer.GetFeatureCount(force=0)
+    if featureCount < 0:
+        featureCount = layer.GetFeatureCount()
     shp_metadata_dict["feature_count"] = featureCount
 
     # get a feature from layer
@@ -826,12 +902,6 @@ def parse_shp(shp_file_path):
     target = osr.SpatialReference()
     target.ImportFromEPSG(4326)
 
-    # create two key points from layer extent
-    left_upper_point = ogr.Geometry(ogr.wkbPoint)
-    left_upper_point.AddPoint(layer_extent[0], layer_extent[3])  # left-upper
-    right_lower_point = ogr.Geometry(ogr.wkbPoint)
-    right_lower_point.AddPoint(layer_extent[1], layer_extent[2])  # right-lower
-
     # source map always has extent, even projection is unknown
     shp_metadata_dict["origin_extent_dict"] = {}
     shp_metadata_dict["origin_extent_dict"]["westlimit"] = layer_extent[0]
@@ -845,13 +915,14 @@ def parse_shp(shp_file_path):
     if source is not None:
         # define CoordinateTransformation obj
         transform = osr.CoordinateTransformation(source, target)
-        # project two key points
-        left_upper_point.Transform(transform)
-        right_lower_point.Transform(transform)
-        shp_metadata_dict["wgs84_extent_dict"]["westlimit"] = left_upper_point.GetX()
-        shp_metadata_dict["wgs84_extent_dict"]["northlimit"] = left_upper_point.GetY()
-        shp_metadata_dict["wgs84_extent_dict"]["eastlimit"] = right_lower_point.GetX()
-        shp_metadata_dict["wgs84_extent_dict"]["southlimit"] = right_lower_point.GetY()
+        # project the four corners of the layer extent - the extent of a projected layer
+        # isn't a rectangle in WGS84
+        corners = [transform.TransformPoint(x, y) for x in layer_extent[:2]
+                   for y in layer_extent[2:]]
+        shp_metadata_dict["wgs84_extent_dict"]["westlimit"] = min(c[0] for c in corners)
+        shp_metadata_dict["wgs84_extent_dict"]["northlimit"] = max(c[1] for c in corners)
+        shp_metadata_dict["wgs84_extent_dict"]["eastlimit"] = max(c[0] for c in corners)
+        shp_metadata_dict["wgs84_extent_dict"]["southlimit"] = min(c[1] for c in corners)
         shp_metadata_dict["wgs84_extent_dict"]["projection"] = "WGS 84 EPSG:4326"
         shp_metadata_dict["wgs84_extent_dict"]["units"] = "Decimal degrees"
     else:
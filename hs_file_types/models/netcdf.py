@@ -403,23 +403,28 @@ class NetCDFLogicalFile(AbstractLogicalFile):
         file_type_metadata = []
         upload_folder = ''
         res_files_to_delete = []
-        # get the file from irods to temp dir
-        temp_file = utils.get_file_from_irods(res_file)
-        temp_dir = os.path.dirname(temp_file)
+        # temp dir for the header text file
+        temp_dir = utils.create_temp_dir()
+
+        # file validation and metadata extraction - in the vault or from a temp copy
+        with utils.files_for_reading([res_file]) as (nc_file,):
+            nc_dataset = nc_utils.get_nc_dataset(nc_file)
+            if isinstance(nc_dataset, netCDF4.Dataset):
+                # extract the metadata from netcdf file
+                res_dublin_core_meta, res_type_specific_meta = \
+                    nc_meta.get_nc_meta_dict(nc_dataset)
+                # populate resource_metadata and file_type_metadata lists with extracted metadata
+                add_metadata_to_list(resource_metadata, res_dublin_core_meta,
+                                     res_type_specific_meta, file_type_metadata, resource)
+
+                # create the ncdump text file
+                dump_file = create_header_info_txt_file(nc_file, nc_file_name, nc_dataset,
+                                                        temp_dir=temp_dir)
+                nc_dataset.close()
 
-        # file validation and metadata extraction
-        nc_dataset = nc_utils.get_nc_dataset(temp_file)
         if isinstance(nc_dataset, netCDF4.Dataset):
             msg = "NetCDF aggregation. Error when creating aggregation. Error:{}"
             file_type_success = False
-            # extract the metadata from netcdf file
-            res_dublin_core_meta, res_type_specific_meta = nc_meta.get_nc_meta_dict(temp_file)
-            # populate resource_metadata and file_type_metadata lists with extracted metadata
-            add_metadata_to_list(resource_metadata, res_dublin_core_meta,
-                                 res_type_specific_meta, file_type_metadata, resource)
-
-            # create the ncdump text file
-            dump_file = create_header_info_txt_file(temp_file, nc_file_name)
             file_folder = res_file.file_folder
             aggregation_folder_created = False
             create_new_folder = cls._check_create_aggregation_folder(
@@ -819,21 +824,24 @@ def add_keywords_metadata(metadata_list, extracted_metadata, file_type=True):
                 metadata_list.append({'subject': {'value': keyword}})
 
 
-def create_header_info_txt_file(nc_temp_file, nc_file_name):
+def create_header_info_txt_file(nc_temp_file, nc_file_name, nc_dataset=None, temp_dir=None):
     """
     Creates the header text file using the *nc_temp_file*
-    :param nc_temp_file: the netcdf file copied from irods to django
+    :param nc_temp_file: the netcdf file copied from irods to django (or in the vault)
     for metadata extraction
+    :param nc_dataset: (optional) the open dataset of *nc_temp_file*, which is left open
+    :param temp_dir: (optional) the directory to create the header text file in, by default
+    the directory of *nc_temp_file*
     :return:
     """
 
-    if nc_dump.get_nc_dump_string_by_ncdump(nc_temp_file):
-        dump_str = nc_dump.get_nc_dump_string_by_ncdump(nc_temp_file)
-    else:
+    dump_str = nc_dump.get_nc_header_string(nc_temp_file, nc_dataset)
+    if not dump_str:
         dump_str = nc_dump.get_nc_dump_string(nc_temp_file)
 
     # file name without the extension
-    temp_dir = os.path.dirname(nc_temp_file)
+    if temp_dir is None:
+        temp_dir = os.path.dirname(nc_temp_file)
     dump_file_name = nc_file_name + '_header_info.txt'
     dump_file = os.path.join(temp_dir, dump_file_name)
     if dump_str:
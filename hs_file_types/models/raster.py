@@ -1,8 +1,9 @@
 import os
+import hashlib
 import logging
 import shutil
-import subprocess
 import zipfile
+from multiprocessing.pool import ThreadPool
 
 import xml.etree.ElementTree as ET
 from lxml import etree
@@ -12,6 +13,7 @@ from gdalconst import GA_ReadOnly
 
 from functools import partial, wraps
 
+from django.conf import settings
 from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from django.forms.models import formset_factory
@@ -19,6 +21,7 @@ from django.template import Template, Context
 
 from dominate.tags import div, legend, form, button
 
+from django_irods.native import OperationStats
 from hs_core.hydroshare import utils
 from hs_core.forms import CoverageTemporalForm, CoverageSpatialForm
 from hs_core.models import ResourceFile, CoreMetaData
@@ -31,6 +34,9 @@ from hs_geo_raster_resource.forms import BandInfoForm, BaseBandInfoFormSet, Band
 from hs_file_types import raster_meta_extract
 from base import AbstractFileMetaData, AbstractLogicalFile
 
+# time spent in each stage of creating raster aggregations
+raster_ingest_stats = OperationStats()
+
 
 class GeoRasterFileMetaData(GeoRasterMetaDataMixin, AbstractFileMetaData):
     # the metadata element models used for this file type are from the raster resource type app
@@ -326,13 +332,15 @@ class GeoRasterLogicalFile(AbstractLogicalFile):
 
         upload_folder = ''
         # get the file from irods to temp dir
-        temp_file = utils.get_file_from_irods(res_file)
+        with raster_ingest_stats.timed('raster:fetch'):
+            temp_file = utils.get_file_from_irods(res_file)
         temp_dir = os.path.dirname(temp_file)
         res_files_to_delete = []
         raster_folder = folder_path if folder_path is not None else file_folder
         # validate the file
-        validation_results = raster_file_validation(raster_file=temp_file, resource=resource,
-                                                    raster_folder=raster_folder)
+        with raster_ingest_stats.timed('raster:validate'):
+            validation_results = raster_file_validation(raster_file=temp_file, resource=resource,
+                                                        raster_folder=raster_folder)
 
         if not validation_results['error_info']:
             msg = "Geographic raster aggregation. Error when creating aggregation. Error:{}"
@@ -341,7 +349,11 @@ class GeoRasterLogicalFile(AbstractLogicalFile):
             # extract metadata
             temp_vrt_file_path = [os.path.join(temp_dir, f) for f in os.listdir(temp_dir) if
                                   '.vrt' == os.path.splitext(f)[1]].pop()
-            metadata = extract_metadata(temp_vrt_file_path)
+            tif_res_files = [f for f in validation_results['raster_resource_files']
+                             if f.extension.lower() in ('.tif', '.tiff')]
+            with raster_ingest_stats.timed('raster:extract_metadata'):
+                statistics_key = get_statistics_key(temp_vrt_file_path, tif_res_files)
+                metadata = extract_metadata(temp_vrt_file_path, statistics_key=statistics_key)
             log.info("Geographic raster metadata extraction was successful.")
 
             with transaction.atomic():
@@ -394,9 +406,10 @@ class GeoRasterLogicalFile(AbstractLogicalFile):
                     # add all new files to resource and make those part of the logical file
                     if validation_results['new_resource_files_to_add']:
                         files_to_add_to_resource = validation_results['new_resource_files_to_add']
-                        logical_file.add_files_to_resource(
-                            resource=resource, files_to_add=files_to_add_to_resource,
-                            upload_folder=upload_folder)
+                        with raster_ingest_stats.timed('raster:add_files'):
+                            logical_file.add_files_to_resource(
+                                resource=resource, files_to_add=files_to_add_to_resource,
+                                upload_folder=upload_folder)
                     log.info("Geographic raster aggregation type - new files were added "
                              "to the resource.")
 
@@ -431,6 +444,11 @@ class GeoRasterLogicalFile(AbstractLogicalFile):
                 cls._cleanup_on_fail_to_create_aggregation(user, resource, upload_folder,
                                                            file_folder, aggregation_from_folder)
                 raise ValidationError(msg)
+
+            if getattr(settings, 'RASTER_EXACT_STATS_TASK', False):
+                # importing here to avoid circular import problem
+                from hs_file_types.tasks import update_raster_statistics_task
+                update_raster_statistics_task.apply_async((resource.short_id, logical_file.id))
         else:
             # remove temp dir
             if os.path.isdir(temp_dir):
@@ -453,6 +471,38 @@ class GeoRasterLogicalFile(AbstractLogicalFile):
         self.metadata.is_dirty = False
         self.metadata.save()
 
+    def update_exact_statistics(self):
+        """Replaces the minimum and maximum values of the bands, which are approximate for
+        large rasters, with ones computed from every pixel"""
+
+        log = logging.getLogger()
+        res_files = list(self.files.all())
+        vrt_files = [f for f in res_files if f.extension.lower() == '.vrt']
+        tif_res_files = [f for f in res_files if f.extension.lower() in ('.tif', '.tiff')]
+        if len(vrt_files) != 1 or not tif_res_files:
+            log.error("Raster aggregation {} has no vrt or tif file.".format(self.id))
+            return
+
+        # not read in the vault: GDAL may write the no data value of a band to the vrt file
+        # or next to it. The tif files are copied next to the vrt file in one batch.
+        file_paths = utils.get_files_from_irods(vrt_files + tif_res_files)
+        temp_vrt_file_path = file_paths[0]
+        try:
+            statistics_key = get_statistics_key(temp_vrt_file_path, tif_res_files)
+            band_info = raster_meta_extract.get_band_info(temp_vrt_file_path,
+                                                          exact_statistics=True,
+                                                          statistics_key=statistics_key)
+        finally:
+            shutil.rmtree(os.path.dirname(temp_vrt_file_path))
+
+        # band information elements are created in the order of the bands
+        band_elements = sorted(self.metadata.bandInformations.all(), key=lambda b: b.id)
+        for band_number, band_element in zip(sorted(band_info), band_elements):
+            self.metadata.update_element('bandinformation', band_element.id,
+                                         maximumValue=band_info[band_number]['maximumValue'],
+                                         minimumValue=band_info[band_number]['minimumValue'])
+        self.create_aggregation_xml_documents()
+
 
 def raster_file_validation(raster_file, resource, raster_folder=None):
     """ Validates if the relevant files are valid for raster aggregation or raster resource type
@@ -510,7 +560,8 @@ def raster_file_validation(raster_file, resource, raster_folder=None):
         else:
             # create the .vrt file
             try:
-                temp_vrt_file = create_vrt_file(raster_file)
+                with raster_ingest_stats.timed('raster:create_vrt'):
+                    temp_vrt_file = create_vrt_file(raster_file)
             except Exception as ex:
                 error_info.append(ex.message)
             else:
@@ -519,41 +570,20 @@ def raster_file_validation(raster_file, resource, raster_folder=None):
 
     elif ext == '.zip':
         try:
-            extract_file_paths = _explode_raster_zip_file(raster_file)
+            zip_error, extract_file_paths = _explode_raster_zip_file(raster_file)
         except Exception as ex:
             error_info.append(ex.message)
         else:
-            if extract_file_paths:
-                new_resource_files_to_add.extend(extract_file_paths)
+            if zip_error:
+                error_info.append(zip_error)
+                return validation_results
+            new_resource_files_to_add.extend(extract_file_paths)
     else:
         error_info.append("Invalid file mime type found.")
 
     if not error_info:
         if ext == ".zip":
-            # in case of zip, there needs to be more than one file extracted out of the zip file
-            if len(new_resource_files_to_add) < 2:
-                error_info.append("Invalid zip file. Seems to contain only one file. "
-                                  "Multiple tif files are expected.")
-                return validation_results
-
             files_ext = [os.path.splitext(path)[1].lower() for path in new_resource_files_to_add]
-            if files_ext.count('.vrt') > 1:
-                error_info.append("Invalid zip file. Seems to contain multiple vrt files.")
-                return validation_results
-            elif files_ext.count('.vrt') == 0:
-                error_info.append("Invalid zip file. No vrt file was found.")
-                return validation_results
-            elif files_ext.count('.tif') + files_ext.count('.tiff') < 1:
-                error_info.append("Invalid zip file. No tif/tiff file was found.")
-                return validation_results
-
-            # check if there are files that are not raster related
-            non_raster_files = [f_ext for f_ext in files_ext if f_ext
-                                not in ('.tif', '.tiff', '.vrt')]
-            if non_raster_files:
-                error_info.append("Invalid zip file. Contains files that are not raster related.")
-                return validation_results
-
             temp_vrt_file = new_resource_files_to_add[files_ext.index('.vrt')]
 
         # validate vrt file if we didn't create it
@@ -612,9 +642,37 @@ def raster_file_validation(raster_file, resource, raster_folder=None):
     return validation_results
 
 
-def extract_metadata(temp_vrt_file_path):
+def get_statistics_key(temp_vrt_file_path, tif_res_files):
+    """ Returns a key identifying the content of a raster for caching its band statistics, or
+    None if the content can't be identified
+
+    :param  temp_vrt_file_path: the vrt file of the raster in temp dir
+    :param  tif_res_files: the ResourceFiles of the tif files the vrt file refers to
+    """
+
+    if not tif_res_files:
+        return None
+    key = hashlib.md5()
+    with open(temp_vrt_file_path, 'rb') as vrt_file:
+        key.update(vrt_file.read())
+    try:
+        for tif_res_file in sorted(tif_res_files, key=lambda f: f.file_name):
+            istorage = tif_res_file.resource.get_irods_storage()
+            checksum = istorage.stat(tif_res_file.storage_path)['checksum']
+            if not checksum:
+                checksum = istorage.checksum(tif_res_file.storage_path)
+            key.update(tif_res_file.file_name.encode('utf-8'))
+            key.update(checksum)
+    except Exception as ex:
+        logging.getLogger().warning("Failed to get raster checksums. Error:{}".format(ex.message))
+        return None
+    return key.hexdigest()
+
+
+def extract_metadata(temp_vrt_file_path, statistics_key=None):
     metadata = []
-    res_md_dict = raster_meta_extract.get_raster_meta_dict(temp_vrt_file_path)
+    res_md_dict = raster_meta_extract.get_raster_meta_dict(temp_vrt_file_path,
+                                                           statistics_key=statistics_key)
     wgs_cov_info = res_md_dict['spatial_coverage_info']['wgs84_coverage_info']
     # add core metadata coverage - box
     if wgs_cov_info:
@@ -650,10 +708,18 @@ def create_vrt_file(tif_file):
     tif_file_name = os.path.basename(tif_file)
     vrt_file_path = os.path.join(temp_dir, os.path.splitext(tif_file_name)[0] + '.vrt')
 
-    with open(os.devnull, 'w') as fp:
-        subprocess.Popen(['gdal_translate', '-of', 'VRT', tif_file, vrt_file_path],
-                         stdout=fp,
-                         stderr=fp).wait()  # need to wait
+    # the equivalent of gdal_translate -of VRT, without starting a process
+    tif_dataset = gdal.Open(tif_file, GA_ReadOnly)
+    if tif_dataset is None:
+        log.error("Failed to open {} as a raster file.".format(tif_file_name))
+        raise Exception("Failed to create/write to vrt file")
+    vrt_dataset = gdal.GetDriverByName('VRT').CreateCopy(vrt_file_path, tif_dataset)
+    if vrt_dataset is None:
+        log.error("Failed to create vrt file for {}.".format(tif_file_name))
+        raise Exception("Failed to create/write to vrt file")
+    # the vrt file is written when the dataset is closed
+    vrt_dataset = None
+    tif_dataset = None
 
     # edit VRT contents
     try:
@@ -672,29 +738,102 @@ def create_vrt_file(tif_file):
     return vrt_file_path
 
 
+def _check_raster_zip_file_names(file_names):
+    """ Returns an error message if the raster files in a zip file are not a valid raster,
+    or None """
+
+    # in case of zip, there needs to be more than one file extracted out of the zip file
+    if len(file_names) < 2:
+        return "Invalid zip file. Seems to contain only one file. Multiple tif files are expected."
+
+    files_ext = [os.path.splitext(name)[1].lower() for name in file_names]
+    if files_ext.count('.vrt') > 1:
+        return "Invalid zip file. Seems to contain multiple vrt files."
+    elif files_ext.count('.vrt') == 0:
+        return "Invalid zip file. No vrt file was found."
+    elif files_ext.count('.tif') + files_ext.count('.tiff') < 1:
+        return "Invalid zip file. No tif/tiff file was found."
+
+    # check if there are files that are not raster related
+    non_raster_files = [f_ext for f_ext in files_ext if f_ext not in ('.tif', '.tiff', '.vrt')]
+    if non_raster_files:
+        return "Invalid zip file. Contains files that are not raster related."
+    return None
+
+
 def _explode_raster_zip_file(zip_file):
-    """ zip_file exists in temp directory - retrieved from irods """
+    """ zip_file exists in temp directory - retrieved from irods
+
+    The raster files in the zip file are checked by their names first, then the tiles are
+    opened by GDAL straight out of the zip file (/vsizip/). They are extracted only if they
+    make up a valid raster, since they are added to the resource as files. Each is copied
+    straight to its place in the temp directory.
+
+    :return: an error message or None, and the paths of the extracted raster files
+    """
 
     log = logging.getLogger()
     temp_dir = os.path.dirname(zip_file)
+    allowed_file_types = GeoRasterLogicalFile.get_allowed_storage_file_types()
     try:
         zf = zipfile.ZipFile(zip_file, 'r')
-        zf.extractall(temp_dir)
-        zf.close()
-
-        # get all the file abs names in temp_dir
-        extract_file_paths = []
-        for dirpath, _, filenames in os.walk(temp_dir):
-            for name in filenames:
-                file_path = os.path.abspath(os.path.join(dirpath, name))
-                file_ext = os.path.splitext(os.path.basename(file_path))[1]
-                file_ext = file_ext.lower()
-                if file_ext in GeoRasterLogicalFile.get_allowed_storage_file_types():
-                    shutil.move(file_path, os.path.join(temp_dir, name))
-                    extract_file_paths.append(os.path.join(temp_dir, os.path.basename(file_path)))
+        try:
+            members = [info for info in zf.infolist() if not info.filename.endswith('/') and
+                       os.path.splitext(info.filename)[1].lower() in allowed_file_types]
+            error = _check_raster_zip_file_names([info.filename for info in members])
+            if error:
+                return error, []
+
+            # check that every tile can be read as a raster before anything is written
+            with raster_ingest_stats.timed('raster:validate_tiles'):
+                invalid_tiles = _get_invalid_raster_files(
+                    ['/vsizip/{}/{}'.format(zip_file, info.filename) for info in members
+                     if os.path.splitext(info.filename)[1].lower() in ('.tif', '.tiff')])
+            if invalid_tiles:
+                return "Invalid zip file. Failed to open {} as raster files."\
+                    .format(', '.join(invalid_tiles)), []
+
+            extract_file_paths = []
+            with raster_ingest_stats.timed('raster:unzip'):
+                for info in members:
+                    file_path = os.path.join(temp_dir, os.path.basename(info.filename))
+                    source = zf.open(info)
+                    try:
+                        with open(file_path, 'wb') as target:
+                            shutil.copyfileobj(source, target, 1024 * 1024)
+                    finally:
+                        source.close()
+                    extract_file_paths.append(file_path)
+        finally:
+            zf.close()
 
     except Exception as ex:
         log.exception("Failed to unzip. Error:{}".format(ex.message))
         raise ex
 
-    return extract_file_paths
+    return None, extract_file_paths
+
+
+def _get_invalid_raster_files(file_paths):
+    """ Returns the names of the files that GDAL can't open, checking
+    RASTER_VALIDATION_WORKERS files at a time; paths may be GDAL virtual paths """
+
+    if not file_paths:
+        return []
+    workers = min(getattr(settings, 'RASTER_VALIDATION_WORKERS', 4), len(file_paths))
+    if workers > 1:
+        pool = ThreadPool(workers)
+        try:
+            valid = pool.map(_is_valid_raster_file, file_paths)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        valid = [_is_valid_raster_file(path) for path in file_paths]
+    return [os.path.basename(path) for path, is_valid in zip(file_paths, valid) if not is_valid]
+
+
+def _is_valid_raster_file(file_path):
+    # only the header of the file is read
+    raster_dataset = gdal.Open(file_path, GA_ReadOnly)
+    return raster_dataset is not None and raster_dataset.RasterCount > 0
@@ -1,5 +1,3 @@
-import os
-import shutil
 import json
 import logging
 from dateutil import parser
@@ -836,10 +834,6 @@ class RefTimeseriesLogicalFile(AbstractLogicalFile):
             log.exception("failed json validation")
             raise ValidationError(ex.message)
 
-        # get the file from irods to temp dir
-        temp_file = utils.get_file_from_irods(res_file)
-        temp_dir = os.path.dirname(temp_file)
-
         with transaction.atomic():
             # create a reftiemseries logical file object to be associated with
             # resource files
@@ -872,10 +866,6 @@ class RefTimeseriesLogicalFile(AbstractLogicalFile):
                 msg = msg.format(ex.message)
                 log.exception(msg)
                 raise ValidationError(msg)
-            finally:
-                # remove temp dir
-                if os.path.isdir(temp_dir):
-                    shutil.rmtree(temp_dir)
 
     def get_copy(self, copied_resource):
         """Overrides the base class method"""
@@ -6,8 +6,13 @@ from lxml import etree
 import csv
 from dateutil import parser
 import tempfile
+from uuid import uuid4
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import UploadedFile
 from django.template import Template, Context
@@ -19,11 +24,14 @@ from hs_core.hydroshare import utils
 from hs_core.models import CoreMetaData
 from hs_core.signals import post_add_timeseries_aggregation
 
-from hs_app_timeseries.models import TimeSeriesMetaDataMixin, AbstractCVLookupTable
+from hs_app_timeseries.models import TimeSeriesMetaDataMixin, AbstractCVLookupTable, \
+    TimeSeriesMetaData
 from hs_app_timeseries.forms import SiteValidationForm, VariableValidationForm, \
     MethodValidationForm, ProcessingLevelValidationForm, TimeSeriesResultValidationForm, \
     UTCOffSetValidationForm
 
+from hs_file_types import sqlite_cache
+
 from base import AbstractFileMetaData, AbstractLogicalFile
 
 
@@ -1781,62 +1789,36 @@ def sqlite_file_update(instance, sqlite_res_file, user):
     log = logging.getLogger()
 
     sqlite_file_to_update = sqlite_res_file
-    # retrieve the sqlite file from iRODS and save it to temp directory
-    temp_sqlite_file = utils.get_file_from_irods(sqlite_file_to_update)
+    # an update made now makes any deferred update unnecessary
+    cancel_sqlite_file_update(instance)
 
     if instance.has_csv_file and instance.metadata.series_names:
+        # retrieve the sqlite file from iRODS and save it to temp directory
+        temp_sqlite_file = utils.get_file_from_irods(sqlite_file_to_update)
         instance.metadata.populate_blank_sqlite_file(temp_sqlite_file, user)
     else:
         try:
-            con = sqlite3.connect(temp_sqlite_file)
-            with con:
-                # get the records in python dictionary format
-                con.row_factory = sqlite3.Row
-                cur = con.cursor()
-                # update dataset table for changes in title and abstract
-                instance.metadata.update_datasets_table(con, cur)
-                if not is_file_type:
-                    # here we are updating sqlite file time series resource
-
-                    # update people related tables (People, Affiliations, Organizations, ActionBy)
-                    # using updated creators/contributors in django db
-
-                    # insert record to People table
-                    people_data = instance.metadata.update_people_table_insert(con, cur)
-
-                    # insert record to Organizations table
-                    instance.metadata.update_organizations_table_insert(con, cur)
-
-                    # insert record to Affiliations table
-                    instance.metadata.update_affiliations_table_insert(con, cur, people_data)
-
-                    # insert record to ActionBy table
-                    instance.metadata.update_actionby_table_insert(con, cur, people_data)
-
-                # since we are allowing user to set the UTC offset in case of CSV file
-                # upload we have to update the actions table
-                if instance.metadata.utc_offset is not None:
-                    instance.metadata.update_utcoffset_related_tables(con, cur)
-
-                # update resource/file specific metadata
-                instance.metadata.update_variables_table(con, cur)
-                instance.metadata.update_methods_table(con, cur)
-                instance.metadata.update_processinglevels_table(con, cur)
-                instance.metadata.update_sites_related_tables(con, cur)
-                instance.metadata.update_results_related_tables(con, cur)
-
-                # update CV terms related tables
-                instance.metadata.update_CV_tables(con, cur)
-
-                # push the updated sqlite file to iRODS
-                utils.replace_resource_file_on_irods(temp_sqlite_file, sqlite_file_to_update,
-                                                     user)
-                metadata = instance.metadata
-                if is_file_type:
-                    instance.create_aggregation_xml_documents(create_map_xml=False)
-                metadata.is_dirty = False
-                metadata.save()
-                log.info("SQLite file update was successful.")
+            # reuse the local copy of the sqlite file if it is still the one in iRODS
+            with sqlite_cache.working_copy(sqlite_file_to_update) as working_copy:
+                con = sqlite3.connect(working_copy.path)
+                try:
+                    with con:
+                        # get the records in python dictionary format
+                        con.row_factory = sqlite3.Row
+                        cur = con.cursor()
+                        _update_sqlite_file_tables(instance, con, cur, is_file_type)
+                finally:
+                    con.close()
+
+                # push the updated sqlite file to iRODS, unless the update changed nothing
+                working_copy.push(user)
+
+            metadata = instance.metadata
+            if is_file_type:
+                instance.create_aggregation_xml_documents(create_map_xml=False)
+            metadata.is_dirty = False
+            metadata.save()
+            log.info("SQLite file update was successful.")
         except sqlite3.Error as ex:
             sqlite_err_msg = str(ex.args[0])
             log.error("Failed to update SQLite file. Error:{}".format(sqlite_err_msg))
@@ -1844,9 +1826,111 @@ def sqlite_file_update(instance, sqlite_res_file, user):
         except Exception as ex:
             log.exception("Failed to update SQLite file. Error:{}".format(ex.message))
             raise ex
-        finally:
-            if os.path.exists(temp_sqlite_file):
-                shutil.rmtree(os.path.dirname(temp_sqlite_file))
+
+
+def _update_sqlite_file_tables(instance, con, cur, is_file_type):
+    """writes the metadata of *instance* to the tables of its sqlite file"""
+
+    # update dataset table for changes in title and abstract
+    instance.metadata.update_datasets_table(con, cur)
+    if not is_file_type:
+        # here we are updating sqlite file time series resource
+
+        # update people related tables (People, Affiliations, Organizations, ActionBy)
+        # using updated creators/contributors in django db
+
+        # insert record to People table
+        people_data = instance.metadata.update_people_table_insert(con, cur)
+
+        # insert record to Organizations table
+        instance.metadata.update_organizations_table_insert(con, cur)
+
+        # insert record to Affiliations table
+        instance.metadata.update_affiliations_table_insert(con, cur, people_data)
+
+        # insert record to ActionBy table
+        instance.metadata.update_actionby_table_insert(con, cur, people_data)
+
+    # since we are allowing user to set the UTC offset in case of CSV file
+    # upload we have to update the actions table
+    if instance.metadata.utc_offset is not None:
+        instance.metadata.update_utcoffset_related_tables(con, cur)
+
+    # update resource/file specific metadata
+    instance.metadata.update_variables_table(con, cur)
+    instance.metadata.update_methods_table(con, cur)
+    instance.metadata.update_processinglevels_table(con, cur)
+    instance.metadata.update_sites_related_tables(con, cur)
+    instance.metadata.update_results_related_tables(con, cur)
+
+    # update CV terms related tables
+    instance.metadata.update_CV_tables(con, cur)
+
+
+def _sqlite_sync_key(instance):
+    if isinstance(instance, TimeSeriesLogicalFile):
+        return 'sqlite-sync:aggregation:{}'.format(instance.id)
+    return 'sqlite-sync:resource:{}'.format(instance.short_id)
+
+
+def schedule_sqlite_file_update(instance):
+    """schedules a deferred update of the sqlite file of *instance* for its metadata changes
+
+    Updates scheduled while one is pending are coalesced into the pending one, which runs
+    SQLITE_SYNC_DELAY seconds after it was scheduled. Nothing is scheduled if
+    SQLITE_SYNC_DELAY is 0.
+    :param  instance: an instance of either TimeSeriesLogicalFile or TimeSeriesResource
+    """
+    delay = getattr(settings, 'SQLITE_SYNC_DELAY', 0)
+    if delay <= 0:
+        return
+    token = uuid4().hex
+    # the key outlives the delay, so that a task that never runs does not block others forever
+    if not cache.add(_sqlite_sync_key(instance), token, delay + 300):
+        return
+    from hs_file_types.tasks import update_sqlite_file_task
+    if isinstance(instance, TimeSeriesLogicalFile):
+        args = (instance.resource.short_id, instance.id, token)
+    else:
+        args = (instance.short_id, None, token)
+    update_sqlite_file_task.apply_async(args, countdown=delay)
+
+
+def cancel_sqlite_file_update(instance):
+    """cancels a deferred update of the sqlite file of *instance*, if one is pending"""
+    if getattr(settings, 'SQLITE_SYNC_DELAY', 0) > 0:
+        cache.delete(_sqlite_sync_key(instance))
+
+
+def claim_sqlite_file_update(instance, token):
+    """returns whether the deferred update identified by *token* is still pending, and if so
+    marks it as no longer pending, so that later changes schedule a new one
+    """
+    key = _sqlite_sync_key(instance)
+    if cache.get(key) != token:
+        return False
+    cache.delete(key)
+    return True
+
+
+def _schedule_for_dirty_metadata(instance):
+    if instance is not None and instance.can_update_sqlite_file:
+        schedule_sqlite_file_update(instance)
+
+
+@receiver(post_save, sender=TimeSeriesFileMetaData)
+def timeseries_file_metadata_post_save(sender, instance, **kwargs):
+    """ schedule a deferred sqlite file update when metadata of an aggregation changes """
+    if instance.is_dirty and getattr(settings, 'SQLITE_SYNC_DELAY', 0) > 0:
+        # the aggregation does not exist yet while its metadata is first saved
+        _schedule_for_dirty_metadata(getattr(instance, 'logical_file', None))
+
+
+@receiver(post_save, sender=TimeSeriesMetaData)
+def timeseries_metadata_post_save(sender, instance, **kwargs):
+    """ schedule a deferred sqlite file update when metadata of a resource changes """
+    if instance.is_dirty and getattr(settings, 'SQLITE_SYNC_DELAY', 0) > 0:
+        _schedule_for_dirty_metadata(instance.resource)
 
 
 def add_to_xml_container_helper(target_obj, container):
@@ -2,11 +2,14 @@
 Module used to get the header info of netcdf file
 
 WORKFLOW:
-There are two ways to get the netcdf header string.
+There are three ways to get the netcdf header string.
 1) method1 run ncdump -h by python subprocess module: get_nc_dump_string_by_ncdump()
 2) method2 use the netCDF4 python lib to look into the netcdf to extract the the header info:
    get_nc_dump_string()
-3) get_netcdf_header_file() will try the first method and if it fails it will call the second method
+3) method3 use the netCDF4 python lib to write the header in the CDL format of "ncdump -h":
+   get_nc_header_string(), which can reuse a dataset that is already open
+4) get_netcdf_header_file() will try the third method and if it fails it will call the second
+   method
 
 NOTES:
 1) make sure the 'ncdump' is registered by the system path. otherwise suprocess won't recoganize
@@ -30,6 +33,7 @@ import json
 import subprocess
 
 import netCDF4
+import numpy
 from nc_utils import get_nc_dataset
 
 
@@ -48,8 +52,7 @@ def get_netcdf_header_file(nc_file_name, dump_folder=''):
     nc_dump_file = open(nc_dump_file_name, 'w')
 
     # write the nc_dump string in text fle
-    dump_string = get_nc_dump_string_by_ncdump(nc_file_name) \
-        if get_nc_dump_string_by_ncdump(nc_file_name) else get_nc_dump_string(nc_file_name)
+    dump_string = get_nc_header_string(nc_file_name) or get_nc_dump_string(nc_file_name)
     if dump_string:
         nc_dump_file.write(dump_string)
 
@@ -91,6 +94,128 @@ def get_nc_dump_string(nc_file_name):
     return nc_dump_string
 
 
+def get_nc_header_string(nc_file_name, nc_dataset=None):
+    """
+    (string, object) -> string
+
+    Return: string created by python netCDF4 lib in the format of the "ncdump -h" command for
+    netcdf file, or an empty string if the file can't be read. The dataset of the file is
+    used if it is given, and left open.
+    """
+    nc_file_basename = '.'.join(basename(nc_file_name).split('.')[:-1])
+    try:
+        if nc_dataset is None:
+            nc_dataset = get_nc_dataset(nc_file_name)
+            if nc_dataset is None:
+                return ''
+            try:
+                lines = _get_cdl_group_lines(nc_dataset, 0)
+            finally:
+                nc_dataset.close()
+        else:
+            lines = _get_cdl_group_lines(nc_dataset, 0)
+    except Exception:
+        return ''
+
+    return 'netcdf {0} {{\n{1}\n}}\n'.format(nc_file_basename, '\n'.join(lines))
+
+
+# CDL names and value suffixes of the numeric types
+CDL_TYPES = {
+    'int8': ('byte', 'b'),
+    'uint8': ('ubyte', 'UB'),
+    'int16': ('short', 's'),
+    'uint16': ('ushort', 'US'),
+    'int32': ('int', ''),
+    'uint32': ('uint', 'U'),
+    'int64': ('int64', 'L'),
+    'uint64': ('uint64', 'UL'),
+    'float32': ('float', 'f'),
+    'float64': ('double', ''),
+}
+
+
+def _get_cdl_type_name(datatype):
+    if datatype is str or datatype is unicode:
+        return 'string'
+    if not isinstance(datatype, numpy.dtype):
+        # compound, variable length and enum types
+        return datatype.name
+    if datatype.kind == 'S':
+        return 'char'
+    return CDL_TYPES.get(datatype.name, (datatype.name, ''))[0]
+
+
+def _get_cdl_attribute_value(value):
+    if isinstance(value, (str, unicode)):
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        return '"{0}"'.format(value)
+
+    values = numpy.atleast_1d(value)
+    type_name = values.dtype.name
+    if values.dtype.kind in ('S', 'U'):
+        return ', '.join(_get_cdl_attribute_value(val) for val in values)
+    suffix = CDL_TYPES.get(type_name, ('', ''))[1]
+    if type_name == 'float32':
+        formatted = ['{0:.7g}'.format(val) for val in values]
+    elif type_name == 'float64':
+        formatted = ['{0:.15g}'.format(val) for val in values]
+    else:
+        formatted = [str(val) for val in values]
+    return ', '.join(val + suffix for val in formatted)
+
+
+def _get_cdl_attribute_lines(nc_obj, prefix, indent):
+    lines = []
+    for name in nc_obj.ncattrs():
+        try:
+            value = _get_cdl_attribute_value(nc_obj.getncattr(name))
+        except Exception:
+            continue
+        lines.append('{0}{1}:{2} = {3} ;'.format(indent, prefix, name, value))
+    return lines
+
+
+def _get_cdl_group_lines(nc_group, level):
+    """ lines of the CDL header of a netcdf group, indented for its level of nesting """
+    indent = '  ' * level
+    lines = []
+    if nc_group.dimensions:
+        lines.append(indent + 'dimensions:')
+        for dim_name, dim_obj in nc_group.dimensions.items():
+            if dim_obj.isunlimited():
+                lines.append('{0}\t{1} = UNLIMITED ; // ({2} currently)'.format(
+                    indent, dim_name, len(dim_obj)))
+            else:
+                lines.append('{0}\t{1} = {2} ;'.format(indent, dim_name, len(dim_obj)))
+
+    if nc_group.variables:
+        lines.append(indent + 'variables:')
+        for var_name, var_obj in nc_group.variables.items():
+            dimensions = '({0})'.format(', '.join(var_obj.dimensions)) \
+                if var_obj.dimensions else ''
+            lines.append('{0}\t{1} {2}{3} ;'.format(
+                indent, _get_cdl_type_name(var_obj.datatype), var_name, dimensions))
+            lines.extend(_get_cdl_attribute_lines(var_obj, var_name, indent + '\t\t'))
+
+    attribute_lines = _get_cdl_attribute_lines(nc_group, '', indent + '\t\t')
+    if attribute_lines:
+        lines.append('')
+        lines.append(indent + ('// global attributes:' if level == 0 else
+                               '// group attributes:'))
+        lines.extend(attribute_lines)
+
+    for group_name, group_obj in nc_group.groups.items():
+        lines.append('')
+        lines.append('{0}group: {1} {{'.format(indent, group_name))
+        lines.extend(_get_cdl_group_lines(group_obj, level + 1))
+        lines.append('{0}  }} // group {1}'.format(indent, group_name))
+
+    return lines
+
+
 def get_nc_dump_dict(nc_group):
     """
     (obj) -> dict
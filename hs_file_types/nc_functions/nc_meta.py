@@ -41,9 +41,11 @@ def get_nc_meta_json(nc_file_name):
 
 def get_nc_meta_dict(nc_file_name):
     """
-    (string)-> dict
+    (string or object)-> dict
 
     Return: the netCDF Dublincore and Type specific Metadata
+
+    A dataset passed in is left open for the caller to reuse.
     """
 
     if isinstance(nc_file_name, netCDF4.Dataset):
@@ -54,7 +56,8 @@ def get_nc_meta_dict(nc_file_name):
     dublin_core_meta = get_dublin_core_meta(nc_dataset)
     type_specific_meta = get_type_specific_meta(nc_dataset)
     nc_meta_dict = {'dublin_core_meta': dublin_core_meta, 'type_specific_meta': type_specific_meta}
-    nc_dataset.close()
+    if nc_dataset is not nc_file_name:
+        nc_dataset.close()
     try:
         res_dublin_core_meta = nc_meta_dict['dublin_core_meta']
         res_type_specific_meta = nc_meta_dict['type_specific_meta']
@@ -134,12 +137,13 @@ def extract_nc_coverage_meta(nc_dataset):
     period_info = get_period_info(nc_dataset)
 
     original_box_info = get_original_box_info(nc_dataset)
+    # the limits are read from the data once for both boxes
+    box_info = get_box_info(nc_dataset, dict(original_box_info))
     for name in original_box_info.keys():
         original_box_info[name] = str(original_box_info[name])
         if name == 'units' and original_box_info[name].lower() == 'm':
             original_box_info[name] = 'Meter'
 
-    box_info = get_box_info(nc_dataset)
     for name in box_info.keys():
         box_info[name] = str(box_info[name])
 
@@ -219,14 +223,15 @@ def get_period_info_by_data(nc_dataset):
     return period_info
 
 
-def get_box_info(nc_dataset):
+def get_box_info(nc_dataset, original_box_info=None):
     """
-    (object)-> dict
+    (object, dict)-> dict
 
     Return: the netCDF coverage box info as wgs84 crs
     """
     box_info = {}
-    original_box_info = get_original_box_info(nc_dataset)
+    if original_box_info is None:
+        original_box_info = get_original_box_info(nc_dataset)
 
     if original_box_info:
         if original_box_info.get('units', '').lower() == 'degree':  # geographic coor x, y
@@ -410,7 +415,8 @@ def get_limit_meta_by_coor_type(nc_dataset, coor_type, coor_type_mapping):
         if coor_type_name in coor_type_list:
             index = coor_type_list.index(coor_type_name)
             var_name = var_name_list[index]
-            var_coor_meta = get_nc_variable_coordinate_meta(nc_dataset, var_name)
+            var_coor_meta = get_nc_variable_coordinate_meta(nc_dataset, var_name,
+                                                            coor_type_mapping)
 
             if var_coor_meta.get('coordinate_start') is not None:
                 coor_start.append(var_coor_meta.get('coordinate_start'))
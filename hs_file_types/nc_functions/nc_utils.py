@@ -16,6 +16,11 @@ import osr
 import netCDF4
 import numpy
 
+# number of values of a coordinate variable that are read to confirm that it is monotonic
+MONOTONIC_CHECK_SIZE = 1000
+# number of values read at a time when reducing a variable to its minimum and maximum
+REDUCE_CHUNK_SIZE = 1000000
+
 
 # Functions for General Purpose
 def get_nc_dataset(nc_file_name):
@@ -142,26 +147,25 @@ def get_nc_variable_coordinate_type(nc_variable):
     return 'Unknown'
 
 
-def get_nc_variable_coordinate_meta(nc_dataset, nc_variable_name):
+def get_nc_variable_coordinate_meta(nc_dataset, nc_variable_name,
+                                    nc_variables_coordinate_type_mapping=None):
     """
-    (object)-> dict
+    (object, string, dict)-> dict
 
     Return: coordinate meta data if the variable is related to a coordinate type:
             coordinate or auxiliary coordinate variable or bounds variable
     """
-    nc_variables_coordinate_type_mapping = get_nc_variables_coordinate_type_mapping(nc_dataset)
+    if nc_variables_coordinate_type_mapping is None:
+        nc_variables_coordinate_type_mapping = \
+            get_nc_variables_coordinate_type_mapping(nc_dataset)
     nc_variable_coordinate_meta = {}
     if nc_variable_name in nc_variables_coordinate_type_mapping.keys():
         nc_variable = nc_dataset.variables[nc_variable_name]
-        nc_variable_data = nc_variable[:]
         nc_variable_coordinate_type = nc_variables_coordinate_type_mapping[nc_variable_name]
-        coordinate_max = None
-        coordinate_min = None
-        if nc_variable_data.size:
-            coordinate_min = nc_variable_data[numpy.unravel_index(nc_variable_data.argmin(),
-                                                                  nc_variable_data.shape)]
-            coordinate_max = nc_variable_data[numpy.unravel_index(nc_variable_data.argmax(),
-                                                                  nc_variable_data.shape)]
+        # coordinate variables and their bounds are monotonic by the CF conventions
+        coordinate_min, coordinate_max = get_nc_variable_limits(
+            nc_variable, monotonic=nc_variable_coordinate_type.replace('_bnd', '').endswith('C'))
+        if coordinate_min is not None:
             coordinate_units = nc_variable.units if hasattr(nc_variable, 'units') else ''
 
             if nc_variable_coordinate_type in ['TC', 'TA', 'TC_bnd', 'TA_bnd']:
@@ -192,6 +196,71 @@ def get_nc_variable_coordinate_meta(nc_dataset, nc_variable_name):
     return nc_variable_coordinate_meta
 
 
+def get_nc_variable_limits(nc_variable, monotonic=False):
+    """
+    (object, bool)-> (value, value)
+
+    Return: the minimum and maximum of the values of a variable, or (None, None) if it has no
+            valid value. Only the first and last values of a monotonic one dimensional
+            variable, or of a monotonic bounds variable, are used, once a sample of its values
+            confirms that it is monotonic. Other variables are read a chunk at a time.
+    """
+    if not nc_variable.size:
+        return None, None
+
+    if monotonic and len(nc_variable.shape) in (1, 2):
+        limits = _get_monotonic_limits(nc_variable)
+        if limits is not None:
+            return limits
+
+    coordinate_min = None
+    coordinate_max = None
+    for chunk in _get_chunks(nc_variable):
+        chunk = numpy.ma.asarray(chunk)
+        if not chunk.count():
+            continue
+        chunk_min = chunk.min()
+        chunk_max = chunk.max()
+        if coordinate_min is None or chunk_min < coordinate_min:
+            coordinate_min = chunk_min
+        if coordinate_max is None or chunk_max > coordinate_max:
+            coordinate_max = chunk_max
+
+    return coordinate_min, coordinate_max
+
+
+def _get_monotonic_limits(nc_variable):
+    """ limits from the first and last values, or None if the variable is not monotonic """
+    size = nc_variable.shape[0]
+    step = max(1, size // MONOTONIC_CHECK_SIZE)
+    sample = numpy.ma.asarray(nc_variable[::step])
+    last = numpy.ma.asarray(nc_variable[size - 1:])
+    sample = numpy.ma.concatenate([sample, last]).reshape(sample.shape[0] + 1, -1)
+    if numpy.ma.count_masked(sample):
+        return None
+
+    data = sample.data
+    for column in range(data.shape[1]):
+        diff = numpy.diff(data[:, column])
+        if not ((diff >= 0).all() or (diff <= 0).all()):
+            return None
+
+    # the first and last values are the limits of each column
+    ends = numpy.concatenate([data[0], data[-1]])
+    return ends[ends.argmin()], ends[ends.argmax()]
+
+
+def _get_chunks(nc_variable):
+    """ the values of a variable, a number of rows at a time """
+    if not nc_variable.shape:
+        yield nc_variable[...]
+        return
+    row_size = max(1, nc_variable.size // nc_variable.shape[0])
+    rows = max(1, REDUCE_CHUNK_SIZE // row_size)
+    for start in range(0, nc_variable.shape[0], rows):
+        yield nc_variable[start:start + rows]
+
+
 # Functions for Coordinate Variable
 # coordinate variable has the following attributes:
 # 1) it has 1 dimension
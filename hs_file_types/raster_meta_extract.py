@@ -10,6 +10,14 @@ using-python-gdal-bindings
 
 Update Notes
 This is used to process the vrt raster and to extract max, min value of each raster band.
+
+The raster is opened once for all metadata. Band statistics are approximate by default: a
+band with more than RASTER_STATS_MAX_PIXELS pixels is summarized from an overview or from
+a sample of its blocks instead of every pixel. The bands are summarized in parallel by
+RASTER_STATS_WORKERS threads, each with its own dataset handle (GDAL and numpy release the
+GIL while reading and reducing). Given a key identifying the content of the raster, the
+statistics are kept in the Django cache named by RASTER_STATS_CACHE_ALIAS for
+RASTER_STATS_CACHE_TTL seconds, so the same raster content is summarized only once.
 """
 
 
@@ -17,23 +25,88 @@ import gdal
 from gdalconst import GA_ReadOnly
 from osgeo import osr
 from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+import math
+import os
 import re
 import logging
+import threading
+import xml.etree.ElementTree as ET
 import pycrs
 import numpy
 
+from django.conf import settings
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _count(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def get_stats():
+    """Return the hit and miss counters of the band statistics cache of this process."""
+    with _stats_lock:
+        return dict(_stats)
+
 
-def get_raster_meta_dict(raster_file_name):
+def reset_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def open_raster(raster_file_name):
+    """
+    (string) --> object
+
+    Return: the raster dataset opened read only, or None if it can't be opened
+
+    Relative sources of a vrt file that are not marked as relative to the vrt file are looked
+    up next to it rather than in the working directory of the process.
+    """
+    if os.path.splitext(raster_file_name)[1].lower() == '.vrt':
+        try:
+            root = ET.parse(raster_file_name).getroot()
+        except (ET.ParseError, IOError):
+            root = None
+        if root is not None:
+            vrt_dir = os.path.dirname(os.path.abspath(raster_file_name))
+            changed = False
+            for element in root.iter('SourceFilename'):
+                if element.attrib.get('relativeToVRT') != '1' and element.text and \
+                        not os.path.isabs(element.text):
+                    element.text = os.path.join(vrt_dir, element.text)
+                    changed = True
+            if changed:
+                # the vrt driver opens the xml content of a vrt file as well
+                return gdal.Open(ET.tostring(root), GA_ReadOnly)
+    return gdal.Open(raster_file_name, GA_ReadOnly)
+
+
+def _as_dataset(raster):
+    if isinstance(raster, basestring):
+        return open_raster(raster)
+    return raster
+
+
+def get_raster_meta_dict(raster_file_name, exact_statistics=False, statistics_key=None):
     """
-    (string)-> dict
+    (string, bool, string)-> dict
 
     Return: the raster science metadata extracted from the raster file
+
+    See get_band_info() for exact_statistics and statistics_key.
     """
 
     # get the metadata info from raster files
-    spatial_coverage_info = get_spatial_coverage_info(raster_file_name)
-    cell_info = get_cell_info(raster_file_name)
-    band_info = get_band_info(raster_file_name)
+    raster_dataset = open_raster(raster_file_name)
+    spatial_coverage_info = get_spatial_coverage_info(raster_dataset)
+    cell_info = get_cell_info(raster_dataset)
+    band_info = get_band_info(raster_dataset, exact_statistics=exact_statistics,
+                              statistics_key=statistics_key)
 
     # write meta as dictionary
     raster_meta_dict = {
@@ -45,14 +118,14 @@ def get_raster_meta_dict(raster_file_name):
     return raster_meta_dict
 
 
-def get_spatial_coverage_info(raster_file_name):
+def get_spatial_coverage_info(raster):
     """
-    (string) --> dict
+    (string or object) --> dict
 
     Return: meta of spatial extent and projection of raster includes both original info
     and wgs84 info
     """
-    raster_dataset = gdal.Open(raster_file_name, GA_ReadOnly)
+    raster_dataset = _as_dataset(raster)
     original_coverage_info = get_original_coverage_info(raster_dataset)
     wgs84_coverage_info = get_wgs84_coverage_info(raster_dataset)
     spatial_coverage_info = {
@@ -235,14 +308,14 @@ def get_wgs84_coverage_info(raster_dataset):
     return wgs84_coverage_info
 
 
-def get_cell_info(raster_file_name):
+def get_cell_info(raster):
     """
-    (object) --> dict
+    (string or object) --> dict
 
     Return: meta info of cells in raster
     """
 
-    raster_dataset = gdal.Open(raster_file_name, GA_ReadOnly)
+    raster_dataset = _as_dataset(raster)
 
     # get cell size info
     if raster_dataset:
@@ -274,33 +347,30 @@ def get_cell_info(raster_file_name):
     return cell_info
 
 
-def get_band_info(raster_file_name):
+def get_band_info(raster, exact_statistics=False, statistics_key=None):
+    """
+    (string or object, bool, string) --> dict
 
-    raster_dataset = gdal.Open(raster_file_name, GA_ReadOnly)
+    Return: meta info of the bands in raster
 
-    import os
-    ori_dir = os.getcwd()
-    os.chdir(os.path.dirname(raster_file_name))
+    Minimum and maximum values are computed from every pixel only if exact_statistics is
+    True or the band is small. If statistics_key identifies the content of the raster (e.g.,
+    by the checksums of its files), statistics computed before for the same key are reused.
+    """
+
+    raster_dataset = _as_dataset(raster)
 
     # get raster band count
     if raster_dataset:
         band_info = {}
         band_count = raster_dataset.RasterCount
+        statistics = _get_band_statistics(raster_dataset, exact_statistics, statistics_key)
 
         for i in range(0, band_count):
             band = raster_dataset.GetRasterBand(i+1)
-            minimum, maximum, _, _ = band.ComputeStatistics(False)
-            no_data = band.GetNoDataValue()
-            new_no_data = None
-
-            if no_data and numpy.allclose(minimum, no_data):
-                new_no_data = minimum
-            elif no_data and numpy.allclose(maximum, no_data):
-                new_no_data = maximum
-
+            minimum, maximum, new_no_data = statistics[i+1]
             if new_no_data is not None:
                 band.SetNoDataValue(new_no_data)
-                minimum, maximum, _, _ = band.ComputeStatistics(False)
 
             band_info[i+1] = {
                 'name': 'Band_'+str(i+1),
@@ -321,5 +391,140 @@ def get_band_info(raster_file_name):
         }
 
     raster_dataset = None
-    os.chdir(ori_dir)
     return band_info
+
+
+def _shared_cache():
+    ttl = getattr(settings, 'RASTER_STATS_CACHE_TTL', 30 * 24 * 3600)
+    if not ttl:
+        return None, 0
+    from django.core.cache import caches
+    return caches[getattr(settings, 'RASTER_STATS_CACHE_ALIAS', 'default')], ttl
+
+
+def _get_band_statistics(raster_dataset, exact_statistics, statistics_key):
+    """ {band number: (minimum, maximum, adjusted no data value or None)} of all bands """
+    shared, ttl = _shared_cache()
+    cache_key = None
+    if shared is not None and statistics_key:
+        cache_key = 'raster-stats:{}'.format(statistics_key)
+        cached = shared.get(cache_key)
+        # exact statistics serve requests for approximate ones as well
+        if cached is not None and (cached['exact'] or not exact_statistics):
+            _count('hits')
+            return cached['bands']
+        _count('misses')
+
+    # datasets can't be shared between threads; each band is read through its own handle
+    dataset_name = raster_dataset.GetDescription()
+    band_numbers = range(1, raster_dataset.RasterCount + 1)
+    workers = min(getattr(settings, 'RASTER_STATS_WORKERS', 4), len(band_numbers))
+    args = [(dataset_name, band_number, exact_statistics) for band_number in band_numbers]
+    if workers > 1:
+        pool = ThreadPool(workers)
+        try:
+            results = pool.map(_compute_band_statistics, args)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [_compute_band_statistics(arg) for arg in args]
+
+    statistics = dict(zip(band_numbers, results))
+    if cache_key is not None:
+        shared.set(cache_key, {'exact': exact_statistics, 'bands': statistics}, ttl)
+    return statistics
+
+
+def _compute_band_statistics(args):
+    dataset_name, band_number, exact_statistics = args
+    raster_dataset = gdal.Open(dataset_name, GA_ReadOnly)
+    band = raster_dataset.GetRasterBand(band_number)
+    max_pixels = getattr(settings, 'RASTER_STATS_MAX_PIXELS', 4000000)
+    if exact_statistics:
+        max_pixels = None
+
+    no_data = band.GetNoDataValue()
+    minimum, maximum = _band_min_max(band, no_data, max_pixels)
+    new_no_data = None
+    # a no data value that is not exactly the value of the no data pixels shows up as the
+    # minimum or maximum; it is replaced with that value and the statistics are recomputed
+    if no_data and minimum is not None:
+        if numpy.allclose(minimum, no_data):
+            new_no_data = minimum
+        elif numpy.allclose(maximum, no_data):
+            new_no_data = maximum
+    if new_no_data is not None:
+        minimum, maximum = _band_min_max(band, new_no_data, max_pixels)
+    return minimum, maximum, new_no_data
+
+
+def _band_min_max(band, no_data, max_pixels):
+    """
+    Minimum and maximum of the valid pixels of a band
+
+    :param band: the raster band
+    :param no_data: the value of pixels to leave out, or None
+    :param max_pixels: the number of pixels to read at most, or None to read every pixel
+    :return: (minimum, maximum), (None, None) if no pixel is valid
+    """
+    minimum = None
+    maximum = None
+    for data in _band_windows(band, max_pixels):
+        values = data.ravel()
+        if no_data is not None:
+            if values.dtype.kind == 'f':
+                # gdal compares pixels with the no data value in the type of the band
+                values = values[values != values.dtype.type(no_data)]
+            else:
+                values = values[values != no_data]
+        if values.dtype.kind == 'f':
+            values = values[~numpy.isnan(values)]
+        if values.size == 0:
+            continue
+        window_min = float(values.min())
+        window_max = float(values.max())
+        minimum = window_min if minimum is None else min(minimum, window_min)
+        maximum = window_max if maximum is None else max(maximum, window_max)
+    return minimum, maximum
+
+
+def _band_windows(band, max_pixels):
+    """ arrays of the pixels of a band to compute statistics from """
+    columns = band.XSize
+    rows = band.YSize
+    if max_pixels is not None and columns * rows > max_pixels:
+        # the most detailed overview that is small enough
+        overviews = [band.GetOverview(i) for i in range(band.GetOverviewCount())]
+        overviews = [ovr for ovr in overviews if ovr is not None and
+                     ovr.XSize * ovr.YSize <= max_pixels]
+        if overviews:
+            overview = max(overviews, key=lambda ovr: ovr.XSize * ovr.YSize)
+            yield _read_window(overview, 0, 0, overview.XSize, overview.YSize)
+            return
+
+        # every n-th block
+        block_columns, block_rows = band.GetBlockSize()
+        blocks_per_row = int(math.ceil(float(columns) / block_columns))
+        block_count = blocks_per_row * int(math.ceil(float(rows) / block_rows))
+        step = int(math.ceil(float(block_count) * block_columns * block_rows / max_pixels))
+        for block in range(0, block_count, step):
+            x_offset = (block % blocks_per_row) * block_columns
+            y_offset = (block // blocks_per_row) * block_rows
+            yield _read_window(band, x_offset, y_offset,
+                               min(block_columns, columns - x_offset),
+                               min(block_rows, rows - y_offset))
+        return
+
+    # every pixel, in strips of whole blocks
+    block_rows = band.GetBlockSize()[1]
+    strip_rows = max(block_rows, (4000000 // max(columns, 1)) // block_rows * block_rows)
+    for y_offset in range(0, rows, strip_rows):
+        yield _read_window(band, 0, y_offset, columns, min(strip_rows, rows - y_offset))
+
+
+def _read_window(band, x_offset, y_offset, columns, rows):
+    data = band.ReadAsArray(x_offset, y_offset, columns, rows)
+    if data is None:
+        raise IOError(gdal.GetLastErrorMsg() or "Failed to read raster band data")
+    return data
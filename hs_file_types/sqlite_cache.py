@@ -0,0 +1,233 @@
+"""Local working copies of ODM2 SQLite files stored in iRODS.
+
+Writing metadata changes to an ODM2 SQLite file used to copy the whole file out of iRODS
+and back in on every update. Working copies are instead kept in SQLITE_CACHE_DIR, one per
+iRODS path, and reused as long as the file in iRODS still has the checksum, size and
+modification time recorded when the copy was fetched or last pushed back. A copy is pushed
+back to iRODS only if its content changed.
+
+A copy is locked while it is in use, so that updates of the same file on one host do not
+interleave. A copy that fails to update or is changed without being pushed is discarded.
+The least recently used copies are removed when the cache grows beyond
+SQLITE_CACHE_MAX_BYTES; a size of 0 disables reuse.
+"""
+
+import errno
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from hs_core.hydroshare import utils
+
+logger = logging.getLogger(__name__)
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'pushes': 0, 'unchanged': 0, 'discards': 0,
+          'evictions': 0}
+
+DATA_FILE = 'data.sqlite'
+STATE_FILE = 'state.json'
+LOCK_FILE = 'lock'
+
+
+def _count(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def get_stats():
+    """Return the counters of working copies reused, fetched and pushed by this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def cache_dir():
+    return getattr(settings, 'SQLITE_CACHE_DIR',
+                   os.path.join(settings.TEMP_FILE_DIR, 'sqlite_cache'))
+
+
+def _max_bytes():
+    return getattr(settings, 'SQLITE_CACHE_MAX_BYTES', 2 * 1024 ** 3)
+
+
+def _md5(path):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as fl_obj:
+        for block in iter(lambda: fl_obj.read(1024 * 1024), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def _catalog_state(istorage, storage_path):
+    """ checksum, size and modification time of a file in iRODS, computing a missing checksum """
+    # another process may have replaced the file since it was last looked up
+    istorage.invalidate(storage_path)
+    state = istorage.stat(storage_path)
+    if not state['checksum']:
+        istorage.checksum(storage_path)
+        state = istorage.stat(storage_path)
+    return state
+
+
+def _read_state(entry):
+    try:
+        with open(os.path.join(entry, STATE_FILE), 'r') as fl_obj:
+            return json.load(fl_obj)
+    except (IOError, ValueError):
+        return None
+
+
+def _write_state(entry, storage_path, state, md5):
+    with open(os.path.join(entry, STATE_FILE), 'w') as fl_obj:
+        json.dump({'path': storage_path, 'state': state, 'md5': md5}, fl_obj)
+
+
+def _remove(entry):
+    """ remove the copy of an entry; the entry must be locked by the caller """
+    for name in (STATE_FILE, DATA_FILE):
+        try:
+            os.remove(os.path.join(entry, name))
+        except OSError as ex:
+            if ex.errno != errno.ENOENT:
+                raise
+
+
+class WorkingCopy(object):
+    """ a local copy of an ODM2 SQLite file of a resource, see working_copy() """
+
+    def __init__(self, res_file, entry, md5):
+        self.res_file = res_file
+        self.path = os.path.join(entry, DATA_FILE)
+        self.entry = entry
+        self.md5 = md5
+        self.pushed_md5 = md5
+
+    def push(self, user):
+        """
+        Replace the file in iRODS with the working copy if its content changed
+
+        :param user: user who is updating the file
+        :return: whether the file was replaced
+        """
+        md5 = _md5(self.path)
+        self.pushed_md5 = md5
+        if md5 == self.md5:
+            _count('unchanged')
+            return False
+        utils.replace_resource_file_on_irods(self.path, self.res_file, user)
+        istorage = self.res_file.resource.get_irods_storage()
+        storage_path = self.res_file.storage_path
+        _write_state(self.entry, storage_path, _catalog_state(istorage, storage_path), md5)
+        self.md5 = md5
+        _count('pushes')
+        return True
+
+    @property
+    def changed(self):
+        """ whether the copy was changed since it was fetched or last pushed """
+        if self.pushed_md5 != self.md5:
+            # push() failed
+            return True
+        return _md5(self.path) != self.md5
+
+
+@contextmanager
+def working_copy(res_file):
+    """
+    Provide an up-to-date local copy of a resource file for updating it
+
+    :param res_file: the ResourceFile of an ODM2 SQLite file
+    :return: a WorkingCopy; call its push() to write changes back to iRODS
+
+    Changes to the copy must be committed before push() is called.
+    """
+    istorage = res_file.resource.get_irods_storage()
+    storage_path = res_file.storage_path
+    entry = os.path.join(cache_dir(), hashlib.md5(storage_path.encode('utf-8')).hexdigest())
+    try:
+        os.makedirs(entry)
+    except OSError as ex:
+        if ex.errno != errno.EEXIST:
+            raise
+
+    with open(os.path.join(entry, LOCK_FILE), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            state = _catalog_state(istorage, storage_path)
+            data = os.path.join(entry, DATA_FILE)
+            recorded = _read_state(entry)
+            if recorded is not None and recorded['state'] == state and os.path.exists(data):
+                _count('hits')
+                md5 = recorded['md5']
+                os.utime(data, None)
+            else:
+                _count('misses')
+                _remove(entry)
+                istorage.getFile(storage_path, data + '.part')
+                os.rename(data + '.part', data)
+                md5 = _md5(data)
+                _write_state(entry, storage_path, state, md5)
+
+            copy = WorkingCopy(res_file, entry, md5)
+            try:
+                yield copy
+            except Exception:
+                # the copy may have been left partly updated
+                _count('discards')
+                _remove(entry)
+                raise
+            if _max_bytes() <= 0 or copy.changed:
+                if _max_bytes() > 0:
+                    logger.warning("Discarding unpushed changes to a copy of {}"
+                                   .format(storage_path))
+                    _count('discards')
+                _remove(entry)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+    _evict(keep=entry)
+
+
+def _evict(keep=None):
+    """ remove the least recently used copies until the cache fits in SQLITE_CACHE_MAX_BYTES """
+    root = cache_dir()
+    max_bytes = _max_bytes()
+    copies = []
+    total = 0
+    for name in os.listdir(root):
+        entry = os.path.join(root, name)
+        try:
+            stat = os.stat(os.path.join(entry, DATA_FILE))
+        except OSError:
+            continue
+        total += stat.st_size
+        if entry != keep:
+            copies.append((stat.st_mtime, stat.st_size, entry))
+
+    for _, size, entry in sorted(copies):
+        if total <= max_bytes:
+            break
+        with open(os.path.join(entry, LOCK_FILE), 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError:
+                # in use
+                continue
+            try:
+                _remove(entry)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        total -= size
+        _count('evictions')
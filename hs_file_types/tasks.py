@@ -0,0 +1,69 @@
+from __future__ import absolute_import
+
+import logging
+
+from celery import shared_task
+
+from hs_core.models import BaseResource
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def update_sqlite_file_task(resource_id, logical_file_id, token):
+    """
+    Write pending metadata changes to the sqlite file of a time series resource or aggregation
+
+    :param resource_id: short id of the resource
+    :param logical_file_id: id of the TimeSeriesLogicalFile, or None to update the sqlite file
+        of a TimeSeriesResource
+    :param token: identifies the deferred update, see schedule_sqlite_file_update()
+
+    Nothing is done if the update was cancelled or the metadata was written meanwhile.
+    """
+    from hs_file_types.models.timeseries import TimeSeriesLogicalFile, \
+        claim_sqlite_file_update
+
+    resource = BaseResource.objects.filter(short_id=resource_id).first()
+    if resource is None:
+        # deleted meanwhile
+        return
+    resource = resource.get_content_model()
+    if logical_file_id is None:
+        instance = resource
+    else:
+        instance = TimeSeriesLogicalFile.objects.filter(id=logical_file_id).first()
+    if instance is None or not claim_sqlite_file_update(instance, token):
+        return
+
+    instance.metadata.refresh_from_db()
+    if not instance.metadata.is_dirty or not instance.can_update_sqlite_file:
+        return
+    # the user who last changed the resource made the changes being written
+    user = resource.last_changed_by
+    if logical_file_id is None:
+        resource.metadata.update_sqlite_file(user)
+    else:
+        instance.update_sqlite_file(user)
+    logger.info("Deferred SQLite file update was successful for resource ID:{}."
+                .format(resource_id))
+
+
+@shared_task
+def update_raster_statistics_task(resource_id, logical_file_id):
+    """
+    Replace the approximate band statistics of a raster aggregation with exact ones
+
+    :param resource_id: short id of the resource
+    :param logical_file_id: id of the GeoRasterLogicalFile
+    """
+    from hs_file_types.models.raster import GeoRasterLogicalFile
+
+    logical_file = GeoRasterLogicalFile.objects.filter(id=logical_file_id,
+                                                       resource__short_id=resource_id).first()
+    if logical_file is None:
+        # deleted meanwhile
+        return
+    logical_file.update_exact_statistics()
+    logger.info("Exact raster statistics were computed for resource ID:{}."
+                .format(resource_id))
@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+
+from osgeo import ogr
+from django.test import SimpleTestCase, override_settings
+
+from hs_file_types.models import geofeature
+
+
+class TestGeoFeatureExtract(SimpleTestCase):
+
+    def setUp(self):
+        super(TestGeoFeatureExtract, self).setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        for ext in ('.shp', '.shx', '.dbf', '.prj'):
+            shutil.copy(os.path.join('hs_file_types/tests/data', 'states' + ext), self.temp_dir)
+        self.shp_file = os.path.join(self.temp_dir, 'states.shp')
+
+    def tearDown(self):
+        super(TestGeoFeatureExtract, self).tearDown()
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+
+    def test_extent_and_count_from_header(self):
+        shp_meta = geofeature.parse_shp(self.shp_file)
+
+        # the same as by reading all the features
+        dataset = ogr.GetDriverByName('ESRI Shapefile').Open(self.shp_file)
+        layer = dataset.GetLayer()
+        west, east, south, north = layer.GetExtent(force=1)
+        feature_count = len([feature for feature in layer])
+        dataset = None
+
+        self.assertEqual(shp_meta['feature_count'], feature_count)
+        self.assertEqual(shp_meta['origin_extent_dict'],
+                         {'westlimit': west, 'eastlimit': east,
+                          'southlimit': south, 'northlimit': north})
+        self.assertEqual(shp_meta['geometry_type'], 'MULTIPOLYGON')
+        # the layer is geographic; the WGS84 extent differs only by the datum shift
+        wgs84_extent = shp_meta['wgs84_extent_dict']
+        self.assertEqual(wgs84_extent['projection'], 'WGS 84 EPSG:4326')
+        for limit, value in (('westlimit', west), ('eastlimit', east),
+                             ('southlimit', south), ('northlimit', north)):
+            self.assertAlmostEqual(wgs84_extent[limit], value, places=2)
+
+    @override_settings(GEOFEATURE_METADATA_CACHE_TTL=60, GEOFEATURE_METADATA_CACHE_ALIAS='default')
+    def test_metadata_is_cached_by_key(self):
+        geofeature.reset_stats()
+        meta_dict = geofeature.extract_metadata(self.shp_file, metadata_key='states-test-key')
+        self.assertEqual(geofeature.get_stats(), {'hits': 0, 'misses': 1})
+
+        # the cached metadata is not parsed again
+        os.remove(self.shp_file)
+        self.assertEqual(geofeature.extract_metadata(self.shp_file,
+                                                     metadata_key='states-test-key'),
+                         meta_dict)
+        self.assertEqual(geofeature.get_stats(), {'hits': 1, 'misses': 1})
+
+        with self.assertRaises(Exception):
+            geofeature.extract_metadata(self.shp_file)
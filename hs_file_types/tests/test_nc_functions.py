@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+
+import netCDF4
+import numpy
+from django.test import SimpleTestCase
+
+from hs_file_types.nc_functions import nc_dump, nc_meta, nc_utils
+
+
+class TestNetCDFFunctions(SimpleTestCase):
+
+    def setUp(self):
+        super(TestNetCDFFunctions, self).setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        self.nc_file = os.path.join(self.temp_dir, 'sample.nc')
+        nc_dataset = netCDF4.Dataset(self.nc_file, 'w')
+        nc_dataset.title = 'Sample "NetCDF" file'
+        nc_dataset.createDimension('time', None)
+        nc_dataset.createDimension('lat', 4)
+        nc_dataset.createDimension('nv', 2)
+        time_var = nc_dataset.createVariable('time', 'f8', ('time',))
+        time_var.units = 'days since 2000-01-01 00:00:00'
+        time_var.bounds = 'time_bnds'
+        time_var[:] = numpy.arange(5000, dtype='f8')
+        time_bnds = nc_dataset.createVariable('time_bnds', 'f8', ('time', 'nv'))
+        time_bnds[:] = numpy.column_stack([numpy.arange(5000) - 0.5, numpy.arange(5000) + 0.5])
+        lat_var = nc_dataset.createVariable('lat', 'f4', ('lat',))
+        lat_var.units = 'degrees_north'
+        lat_var.valid_range = numpy.array([-90, 90], dtype='f4')
+        # a coordinate variable that is not monotonic, against the CF conventions
+        lat_var[:] = [40, 45, 35, 42]
+        data_var = nc_dataset.createVariable('data', 'i2', ('time', 'lat'))
+        data_var.missing_value = numpy.int16(-9999)
+        data_var[:] = numpy.full((5000, 4), -9999, dtype='i2')
+        nc_dataset.close()
+
+    def tearDown(self):
+        super(TestNetCDFFunctions, self).tearDown()
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+
+    def test_variable_limits(self):
+        nc_dataset = nc_utils.get_nc_dataset(self.nc_file)
+        try:
+            variables = nc_dataset.variables
+            self.assertEqual(nc_utils.get_nc_variable_limits(variables['time'], monotonic=True),
+                             (0, 4999))
+            self.assertEqual(nc_utils.get_nc_variable_limits(variables['time_bnds'],
+                                                             monotonic=True),
+                             (-0.5, 4999.5))
+            # the sample shows that the variable is not monotonic
+            self.assertEqual(nc_utils.get_nc_variable_limits(variables['lat'], monotonic=True),
+                             (35, 45))
+            self.assertEqual(nc_utils.get_nc_variable_limits(variables['lat']), (35, 45))
+            # no valid values
+            self.assertEqual(nc_utils.get_nc_variable_limits(variables['data']), (None, None))
+        finally:
+            nc_dataset.close()
+
+    def test_limits_read_in_chunks(self):
+        chunk_size = nc_utils.REDUCE_CHUNK_SIZE
+        nc_utils.REDUCE_CHUNK_SIZE = 7
+        nc_dataset = nc_utils.get_nc_dataset(self.nc_file)
+        try:
+            self.assertEqual(nc_utils.get_nc_variable_limits(nc_dataset.variables['time_bnds']),
+                             (-0.5, 4999.5))
+        finally:
+            nc_dataset.close()
+            nc_utils.REDUCE_CHUNK_SIZE = chunk_size
+
+    def test_period_from_one_open_dataset(self):
+        nc_dataset = nc_utils.get_nc_dataset(self.nc_file)
+        try:
+            dublin_core_meta, type_specific_meta = nc_meta.get_nc_meta_dict(nc_dataset)
+            # the dataset is left open for the header
+            header = nc_dump.get_nc_header_string(self.nc_file, nc_dataset)
+        finally:
+            nc_dataset.close()
+
+        # the period covers the bounds of the time steps
+        self.assertEqual(dublin_core_meta['period'],
+                         {'start': '1999-12-31 12:00:00', 'end': '2013-09-08 12:00:00'})
+        self.assertEqual(sorted(type_specific_meta),
+                         ['data', 'lat', 'time', 'time_bnds'])
+
+        self.assertTrue(header.startswith('netcdf sample {\ndimensions:\n'))
+        self.assertIn('\ttime = UNLIMITED ; // (5000 currently)', header)
+        self.assertIn('\tdouble time_bnds(time, nv) ;', header)
+        self.assertIn('\t\tlat:valid_range = -90f, 90f ;', header)
+        self.assertIn('\t\tdata:missing_value = -9999s ;', header)
+        self.assertIn('// global attributes:\n\t\t:title = "Sample \\"NetCDF\\" file" ;', header)
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+
+import gdal
+from gdalconst import GA_ReadOnly
+from django.test import SimpleTestCase
+
+from hs_file_types.models.raster import create_vrt_file, _explode_raster_zip_file, \
+    _get_invalid_raster_files
+
+
+class TestRasterIngest(SimpleTestCase):
+
+    def setUp(self):
+        super(TestRasterIngest, self).setUp()
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        super(TestRasterIngest, self).tearDown()
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+
+    def _copy(self, file_name):
+        shutil.copy(os.path.join('hs_file_types/tests', file_name), self.temp_dir)
+        return os.path.join(self.temp_dir, file_name)
+
+    def test_create_vrt_file(self):
+        tif_file = self._copy('small_logan.tif')
+        vrt_file = create_vrt_file(tif_file)
+        self.assertEqual(vrt_file, os.path.join(self.temp_dir, 'small_logan.vrt'))
+
+        sources = list(ET.parse(vrt_file).getroot().iter('SourceFilename'))
+        self.assertEqual(len(sources), 1)
+        self.assertEqual(sources[0].text, 'small_logan.tif')
+        self.assertEqual(sources[0].attrib['relativeToVRT'], '1')
+
+        vrt_dataset = gdal.Open(vrt_file, GA_ReadOnly)
+        tif_dataset = gdal.Open(tif_file, GA_ReadOnly)
+        self.assertEqual(vrt_dataset.RasterXSize, tif_dataset.RasterXSize)
+        self.assertEqual(vrt_dataset.RasterYSize, tif_dataset.RasterYSize)
+        self.assertEqual(vrt_dataset.RasterCount, tif_dataset.RasterCount)
+
+    def test_create_vrt_file_for_invalid_tif(self):
+        tif_file = self._copy('raster_tif_invalid.tif')
+        with self.assertRaises(Exception):
+            create_vrt_file(tif_file)
+
+    def test_explode_zip_file(self):
+        zip_file = self._copy('logan_vrt_small.zip')
+        error, file_paths = _explode_raster_zip_file(zip_file)
+        self.assertEqual(error, None)
+        self.assertEqual(sorted(os.path.basename(path) for path in file_paths),
+                         ['logan.vrt', 'logan1.tif', 'logan2.tif'])
+        for path in file_paths:
+            self.assertEqual(os.path.dirname(path), self.temp_dir)
+            self.assertTrue(os.path.isfile(path))
+        tif_paths = [path for path in file_paths if path.endswith('.tif')]
+        self.assertEqual(_get_invalid_raster_files(tif_paths), [])
+
+    def test_invalid_zip_file_is_not_extracted(self):
+        zip_file = self._copy('bad_small_vrt.zip')
+        error, file_paths = _explode_raster_zip_file(zip_file)
+        self.assertEqual(error, "Invalid zip file. Seems to contain multiple vrt files.")
+        self.assertEqual(file_paths, [])
+        self.assertEqual(os.listdir(self.temp_dir), ['bad_small_vrt.zip'])
+
+    def test_invalid_tiles(self):
+        paths = [self._copy('logan1.tif'), self._copy('raster_tif_invalid.tif')]
+        self.assertEqual(_get_invalid_raster_files(paths), ['raster_tif_invalid.tif'])
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from hs_file_types import raster_meta_extract
+
+
+class TestRasterMetaExtract(SimpleTestCase):
+
+    def setUp(self):
+        super(TestRasterMetaExtract, self).setUp()
+        # metadata extraction may write to the vrt file
+        self.temp_dir = tempfile.mkdtemp()
+        for file_name in ('logan.vrt', 'logan1.tif', 'logan2.tif'):
+            shutil.copy(os.path.join('hs_file_types/tests', file_name), self.temp_dir)
+        self.vrt_file = os.path.join(self.temp_dir, 'logan.vrt')
+
+    def tearDown(self):
+        super(TestRasterMetaExtract, self).tearDown()
+        if os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+
+    def _band(self, **kwargs):
+        band_info = raster_meta_extract.get_band_info(self.vrt_file, **kwargs)
+        self.assertEqual(len(band_info), 1)
+        return band_info[1]
+
+    def test_small_band_statistics_are_exact(self):
+        band = self._band()
+        self.assertEqual(str(band['noDataValue']), '-3.40282346639e+38')
+        self.assertEqual(str(band['maximumValue']), '2880.00708008')
+        self.assertEqual(str(band['minimumValue']), '1870.63659668')
+
+    @override_settings(RASTER_STATS_MAX_PIXELS=5000)
+    def test_large_band_statistics_are_approximate(self):
+        band = self._band()
+        self.assertTrue(1870.63659668 <= band['minimumValue'] <= band['maximumValue'] <=
+                        2880.00708008)
+
+        band = self._band(exact_statistics=True)
+        self.assertEqual(str(band['maximumValue']), '2880.00708008')
+        self.assertEqual(str(band['minimumValue']), '1870.63659668')
+
+    def test_metadata_from_single_open(self):
+        meta_dict = raster_meta_extract.get_raster_meta_dict(self.vrt_file)
+        self.assertEqual(meta_dict['cell_info']['rows'], 230)
+        self.assertEqual(meta_dict['cell_info']['columns'], 329)
+        self.assertEqual(meta_dict['spatial_coverage_info']['original_coverage_info']['units'],
+                         'meter')
+        self.assertEqual(str(meta_dict['band_info'][1]['maximumValue']), '2880.00708008')
+
+    def test_vrt_sources_next_to_vrt_file(self):
+        with open(self.vrt_file) as vrt_file:
+            vrt = vrt_file.read()
+        with open(self.vrt_file, 'w') as vrt_file:
+            vrt_file.write(vrt.replace('relativeToVRT="1"', 'relativeToVRT="0"'))
+
+        # the working directory is not the folder of the vrt file
+        self.assertNotEqual(os.getcwd(), self.temp_dir)
+        band = self._band()
+        self.assertEqual(str(band['maximumValue']), '2880.00708008')
+
+    @override_settings(RASTER_STATS_CACHE_TTL=60, RASTER_STATS_MAX_PIXELS=5000)
+    def test_statistics_are_cached_by_key(self):
+        raster_meta_extract.reset_stats()
+        approximate = self._band(statistics_key='logan-test-key')
+        self.assertEqual(raster_meta_extract.get_stats(), {'hits': 0, 'misses': 1})
+        self.assertEqual(self._band(statistics_key='logan-test-key'), approximate)
+        self.assertEqual(raster_meta_extract.get_stats(), {'hits': 1, 'misses': 1})
+
+        # approximate statistics don't answer a request for exact ones, but exact ones answer
+        # both
+        exact = self._band(statistics_key='logan-test-key', exact_statistics=True)
+        self.assertEqual(raster_meta_extract.get_stats()['misses'], 2)
+        self.assertEqual(self._band(statistics_key='logan-test-key'), exact)
+        self.assertEqual(raster_meta_extract.get_stats(), {'hits': 2, 'misses': 2})
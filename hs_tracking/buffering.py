@@ -0,0 +1,175 @@
+"""Buffered recording of tracking variables.
+
+Recording a visit on the request path costs a resource lookup and an INSERT for every
+page view. Instead, the Tracking middleware queues the variable here, and a background
+thread of the process writes queued variables in batches with bulk_create, resolving the
+resources of a whole batch with one query, and adds them to the daily rollups.
+
+The queue is bounded by TRACKING_BUFFER_SIZE; variables arriving when it is full are
+dropped and counted. Setting TRACKING_BUFFER_SIZE to 0, or running tests, records every
+variable synchronously as before.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class TrackingBuffer(object):
+    """A bounded queue of tracking variables, flushed to the database in batches."""
+
+    def __init__(self, max_size, batch_size, interval):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.queued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def add(self, **fields):
+        """Queue the fields of a Variable; the timestamp is taken now, not when written."""
+        fields.setdefault('timestamp', timezone.now())
+        with self._lock:
+            if len(self._queue) >= self.max_size:
+                self.dropped += 1
+                return False
+            self._queue.append((time.time(), fields))
+            self.queued += 1
+            full = len(self._queue) >= self.batch_size
+        self._start()
+        if full:
+            self._wakeup.set()
+        return True
+
+    def _take(self):
+        with self._lock:
+            count = min(self.batch_size, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def flush(self):
+        """Write all queued variables; return the number written."""
+        written = 0
+        batch = self._take()
+        while batch:
+            written += self._write(batch)
+            batch = self._take()
+        return written
+
+    def _write(self, batch):
+        from hs_core.models import BaseResource
+        from hs_tracking.models import Variable
+
+        short_ids = set(f['last_resource_id'] for _, f in batch
+                        if f.get('last_resource_id') and f.get('resource_id') is None)
+        resource_ids = dict(BaseResource.objects.filter(short_id__in=short_ids)
+                            .values_list('short_id', 'id')) if short_ids else {}
+        variables = []
+        for _, fields in batch:
+            if fields.get('resource_id') is None and fields.get('last_resource_id'):
+                fields['resource_id'] = resource_ids.get(fields['last_resource_id'])
+            variables.append(Variable(**fields))
+        try:
+            Variable.objects.bulk_create(variables)
+        except Exception:
+            logger.exception("dropping a batch of %d tracking variables", len(batch))
+            with self._lock:
+                self.failed += len(batch)
+            return 0
+        self._add_to_rollups(variables)
+        lag = time.time() - batch[0][0]
+        with self._lock:
+            self.flushed += len(batch)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+        return len(batch)
+
+    def _add_to_rollups(self, variables):
+        from hs_tracking.models import Session, ROLLUP_NAMES
+        from hs_tracking.rollups import add_variables
+
+        counted = [v for v in variables if v.name in ROLLUP_NAMES and v.resource_id is not None]
+        if not counted:
+            return
+        try:
+            user_ids = dict(Session.objects
+                            .filter(id__in=set(v.session_id for v in counted))
+                            .values_list('id', 'visitor__user_id'))
+            add_variables(counted, user_ids)
+        except Exception:
+            logger.exception("adding %d tracking variables to rollups failed", len(counted))
+
+    def _start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='hs_tracking-buffer')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception:
+                logger.exception("flushing tracking variables failed")
+
+    def get_stats(self):
+        """Return queue depth, lag of the oldest queued variable and write counters."""
+        with self._lock:
+            depth = len(self._queue)
+            oldest = self._queue[0][0] if depth else None
+            return {'depth': depth,
+                    'lag': time.time() - oldest if oldest is not None else 0.0,
+                    'queued': self.queued,
+                    'flushed': self.flushed,
+                    'dropped': self.dropped,
+                    'failed': self.failed,
+                    'last_flush_lag': round(self.last_lag, 3),
+                    'max_flush_lag': round(self.max_lag, 3)}
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Return the buffer of this process, or None if variables are recorded synchronously."""
+    global _buffer
+    if getattr(settings, 'TESTING', False) or getattr(settings, 'TRACKING_BUFFER_SIZE', 0) <= 0:
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = TrackingBuffer(settings.TRACKING_BUFFER_SIZE,
+                                         getattr(settings, 'TRACKING_FLUSH_BATCH_SIZE', 500),
+                                         getattr(settings, 'TRACKING_FLUSH_INTERVAL', 5))
+                atexit.register(_buffer.flush)
+    return _buffer
+
+
+def get_stats():
+    """Return the counters of the buffer of this process, or None if there is none."""
+    return _buffer.get_stats() if _buffer is not None else None
@@ -6,7 +6,7 @@ from calendar import monthrange
 
 from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand
-from django.db.models import Q
+from django.db.models import Q, Sum
 from django.utils import timezone
 from hs_core.models import BaseResource
 from theme.models import UserProfile
@@ -77,6 +77,12 @@ class Command(BaseCommand):
             action="store_true",
             help="dump tracking variables collected today",
         )
+        parser.add_argument(
+            "--daily-resource-counts",
+            dest="daily_resource_counts",
+            action="store_true",
+            help="visits, downloads and distinct users of resources by day, from rollups",
+        )
         parser.add_argument('lookback-days', nargs='?', default=1)
 
     def print_var(self, var_name, value, period=None):
@@ -204,6 +210,19 @@ class Command(BaseCommand):
                       vals]
             print('|'.join(values))
 
+    def daily_resource_counts(self, lookback=1):
+        # daily totals are summed from hs_tracking rollups rather than counted from variables
+        since = hs_tracking.rollup_start(lookback)
+        days = hs_tracking.ResourceRollup.objects.filter(date__gte=since)\
+            .values('date')\
+            .annotate(visits=Sum('visits'), downloads=Sum('downloads'), users=Sum('users'))\
+            .order_by('date')
+        w = csv.writer(sys.stdout)
+        w.writerow(['date', 'visits', 'downloads', 'resource users'])
+        for day in days:
+            w.writerow([day['date'].strftime('%m/%d/%Y'), day['visits'], day['downloads'],
+                        day['users']])
+
     def dict_spc_to_pipe(self, s):
 
         # exit early if pipes already exist
@@ -249,3 +268,5 @@ class Command(BaseCommand):
             self.resources_details()
         if options["yesterdays_variables"]:
             self.yesterdays_variables(lookback=int(options['lookback-days']))
+        if options["daily_resource_counts"]:
+            self.daily_resource_counts(lookback=int(options['lookback-days']))
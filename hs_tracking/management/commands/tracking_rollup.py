@@ -0,0 +1,50 @@
+"""
+Rebuild the daily rollups of visits and downloads from tracking variables.
+
+By default, days up to yesterday are rebuilt. Today is only rebuilt when asked for with
+--end, and should not be while the site is receiving visits, as visits recorded during the
+rebuild may be lost from the rollups.
+"""
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+from hs_tracking.models import Variable, rollup_day
+from hs_tracking.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "rebuild daily tracking rollups"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, dest='days', default=1,
+                            help='number of days before today to rebuild, ending yesterday')
+        parser.add_argument('--start', type=str, dest='start', default=None,
+                            help='first day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end', type=str, dest='end', default=None,
+                            help='last day to rebuild (YYYY-MM-DD), default yesterday')
+        parser.add_argument('--all', action='store_true', dest='all',
+                            help='rebuild every day for which variables were recorded')
+
+    def handle(self, *args, **options):
+        if options['end']:
+            end = datetime.strptime(options['end'], '%Y-%m-%d').date()
+        else:
+            end = rollup_day() - timedelta(days=1)
+
+        if options['all']:
+            first = Variable.objects.aggregate(first=Min('timestamp'))['first']
+            if first is None:
+                print("no variables recorded")
+                return
+            start = rollup_day(first)
+        elif options['start']:
+            start = datetime.strptime(options['start'], '%Y-%m-%d').date()
+        else:
+            start = end - timedelta(days=options['days'] - 1)
+
+        day = start
+        while day <= end:
+            count = rebuild(day)
+            print("{}: {} resources".format(day.strftime('%Y-%m-%d'), count))
+            day += timedelta(days=1)
@@ -83,8 +83,8 @@ class Tracking(object):
         rest = get_rest_from_url(request.path)
         landing = get_landing_from_url(request.path)
 
-        # save the activity in the database
+        # queue the activity to be saved in the database
         session.record('visit', value=msg, resource_id=resource_id,
-                       landing=landing, rest=rest)
+                       landing=landing, rest=rest, buffered=True)
 
         return response
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('hs_core', '0043_auto_20190621_0308'),
+        ('hs_tracking', '0008_variable_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('visits', models.IntegerField(default=0)),
+                ('downloads', models.IntegerField(default=0)),
+                ('users', models.IntegerField(default=0)),
+                ('last_visit', models.DateTimeField(null=True)),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='hs_core.BaseResource')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserResourceRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('visits', models.IntegerField(default=0)),
+                ('downloads', models.IntegerField(default=0)),
+                ('last_visit', models.DateTimeField(null=True)),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_rollups', to='hs_core.BaseResource')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resource_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='userresourcerollup',
+            unique_together=set([('user', 'resource', 'date')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='resourcerollup',
+            unique_together=set([('resource', 'date')]),
+        ),
+    ]
@@ -1,14 +1,19 @@
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 
 from django.db import models
-from django.db.models import F
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.core import signing
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 from theme.models import UserProfile
 from utils import get_std_log_fields
+from buffering import get_buffer
 from hs_core.models import BaseResource
 from hs_core.hydroshare import get_resource_by_shortkey
 
@@ -19,6 +24,42 @@ VISITOR_FIELDS = ["id"] + USER_FIELDS + PROFILE_FIELDS
 if set(PROFILE_FIELDS) & set(USER_FIELDS):
     raise ImproperlyConfigured("hs_tracking PROFILE_FIELDS and USER_FIELDS must not contain"
                                " overlapping field names")
+SESSION_CACHE_SIZE = getattr(settings, 'TRACKING_SESSION_CACHE_SIZE', 10000)
+
+
+class SessionCache(object):
+    """ Sessions of this process by signed session id, with the time each was last used
+
+    Sessions found here were active within SESSION_TIMEOUT, so the query for recent
+    variables of the session can be skipped.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, signed_id, cut_off):
+        with self._lock:
+            entry = self._sessions.pop(signed_id, None)
+            if entry is None or entry[1] < cut_off:
+                return None
+            self._sessions[signed_id] = entry
+            return entry[0]
+
+    def put(self, signed_id, session):
+        with self._lock:
+            self._sessions.pop(signed_id, None)
+            self._sessions[signed_id] = (session, datetime.now())
+            while len(self._sessions) > self.max_size:
+                self._sessions.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+
+session_cache = SessionCache(SESSION_CACHE_SIZE)
 
 
 class SessionManager(models.Manager):
@@ -28,15 +69,22 @@ class SessionManager(models.Manager):
 
         signed_id = request.session.get('hs_tracking_id')
         if signed_id:
-            tracking_id = signing.loads(signed_id)
             cut_off = datetime.now() - timedelta(seconds=SESSION_TIMEOUT)
-            session = None
+            session = session_cache.get(signed_id, cut_off)
+            if session is not None and \
+                    (session.visitor.user is not None or user is None or
+                     not user.is_authenticated()):
+                session_cache.put(signed_id, session)
+                return session
 
-            try:
-                session = Session.objects.filter(
-                    variable__timestamp__gte=cut_off).filter(id=tracking_id['id']).first()
-            except Session.DoesNotExist:
-                pass
+            tracking_id = signing.loads(signed_id)
+            if session is None:
+                # a session is recent if it began or recorded a variable within the timeout
+                session = Session.objects.select_related('visitor__user')\
+                    .filter(id=tracking_id['id'], begin__gte=cut_off).first() or \
+                    Session.objects.select_related('visitor__user')\
+                    .filter(variable__timestamp__gte=cut_off)\
+                    .filter(id=tracking_id['id']).first()
 
             if session is not None and user is not None:
                 if session.visitor.user is None and user.is_authenticated():
@@ -46,6 +94,7 @@ class SessionManager(models.Manager):
                     except Visitor.DoesNotExist:
                         session.visitor.user = user
                         session.visitor.save()
+                session_cache.put(signed_id, session)
                 return session
 
         # No session found, create one
@@ -61,7 +110,9 @@ class SessionManager(models.Manager):
         msg = Variable.format_kwargs(**fields)
 
         session.record('begin_session', msg)
-        request.session['hs_tracking_id'] = signing.dumps({'id': session.id})
+        signed_id = signing.dumps({'id': session.id})
+        request.session['hs_tracking_id'] = signed_id
+        session_cache.put(signed_id, session)
         return session
 
 
@@ -126,7 +177,8 @@ class Variable(models.Model):
     from hs_core.models import BaseResource
 
     session = models.ForeignKey(Session, related_name='variable')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # set when a variable is recorded, rather than written, as writes may be buffered
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     name = models.CharField(max_length=32)
     type = models.IntegerField(choices=TYPE_CHOICES)
     # change value to TextField to be less restrictive as max_length of CharField has been
@@ -164,19 +216,42 @@ class Variable(models.Model):
 
     @classmethod
     def record(cls, session, name, value=None, resource=None, resource_id=None,
-               rest=False, landing=False):
+               rest=False, landing=False, buffered=False):
+        """
+        Record a variable of a session
+
+        If buffered is True and tracking writes are buffered (see hs_tracking.buffering), the
+        variable is queued to be written in a batch and None is returned; otherwise it is
+        written now and returned.
+        """
+        tracking_buffer = get_buffer() if buffered else None
+        if tracking_buffer is not None:
+            tracking_buffer.add(session_id=session.id, name=name,
+                                type=cls.encode_type(value),
+                                value=cls.encode(value),
+                                last_resource_id=resource_id,
+                                resource_id=resource.id if resource is not None else None,
+                                rest=rest,
+                                landing=landing)
+            return None
+
         if resource is None and resource_id is not None:
             try:
                 resource = get_resource_by_shortkey(resource_id, or_404=False)
             except BaseResource.DoesNotExist:
                 resource = None
-        return Variable.objects.create(session=session, name=name,
-                                       type=cls.encode_type(value),
-                                       value=cls.encode(value),
-                                       last_resource_id=resource_id,
-                                       resource=resource,
-                                       rest=rest,
-                                       landing=landing)
+        variable = Variable.objects.create(session=session, name=name,
+                                           type=cls.encode_type(value),
+                                           value=cls.encode(value),
+                                           last_resource_id=resource_id,
+                                           resource=resource,
+                                           rest=rest,
+                                           landing=landing)
+        if name in ROLLUP_NAMES and resource is not None:
+            # prevent import loops
+            from rollups import add_variables
+            add_variables([variable], {session.id: session.visitor.user_id})
+        return variable
 
     @classmethod
     def encode(cls, value):
@@ -215,51 +290,54 @@ class Variable(models.Model):
         :param n_resources: the number of resources to return.
         :param days: the number of days to scan.
 
-        The reason for the parameter `days` is that the runtime of this method
-        is very dependent upon the days that one scans. Thus, there is a tradeoff
-        between reporting history and timely responsiveness of the dashboard.
+        This is answered from the daily rollups in UserResourceRollup, so that its runtime
+        depends upon the number of resources the user visited in the period rather than
+        upon the number of visits recorded.
         """
         # TODO: document actions like labeling and commenting (currently these are 'visit's)
         return BaseResource.objects.filter(
-                variable__session__visitor__user=user,
-                variable__timestamp__gte=(datetime.now()-timedelta(days)),
-                variable__resource__isnull=False,
-                variable__name='visit')\
+                user_rollups__user=user,
+                user_rollups__date__gte=rollup_start(days),
+                user_rollups__visits__gt=0)\
             .only('short_id', 'created')\
-            .distinct()\
             .annotate(public=F('raccess__public'),
                       discoverable=F('raccess__discoverable'),
                       published=F('raccess__published'),
-                      last_accessed=models.Max('variable__timestamp'))\
-            .filter(variable__timestamp=F('last_accessed'))\
+                      last_accessed=models.Max('user_rollups__last_visit'))\
             .order_by('-last_accessed')[:n_resources]
 
     @classmethod
     def popular_resources(cls, n_resources=5, days=60, today=None):
         """
-        fetch the most recent n resources with which a specific user has interacted
+        fetch the n resources visited by the most distinct users in a period
 
         :param n_resources: the number of resources to return.
         :param days: the number of days to scan.
+        :param today: the end of the period, whose day is included; default is now.
 
-        The reason for the parameter `days` is that the runtime of this method
-        is very dependent upon the days that one scans. Thus, there is a tradeoff
-        between reporting history and timely responsiveness of the dashboard.
+        Resources visited only anonymously are included with no users. This is answered
+        from the daily rollups in ResourceRollup and UserResourceRollup, so that its runtime
+        depends upon the number of users and resources in the period rather than upon the
+        number of visits recorded.
         """
         # TODO: document actions like labeling and commenting (currently these are 'visit's)
-        if today is None:
-            today = datetime.now()
+        start = rollup_start(days, today)
+        end = rollup_day(today)
+        users = UserResourceRollup.objects\
+            .filter(resource=OuterRef('pk'), date__gte=start, date__lte=end, visits__gt=0)\
+            .order_by()\
+            .values('resource')\
+            .annotate(users=models.Count('user', distinct=True))\
+            .values('users')
         return BaseResource.objects.filter(
-                variable__timestamp__gte=(today-timedelta(days)),
-                variable__timestamp__lt=(today),
-                variable__resource__isnull=False,
-                variable__name='visit')\
-            .distinct()\
-            .annotate(users=models.Count('variable__session__visitor__user'))\
+                rollups__date__gte=start,
+                rollups__date__lte=end,
+                rollups__visits__gt=0)\
+            .annotate(users=Coalesce(Subquery(users, output_field=models.IntegerField()), 0))\
             .annotate(public=F('raccess__public'),
                       discoverable=F('raccess__discoverable'),
                       published=F('raccess__published'),
-                      last_accessed=models.Max('variable__timestamp'))\
+                      last_accessed=models.Max('rollups__last_visit'))\
             .order_by('-users')[:n_resources]
 
     @classmethod
@@ -271,16 +349,70 @@ class Variable(models.Model):
         :param n_users: the number of users to return.
         :param days: the number of days to scan.
 
-        The reason for the parameter `days` is that the runtime of this method
-        is very dependent upon the number of days that one scans. Thus, there is a
-        tradeoff between reporting history and timely responsiveness of the dashboard.
+        This is answered from the daily rollups in UserResourceRollup, so that its runtime
+        depends upon the number of users who visited the resource in the period rather
+        than upon the number of visits recorded.
         """
         return User.objects\
-            .filter(visitor__session__variable__resource=resource,
-                    visitor__session__variable__name='visit',
-                    visitor__session__variable__timestamp__gte=(datetime.now() -
-                                                                timedelta(days)))\
-            .distinct()\
-            .annotate(last_accessed=models.Max('visitor__session__variable__timestamp'))\
-            .filter(visitor__session__variable__timestamp=F('last_accessed'))\
+            .filter(resource_rollups__resource=resource,
+                    resource_rollups__date__gte=rollup_start(days),
+                    resource_rollups__visits__gt=0)\
+            .annotate(last_accessed=models.Max('resource_rollups__last_visit'))\
             .order_by('-last_accessed')[:n_users]
+
+
+ROLLUP_NAMES = ('visit', 'download')
+
+
+def rollup_day(timestamp=None):
+    """ the day to which a timestamp (default now) is rolled up, in the current time zone """
+    if timestamp is None:
+        timestamp = timezone.now()
+    if timezone.is_aware(timestamp):
+        timestamp = timezone.localtime(timestamp)
+    return timestamp.date()
+
+
+def rollup_start(days, today=None):
+    """ the first day of a period of days ending with today """
+    return rollup_day(today) - timedelta(days=days)
+
+
+class ResourceRollup(models.Model):
+    """
+    Daily counts of visits and downloads of a resource
+
+    Rollups are maintained from the tracking stream by hs_tracking.rollups.add_variables
+    and can be rebuilt from Variable with the tracking_rollup command.
+    """
+    resource = models.ForeignKey(BaseResource, related_name='rollups',
+                                 on_delete=models.CASCADE)
+    date = models.DateField(db_index=True)
+    visits = models.IntegerField(default=0)
+    downloads = models.IntegerField(default=0)
+    # distinct authenticated users who visited or downloaded the resource
+    users = models.IntegerField(default=0)
+    last_visit = models.DateTimeField(null=True)
+
+    class Meta:
+        unique_together = ('resource', 'date')
+
+
+class UserResourceRollup(models.Model):
+    """
+    Daily counts of visits and downloads of a resource by an authenticated user
+
+    Rollups are maintained from the tracking stream by hs_tracking.rollups.add_variables
+    and can be rebuilt from Variable with the tracking_rollup command.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='resource_rollups',
+                             on_delete=models.CASCADE)
+    resource = models.ForeignKey(BaseResource, related_name='user_rollups',
+                                 on_delete=models.CASCADE)
+    date = models.DateField(db_index=True)
+    visits = models.IntegerField(default=0)
+    downloads = models.IntegerField(default=0)
+    last_visit = models.DateTimeField(null=True)
+
+    class Meta:
+        unique_together = ('user', 'resource', 'date')
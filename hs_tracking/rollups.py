@@ -0,0 +1,141 @@
+"""Maintenance of the daily rollups of visits and downloads.
+
+ResourceRollup and UserResourceRollup hold daily counts per resource and per user and
+resource, so that dashboards and reports need not scan Variable. They are incremented as
+variables are written (see Variable.record and hs_tracking.buffering) and can be rebuilt
+for a range of days from Variable by rebuild(), e.g., to backfill history.
+
+Days that are still receiving visits should not be rebuilt under live traffic: variables
+recorded, and rollup increments made, while a day is rebuilt may be lost from its rollups.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from hs_tracking.models import Variable, ResourceRollup, UserResourceRollup, \
+    ROLLUP_NAMES, rollup_day
+
+
+def _tally(counts, key, name, timestamp):
+    tally = counts.setdefault(key, [0, 0, None])
+    if name == 'visit':
+        tally[0] += 1
+        if tally[2] is None or timestamp > tally[2]:
+            tally[2] = timestamp
+    else:
+        tally[1] += 1
+
+
+def _bump(model, keys, visits, downloads, last_visit, users=0):
+    """ add counts to a rollup row, creating it if needed; return whether it was created """
+    rows = model.objects.filter(**keys)
+    changes = {'visits': F('visits') + visits, 'downloads': F('downloads') + downloads}
+    if users:
+        changes['users'] = F('users') + users
+    if last_visit is not None:
+        # GREATEST ignores NULL in PostgreSQL
+        changes['last_visit'] = Greatest(F('last_visit'), Value(last_visit))
+    if rows.update(**changes):
+        return False
+    fields = dict(keys, visits=visits, downloads=downloads, last_visit=last_visit)
+    if users:
+        fields['users'] = users
+    try:
+        with transaction.atomic():
+            model.objects.create(**fields)
+        return True
+    except IntegrityError:
+        # created concurrently by another process
+        rows.update(**changes)
+        return False
+
+
+def add_variables(variables, user_ids):
+    """
+    Add variables that were just written to the rollups
+
+    :param variables: Variables; only visits and downloads of resources are counted
+    :param user_ids: dict from session id to the id of the user of the session, or None
+    """
+    resource_counts = {}
+    user_counts = {}
+    for variable in variables:
+        if variable.name not in ROLLUP_NAMES or variable.resource_id is None:
+            continue
+        day = rollup_day(variable.timestamp)
+        _tally(resource_counts, (variable.resource_id, day), variable.name, variable.timestamp)
+        user_id = user_ids.get(variable.session_id)
+        if user_id is not None:
+            _tally(user_counts, (user_id, variable.resource_id, day),
+                   variable.name, variable.timestamp)
+
+    new_users = {}
+    for (user_id, resource_id, day), (visits, downloads, last_visit) in user_counts.items():
+        if _bump(UserResourceRollup, {'user_id': user_id, 'resource_id': resource_id,
+                                      'date': day}, visits, downloads, last_visit):
+            new_users[(resource_id, day)] = new_users.get((resource_id, day), 0) + 1
+
+    for (resource_id, day), (visits, downloads, last_visit) in resource_counts.items():
+        _bump(ResourceRollup, {'resource_id': resource_id, 'date': day},
+              visits, downloads, last_visit, users=new_users.get((resource_id, day), 0))
+
+
+def rebuild(day):
+    """
+    Recompute the rollups of one day from Variable
+
+    :param day: the date to recompute, in the current time zone; this should be a day that
+        no longer receives visits, e.g., yesterday, as increments made by add_variables while
+        it is recomputed may be lost
+    :return: number of ResourceRollup rows written
+    """
+    with transaction.atomic():
+        return _rebuild(day)
+
+
+def _rebuild(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+    totals = Variable.objects.filter(timestamp__gte=start, timestamp__lt=end,
+                                     name__in=ROLLUP_NAMES, resource__isnull=False)\
+        .values('resource_id', 'session__visitor__user_id', 'name')\
+        .annotate(count=Count('id'), last=Max('timestamp'))
+
+    resources = {}
+    users = {}
+    for total in totals:
+        resource_id = total['resource_id']
+        user_id = total['session__visitor__user_id']
+        keys = [(resources, resource_id)]
+        if user_id is not None:  # anonymous visitors have no user rollups
+            keys.append((users, (user_id, resource_id)))
+        for counts, key in keys:
+            tally = counts.setdefault(key, [0, 0, None])
+            if total['name'] == 'visit':
+                tally[0] += total['count']
+                tally[2] = total['last'] if tally[2] is None else max(tally[2], total['last'])
+            else:
+                tally[1] += total['count']
+
+    distinct_users = {}
+    for user_id, resource_id in users:
+        distinct_users[resource_id] = distinct_users.get(resource_id, 0) + 1
+
+    ResourceRollup.objects.filter(date=day).delete()
+    UserResourceRollup.objects.filter(date=day).delete()
+    ResourceRollup.objects.bulk_create(
+        [ResourceRollup(resource_id=resource_id, date=day, visits=visits,
+                        downloads=downloads, last_visit=last_visit,
+                        users=distinct_users.get(resource_id, 0))
+         for resource_id, (visits, downloads, last_visit) in resources.items()],
+        batch_size=1000)
+    UserResourceRollup.objects.bulk_create(
+        [UserResourceRollup(user_id=user_id, resource_id=resource_id, date=day,
+                            visits=visits, downloads=downloads, last_visit=last_visit)
+         for (user_id, resource_id), (visits, downloads, last_visit) in users.items()],
+        batch_size=1000)
+    return len(resources)
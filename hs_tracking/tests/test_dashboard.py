@@ -1,6 +1,10 @@
+from datetime import datetime, timedelta
+
 from django.test import TestCase
 from django.contrib.auth.models import Group
-from hs_tracking.models import Variable
+from hs_tracking.models import Variable, Session, Visitor, ResourceRollup, UserResourceRollup, \
+    rollup_day
+from hs_tracking.rollups import rebuild
 from hs_core import hydroshare
 from rest_framework import status
 import socket
@@ -94,3 +98,46 @@ class TestDashboard(TestCase):
         self.assertEqual(one.last_resource_id, self.holes.short_id)
         self.assertEqual(one.landing, True)
         self.assertEqual(one.rest, False)
+
+    def test_rollups(self):
+        """ visits and downloads are rolled up as recorded, and rebuilt alike """
+
+        visitor = Visitor.objects.create(user=self.dog)
+        session = Session.objects.create(visitor=visitor)
+        anonymous = Session.objects.create(visitor=Visitor.objects.create())
+        for s in (session, session, anonymous):
+            s.record('visit', value='', resource=self.holes,
+                     resource_id=self.holes.short_id)
+        session.record('download', value='', resource=self.squirrels,
+                       resource_id=self.squirrels.short_id)
+
+        holes = ResourceRollup.objects.get(resource=self.holes)
+        self.assertEqual((holes.visits, holes.downloads, holes.users), (3, 0, 1))
+        squirrels = ResourceRollup.objects.get(resource=self.squirrels)
+        self.assertEqual((squirrels.visits, squirrels.downloads, squirrels.users), (0, 1, 1))
+        dog = UserResourceRollup.objects.get(user=self.dog, resource=self.holes)
+        self.assertEqual((dog.visits, dog.downloads), (2, 0))
+
+        # downloads alone are not visits
+        self.assertEqual([r.short_id for r in Variable.recent_resources(self.dog)],
+                         [self.holes.short_id])
+        self.assertEqual(list(Variable.recent_users(self.holes)), [self.dog])
+        popular = Variable.popular_resources(today=datetime.now() + timedelta(days=1))
+        self.assertEqual([(r.short_id, r.users) for r in popular],
+                         [(self.holes.short_id, 1)])
+
+        # the visits of today are included, and so are resources visited only anonymously
+        anonymous.record('visit', value='', resource=self.squirrels,
+                         resource_id=self.squirrels.short_id)
+        self.assertEqual([(r.short_id, r.users) for r in Variable.popular_resources()],
+                         [(self.holes.short_id, 1), (self.squirrels.short_id, 0)])
+
+        def counts():
+            return sorted((r.resource_id, r.visits, r.downloads, r.users, r.last_visit)
+                          for r in ResourceRollup.objects.all()), \
+                   sorted((r.user_id, r.resource_id, r.visits, r.downloads, r.last_visit)
+                          for r in UserResourceRollup.objects.all())
+
+        streamed = counts()
+        self.assertEqual(rebuild(rollup_day()), 2)
+        self.assertEqual(counts(), streamed)
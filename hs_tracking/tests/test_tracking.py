@@ -8,6 +8,7 @@ from django.test import Client
 from django.http import HttpRequest, QueryDict, response
 from mock import patch, Mock
 
+from hs_tracking.buffering import TrackingBuffer
 from hs_tracking.models import Variable, Session, Visitor, SESSION_TIMEOUT, VISITOR_FIELDS
 from hs_tracking.views import AppLaunch
 import hs_tracking.utils as utils
@@ -196,6 +197,40 @@ class TrackingTests(TestCase):
         self.assertNotEqual(session1.id, session2.id)
         self.assertNotEqual(session1.visitor.id, session2.visitor.id)
 
+    def test_for_request_cached(self):
+        request = self.createRequest(user=self.user)
+        request.session = {}
+        session1 = Session.objects.for_request(request)
+        with self.assertNumQueries(0):
+            session2 = Session.objects.for_request(request)
+        self.assertEqual(session1.id, session2.id)
+
+    def test_buffered_record(self):
+        tracking_buffer = TrackingBuffer(max_size=3, batch_size=100, interval=3600)
+        self.assertTrue(tracking_buffer.add(session_id=self.session.id, name='visit',
+                                            type=2, value='one',
+                                            last_resource_id='0' * 32))
+        self.assertTrue(tracking_buffer.add(session_id=self.session.id, name='visit',
+                                            type=2, value='two'))
+        self.assertTrue(tracking_buffer.add(session_id=self.session.id, name='visit',
+                                            type=2, value='three'))
+        self.assertFalse(tracking_buffer.add(session_id=self.session.id, name='visit',
+                                             type=2, value='four'))
+        self.assertEqual(Variable.objects.count(), 0)
+
+        stats = tracking_buffer.get_stats()
+        self.assertEqual(stats['depth'], 3)
+        self.assertEqual(stats['dropped'], 1)
+
+        with self.assertNumQueries(2):  # resolve resources, then insert
+            self.assertEqual(tracking_buffer.flush(), 3)
+        self.assertEqual(sorted(self.session.getlist('visit')), ['one', 'three', 'two'])
+        # a resource that does not exist is remembered by id only
+        variable = Variable.objects.get(value='one')
+        self.assertIsNone(variable.resource)
+        self.assertEqual(variable.last_resource_id, '0' * 32)
+        self.assertEqual(tracking_buffer.get_stats()['flushed'], 3)
+
     def test_export_visitor_info(self):
         request = self.createRequest(user=self.user)
         request.session = {}
@@ -1,4 +1,5 @@
 import csv
+import json
 from cStringIO import StringIO
 import urlparse
 
@@ -8,6 +9,7 @@ from django.contrib.auth.decorators import user_passes_test
 from django.http import HttpResponse, HttpResponseRedirect
 from django.contrib import messages
 
+from . import buffering
 from . import models as hs_tracking
 from .models import Session, Variable
 from .utils import get_std_log_fields
@@ -116,3 +118,14 @@ class HistoryReport(TemplateView):
             w.writerow(row)
         f.seek(0)
         return HttpResponse(f.read(), content_type="text/csv")
+
+
+class BufferReport(TemplateView):
+
+    @method_decorator(user_passes_test(lambda u: u.is_staff))
+    def dispatch(self, *args, **kwargs):
+        return super(BufferReport, self).dispatch(*args, **kwargs)
+
+    def get(self, request, **kwargs):
+        """Report queue depth, lag and dropped variables of this process's tracking buffer."""
+        return HttpResponse(json.dumps(buffering.get_stats()), content_type="application/json")
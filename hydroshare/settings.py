@@ -388,6 +388,8 @@ MIDDLEWARE_CLASSES = (
     "mezzanine.pages.middleware.PageMiddleware",
     "mezzanine.core.middleware.FetchFromCacheMiddleware",
     "hs_core.robots.RobotFilter",
+    "django_irods.middleware.IrodsCacheMiddleware",
+    "hs_core.middleware.AuthorizationCacheMiddleware",
     "hs_tracking.middleware.Tracking",
 )
 
@@ -480,7 +482,7 @@ HAYSTACK_CONNECTIONS = {
         # 'URL': 'http://127.0.0.1:8983/solr/mysite',
     },
 }
-HAYSTACK_SIGNAL_PROCESSOR = "hs_core.hydro_realtime_signal_processor.HydroRealtimeSignalProcessor"
+HAYSTACK_SIGNAL_PROCESSOR = "hs_core.hydro_realtime_signal_processor.HydroQueuedSignalProcessor"
 
 
 # customized value for password reset token, email verification and group invitation link token
@@ -574,6 +576,12 @@ LOGGING = {
 TRACKING_SESSION_TIMEOUT = 60 * 15
 TRACKING_PROFILE_FIELDS = ["title", "user_type", "subject_areas", "public", "state", "country"]
 TRACKING_USER_FIELDS = ["username", "email", "first_name", "last_name"]
+# visits are queued and written in batches by a background thread of each process;
+# a TRACKING_BUFFER_SIZE of 0 writes them synchronously
+TRACKING_BUFFER_SIZE = 10000
+TRACKING_FLUSH_BATCH_SIZE = 500
+TRACKING_FLUSH_INTERVAL = 5
+TRACKING_SESSION_CACHE_SIZE = 10000
 
 # info django that a reverse proxy sever (nginx) is handling ssl/https for it
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
@@ -11,7 +11,7 @@ from mezzanine.pages.views import page
 from autocomplete_light import shortcuts as autocomplete_light
 
 from hs_core.views.discovery_view import DiscoveryView
-from hs_core.views.discovery_json_view import DiscoveryJsonView
+from hs_core.views.discovery_json_view import DiscoveryJsonView, DiscoveryMapView
 from hs_sitemap.views import sitemap
 from theme import views as theme
 from hs_tracking import views as tracking
@@ -38,6 +38,8 @@ urlpatterns = i18n_patterns(
         name='tracking-report-profiles'),
     url(r'^tracking/reports/history/$', tracking.HistoryReport.as_view(),
         name='tracking-report-history'),
+    url(r'^tracking/reports/buffer/$', tracking.BufferReport.as_view(),
+        name='tracking-report-buffer'),
     url(r'^tracking/$', tracking.UseTrackingView.as_view(), name='tracking'),
     url(r'^tracking/applaunch/', tracking.AppLaunch.as_view(), name='tracking-applaunch'),
     url(r'^user/$', theme.UserProfileView.as_view()),
@@ -70,6 +72,7 @@ urlpatterns = i18n_patterns(
     url(r'^autocomplete/', include('autocomplete_light.urls')),
     url(r'^search/$', DiscoveryView.as_view(), name='haystack_search'),
     url(r'^searchjson/$', DiscoveryJsonView.as_view(), name='haystack_json_search'),
+    url(r'^searchmap/$', DiscoveryMapView.as_view(), name='haystack_map_search'),
     url(r'^sitemap/$', sitemap, name='sitemap'),
     url(r'^sitemap', include('hs_sitemap.urls')),
     url(r'^collaborate/$', hs_core_views.CollaborateView.as_view(), name='collaborate'),
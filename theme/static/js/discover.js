@@ -656,7 +656,7 @@ var updateListFaceting = function (request_url) {
 };
 
 var updateMapFaceting = function (){
-    var map_update_url = "/searchjson/";
+    var map_update_url = "/searchmap/";
     var textSearch = $("#id_q").val();
     var searchURL = "?q=" + textSearch;
     map_update_url += searchURL;
@@ -679,8 +679,7 @@ var updateMapFaceting = function (){
         success: function (data) {
             raw_results = [];
             for (var j = 0; j < data.length; j++) {
-                var item = $.parseJSON(data[j]);
-                raw_results.push(item);
+                raw_results.push(data[j]);
             }
 
             updateMapView();
@@ -891,7 +890,7 @@ $(document).ready(function () {
         var tabId = $(e.target).attr("href").substr(1);
         window.location.hash = tabId;
         if (tabId == "map-view" && map == null) {
-            var requestURL = "/searchjson/";
+            var requestURL = "/searchmap/";
             var textSearch = $("#id_q").val();
             var searchURL = "?q=" + textSearch;
             requestURL += searchURL;
@@ -918,9 +917,8 @@ $(document).ready(function () {
                 success: function (data) {
                     var json_results = [];
                     for (var j = 0; j < data.length; j++) {
-                        var item = $.parseJSON(data[j]);
-                        json_results.push(item);
-                        raw_results.push(item);
+                        json_results.push(data[j]);
+                        raw_results.push(data[j]);
                     }
                     initMap(json_results);
                     setMapItemsList([], null);